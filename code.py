@@ -23,7 +23,7 @@
 # Tested with Circuitpython 7.3.3
 #
 # To use, on a Matrix Portal M4 running Circuitpython copy all files to CIRCUITPY
-# (except README.md and readme-images) along with the libraries:
+# (except README.md, readme-images and tools) along with the libraries:
 # Place required libraries and probably some ones you don't need for circuitpython
 # in /lib: https://circuitpython.org/libraries
 # adafruit_bitmap_font, adafruit_bus_device, adafruit_display_text, adafruit_esp32spi,
@@ -34,7 +34,8 @@
 # This "works for me" but if you need to debug connect to the serial console for debug messages
 #
 # If the watchdog timer is enabled in streamer.py the program will likely reboot in the event
-# of any runtime exceptions like twitch tokens expiring.  If it keeps rebooting over and
+# of any runtime exceptions.  Twitch tokens are refreshed before they expire (and again if
+# twitch rejects one) so that shouldn't need a reboot.  If it keeps rebooting over and
 # over check your settings.
 #
 # You will need to generate a set of twitch oAuth secrets to access the twitch
@@ -50,6 +51,8 @@
 #
 # Steven Cogswell February 2023
 import time
+import random
+import json
 import board
 import terminalio
 from adafruit_matrixportal.matrixportal import MatrixPortal
@@ -69,20 +72,86 @@ import neopixel
 import rtc
 import microcontroller
 import watchdog
+import marquee
+import helixscan
+import livestate
+import helixsession
+import usercache
+import warmstart
+import palettecycle
+import layout
+# heapprof, eventsub, hubclient and helixlog are only imported if they're
+# used, see USE_PROFILER, USE_EVENTSUB, HUB_ADDRESS and HELIX_RECORD_FILE
 
 #pylint: disable=invalid-name
+boot_start = time.monotonic()   # for how long startup took
 
 TWITCH_AUTH_URL = "https://id.twitch.tv/oauth2/token"
 TWITCH_STREAM_URL = "https://api.twitch.tv/helix/streams"
+TWITCH_USERS_URL = "https://api.twitch.tv/helix/users"
+TWITCH_EVENTSUB_URL = "https://api.twitch.tv/helix/eventsub/subscriptions"
+TWITCH_MAX_LOGINS = 100  # most user_id's or user_login's twitch accepts in one request
 
-UPDATE_DELAY = 63
-NOWLIVE_DELAY = 15
-SCROLL_DELAY = 0.03
+UPDATE_DELAY = 63       # normal seconds between status polls
+POLL_BACKOFF_JITTER = 0.25  # fraction of random jitter added when backing off
+RATELIMIT_LOW = 10      # ratelimit points left before waiting for the bucket to refill
+TOKEN_REFRESH_MARGIN = 3600     # get a new token this many seconds before it expires,
+                                # or a tenth of its lifetime if that's shorter
+TOKEN_DEFAULT_LIFETIME = 3600   # if twitch doesn't say how long a token lasts
+TOKEN_RETRY_DELAY = 30          # wait between token attempts at startup
+NOWLIVE_DELAY = 15       # seconds to show a "now live" splash
+NOWLIVE_ITEM_DELAY = 5   # seconds for each name when several go live at once
+NOWLIVE_MERGE_COUNT = 3  # more than this many at once are shown together on one splash
+
+# Animation rates in steps per second
+CATJAM_HZ = 6
+TWITCHLOGO_HZ = 4
+LIVETEXT_HZ = 4
+STREAMERTEXT_SCROLL_HZ = 12
+STREAMERTEXT_COLOR_HZ = 5
+NOWLIVE_HZ = 10
+ANIMATION_MAX_CATCHUP = 5  # most steps an animation takes at once to catch up after a stall
+REFRESH_FPS = 30         # most display refreshes a second with frame pacing, changes
+                         # closer together than a frame are shown in one refresh
+STATUS_CHUNK_SIZE = 256  # bytes of a status response read per animation frame
+STATUS_FIELDS = ("user_id", "user_name", "title", "game_name", "viewer_count")  # kept from each stream
+VIEWER_MILESTONES = (100, 1000, 10000)  # viewer counts worth a mention on the serial
+RENDER_REPORT_DELAY = 3600  # seconds between reports of skipped redraws
+PROFILE_SAMPLES = 256      # phase timings kept between profiler dumps
+PROFILE_DUMP_DELAY = 60    # seconds between profiler dumps to the serial console
+POLL_STEPPED = True      # False does each status poll in one go, to compare frame stalls
+EVENTSUB_RECONCILE_DELAY = 900  # seconds between status polls while EventSub is working
+EVENTSUB_RETRY_DELAY = 60       # first wait before setting up EventSub again after it fails
+EVENTSUB_WELCOME_TIMEOUT = 10   # seconds to wait for twitch's welcome on a new session
+EVENTSUB_MAX_SUBSCRIPTIONS = 300  # twitch's limit per WebSocket, two per streamer
+HUB_SYNC_TIMEOUT = 30   # seconds to wait for the hub's list of who is live after connecting
+USER_CACHE_TTL = 7 * 86400  # seconds before a login's user id is looked up again
+NTP_RETRY_DELAY = 5     # seconds between NTP tries after a warm start
+MATRIX_BIT_DEPTH = 4    # most color bits per channel on the matrix, fewer on big chains
+MARQUEE_MIDDLE = 6      # middle of the marquee text, down from the top of its row
+CATJAM_TILE = 16        # catjamtiles.bmp is a row of 16x16 frames
+BACKGROUND_TILE = (64, 32)  # wow.bmp is three tiles, one for each color of the splash
+BOOT_PHASES = ("wifi", "token", "time", "assets", "users", "status", "marquee")  # for the progress bar
 DEBUG = True
 DEBUG = False
 
+STREAMER_FONT = "fonts/Roboto-Condensed.pcf"
+STREAMER_SUBSET_FONT = "fonts/streamer-subset.bdf"  # made by tools/bake_font.py
+# Twitch logins are letters, numbers and _, plus what else the display draws
+LOGIN_GLYPHS = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_- ()"
+
+# Size of the display in pixels, chained panels are one wide display.
+# Everything is laid out to fit by layout.py.
+try:
+    from streamer import MATRIX_WIDTH, MATRIX_HEIGHT
+except ImportError:
+    MATRIX_WIDTH = 64
+    MATRIX_HEIGHT = 32
+
 # --- Display setup ---
-matrix = Matrix(bit_depth=4)
+# Fewer color bits on bigger displays so the matrix refreshes as fast as one panel
+matrix_bit_depth = layout.bit_depth(MATRIX_WIDTH, MATRIX_HEIGHT, MATRIX_BIT_DEPTH)
+matrix = Matrix(width=MATRIX_WIDTH, height=MATRIX_HEIGHT, bit_depth=matrix_bit_depth)
 display = matrix.display
 group = displayio.Group()
 
@@ -97,83 +166,31 @@ message_text = adafruit_display_text.bitmap_label.Label(font=terminalio.FONT,
 message_group.append(message_text)    # Item 0
 message_group[0].x=0
 message_group[0].y = display.height // 2
+# Startup progress, a bar along the bottom that fills as boot phases finish
+progress_palette = displayio.Palette(2)
+progress_palette.make_transparent(0)
+progress_palette[1] = (0,0,255)
+progress_bitmap = displayio.Bitmap(display.width, 1, 2)
+message_group.append(displayio.TileGrid(progress_bitmap, pixel_shader=progress_palette,
+                                        y=display.height - 1))  # Item 1
 display.show(message_group)
 
-# A garishly complicated "now live" display featuring:
-# - "LIVE" flashing
-# - Twitch logo prowling back and forth
-# - catJAM, what more can I say
-# - list of streamers currently live
-streamer_font = bitmap_font.load_font("fonts/Roboto-Condensed.pcf")
-streamer_font.load_glyphs(b'abcdefghjiklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ1234567890- ()')
-
-twitchlogo, twitchpalette = adafruit_imageload.load("/twitchlogo.bmp",
-                        bitmap=displayio.Bitmap,
-                        palette=displayio.Palette)
-twitchpalette.make_transparent(5)  # make the black in the logo transparent
-logo_grid = displayio.TileGrid(twitchlogo, pixel_shader=twitchpalette)
-catjam, catpalette = adafruit_imageload.load("/catjamtiles.bmp",
-                        bitmap=displayio.Bitmap,
-                        palette=displayio.Palette)
-catjam_grid = displayio.TileGrid(catjam, pixel_shader=catpalette,
-                        width=1,
-                        height=1,
-                        tile_width=16,
-                        tile_height=16)
-group.append(logo_grid)    # Item 0
-group.append(catjam_grid)  # Item 1
-
-live_text = adafruit_display_text.bitmap_label.Label(font=terminalio.FONT,
-                                        text="LIVE",color=(0,0,255))
-group.append(live_text)  # Item 2
-
-streamer_text = adafruit_display_text.bitmap_label.Label(font=streamer_font,
-                        text=" "*50)
-group.append(streamer_text) # Item 3
-
-# twitch logo
-group[0].x = 0
-group[0].y = 0
-
-# catJAM
-group[1].x = 43
-group[1].y = 0
-
-# "LIVE" text
-group[2].x = 5
-group[2].y = 7
-livetext_colors = [(0,255,0),(0,255,255),(0,0,255),(255,255,0)]
-
-# Streamer names
-group[3].x = 0
-group[3].y = 22
-#streamer_text.text=" "*20
-streamertext_colors = [(255,255,255),(200,200,200),(180,180,180),
-                        (150,150,150),(180,180,180),(200,200,200)]
-
-# Splash screen for when a streamer goes live
-nowlive_group = displayio.Group()
-nowlive_background, nowlive_palette = adafruit_imageload.load("/wow.bmp",
-                        bitmap=displayio.Bitmap,
-                        palette=displayio.Palette)
-nowlive_grid = displayio.TileGrid(nowlive_background, pixel_shader=nowlive_palette,
-                        width=1,
-                        height=1,
-                        tile_width=64,
-                        tile_height=32)
-nowlive1_text = adafruit_display_text.bitmap_label.Label(font=terminalio.FONT,
-                text="LIVE NOW",
-                color=(0,255,0),anchored_position=(display.width // 2, display.height // 2),
-                anchor_point=(0.5, 1))
-nowlive2_text = adafruit_display_text.bitmap_label.Label(font=streamer_font,
-                text=" "*20,
-                color=(0,255,0),anchored_position=(display.width // 2, display.height),
-                anchor_point=(0.5,1.2))
-nowlive_logo = displayio.TileGrid(twitchlogo, pixel_shader=twitchpalette)
-nowlive_group.append(nowlive_grid)   # 0
-nowlive_group.append(nowlive_logo)   # 1
-nowlive_group.append(nowlive1_text)  # 2
-nowlive_group.append(nowlive2_text)  # 3
+def load_name_glyphs(names):
+    """
+    Load any glyphs for a list of names that haven't been loaded yet, so
+    the font isn't read from flash glyph by glyph while drawing
+    :param names: list of names (or strings of characters)
+    """
+    missing = ""
+    for name in names:
+        for c in name:
+            if c not in loaded_glyphs:
+                loaded_glyphs.add(c)
+                missing += c
+    if missing:
+        if DEBUG:
+            print("Loading glyphs",missing)
+        streamer_font.load_glyphs(missing)
 
 # Get wifi details and more from a secrets.py file
 try:
@@ -198,77 +215,643 @@ except ImportError:
     print("Using UTC for time, set TIMEZONE_OFFSET in streamer.py for different time zone")
     TIMEZONE_OFFSET = 0
 
-def get_twitch_multi_status(twitch_token, streamers):
+try:
+    from streamer import USE_WATCHDOG
+except ImportError:
+    print("set USE_WATCHDOG as True or False in streamer.py for watchdog reset")
+    print("assuming no watchdog")
+    USE_WATCHDOG=False
+
+# Profile heap use and timing of the main loop, printed to the serial
+# console every PROFILE_DUMP_DELAY seconds for tools/plot_profile.py
+try:
+    from streamer import USE_PROFILER
+except ImportError:
+    USE_PROFILER = False
+
+# Have twitch push go-lives over EventSub instead of only polling, needs a
+# twitch_user_token in secrets.py since twitch won't take the app token for it
+try:
+    from streamer import USE_EVENTSUB
+except ImportError:
+    USE_EVENTSUB = True
+
+# Refresh the display once per loop, only if something on it changed,
+# instead of letting auto refresh push frames whenever it likes
+try:
+    from streamer import USE_FRAME_PACING
+except ImportError:
+    USE_FRAME_PACING = True
+
+# Where the user ids for STREAMER_NAMES are kept between resets, if
+# CIRCUITPY isn't writable they're looked up again after each reset
+try:
+    from streamer import USER_CACHE_FILE
+except ImportError:
+    USER_CACHE_FILE = "/usercache.txt"
+
+# Get the live status from a hub (tools/hub.py) that polls twitch for a
+# lot of displays at once, as "host:port", instead of asking twitch.
+# No twitch token or user id lookups are needed then.
+try:
+    from streamer import HUB_ADDRESS
+except ImportError:
+    HUB_ADDRESS = None
+
+# Record what the Helix API sends to a log on CIRCUITPY (it has to be
+# writable, see usercache.py), or play a log back instead of asking
+# twitch, HELIX_REPLAY_SPEED times as fast as it was recorded (0 plays
+# each response in turn, one per request).  See helixlog.py.
+try:
+    from streamer import HELIX_RECORD_FILE
+except ImportError:
+    HELIX_RECORD_FILE = None
+try:
+    from streamer import HELIX_REPLAY_FILE
+except ImportError:
+    HELIX_REPLAY_FILE = None
+try:
+    from streamer import HELIX_REPLAY_SPEED
+except ImportError:
+    HELIX_REPLAY_SPEED = 1
+
+class NoProfiler:
+    """
+    The parts of heapprof.Profiler code.py uses, doing nothing, so
+    heapprof only takes up memory when USE_PROFILER is on
+    """
+    def phase(self, name):  # pylint: disable=unused-argument
+        return 0
+
+    def begin(self, phase):
+        pass
+
+    def end(self, phase):
+        pass
+
+if USE_PROFILER:
+    import heapprof
+    profiler = heapprof.Profiler(PROFILE_SAMPLES)
+else:
+    profiler = NoProfiler()
+PHASE_POLL = profiler.phase("poll")          # one step of the status poll
+PHASE_REQUEST = profiler.phase("request")    # sending a status request
+PHASE_PARSE = profiler.phase("parse")        # scanning a chunk of the response
+PHASE_DIFF = profiler.phase("diff")          # working out who changed
+PHASE_MARQUEE = profiler.phase("marquee")    # redrawing the marquee strip
+PHASE_SPLASH = profiler.phase("splash")      # drawing a name for the splash
+
+# Fastest and slowest the status is polled, the poll rate speeds up
+# around the times of day streamers usually go live and slows down
+# when twitch has errors or we're close to the rate limit
+try:
+    from streamer import POLL_MIN_DELAY, POLL_MAX_DELAY
+except ImportError:
+    POLL_MIN_DELAY = 30
+    POLL_MAX_DELAY = 600
+GOLIVE_COUNT = 16     # added to an hour's count each time someone goes live in it
+GOLIVE_FAST = 24      # poll fast around hours counted at least this, more than one go-live
+GOLIVE_DECAY_DELAY = 86400  # seconds between the counts fading by a quarter
+
+def build_status_urls(user_ids, logins=()):
     """
-    Retrieve twitch live status for a list of names, uses only one api call
-    to get all statuses
-    :param str twitch_token: oauth token from get_twitch_token()
-    :param streamers: list of streamers to get live status for
+    Build the list of stream status URLs for the streamers to monitor,
+    by user id, which doesn't change when someone renames, and by login
+    for any that haven't had their id looked up.  Twitch only allows
+    TWITCH_MAX_LOGINS of them per request, so they are split into batches.
+    Build these once, not on every poll.
+    :param user_ids: list of user ids to get live status for
+    :param logins: list of logins to get live status for
+    """
+    urls = []
+    for i in range(0, len(user_ids), TWITCH_MAX_LOGINS):
+        query = "&user_id=".join(str(user_id) for user_id in user_ids[i:i+TWITCH_MAX_LOGINS])
+        urls.append(TWITCH_STREAM_URL + "?first=100&user_id=" + query)
+    for i in range(0, len(logins), TWITCH_MAX_LOGINS):
+        query = "&user_login=".join(logins[i:i+TWITCH_MAX_LOGINS])
+        urls.append(TWITCH_STREAM_URL + "?first=100&user_login=" + query)
+    return urls
+
+def utc_now():
+    """
+    Seconds since 1970 UTC, the rtc is set to local time
+    """
+    return time.time() - TIMEZONE_OFFSET * 3600
+
+def get_header(response, name):
     """
-    if not streamers:
+    Case-insensitive lookup of a response header, None if it isn't there
+    :param response: response from wifi.get()
+    :param str name: lower case header name
+    """
+    for key, value in response.headers.items():
+        if key.lower() == name:
+            return value
+    return None
+
+def next_poll_delay():
+    """
+    Work out how long to wait before the next status poll.  Backs off with
+    jitter after failed polls, waits for the rate limit to reset if we're
+    nearly out of requests, and polls faster during hours when streamers
+    have gone live often lately.  Always between POLL_MIN_DELAY and
+    POLL_MAX_DELAY.
+    """
+    delay = UPDATE_DELAY
+    hour = time.localtime().tm_hour
+    if max(golive_hours[hour], golive_hours[(hour + 1) % 24]) >= GOLIVE_FAST:
+        delay = POLL_MIN_DELAY
+    if poll_errors:
+        delay = UPDATE_DELAY * 2 ** min(poll_errors, 6)
+        delay += delay * POLL_BACKOFF_JITTER * random.random()
+    if (time_valid and ratelimit_remaining is not None
+            and ratelimit_remaining < RATELIMIT_LOW + len(status_urls)):
+        # ratelimit_reset is a utc unix time
+        reset_in = ratelimit_reset - utc_now()
+        delay = max(delay, reset_in + 1)
+    return min(max(delay, POLL_MIN_DELAY), POLL_MAX_DELAY)
+
+def twitch_status_task(status_urls):
+    """
+    Retrieve twitch live status for a list of names, uses one api call
+    per batch of up to 100 names (more if twitch paginates the results).
+    Uses the current token, if twitch rejects it (401) get a new token
+    and retry once.
+    This is a generator that does the work in small steps so the
+    animations can keep going: step it with next() once per frame, the
+    list of live stream dicts (or False on failure) is the StopIteration
+    value.
+    :param status_urls: list of status URLs from build_status_urls()
+    """
+    global token_auth_failures, ratelimit_remaining, ratelimit_reset  # pylint: disable=global-statement
+    if not status_urls:
         return []
     headers = {
         'Client-ID': secrets['twitch_client_id'],
-        'Authorization': 'Bearer ' + twitch_token
+        'Authorization': 'Bearer ' + token
     }
     if DEBUG:
         print("Twitch Multi-Status: Headers are",headers)
-    streamer_request = "?"
-    for s in streamers:
-        streamer_request += "&user_login="+s
-    stream_data = None
-    if DEBUG:
-        print("Twitch Multi-Status: URL is",TWITCH_STREAM_URL + streamer_request)
-    try:
-        stream = wifi.get(TWITCH_STREAM_URL + streamer_request, headers=headers)
-        stream_data = stream.json()
-    except Exception as error:  # pylint: disable=broad-except
-        print("Exception during status request: ",error)
-        print("query was",TWITCH_STREAM_URL + streamer_request)
-        print("stream data was",stream_data)
-        print("headers were",headers)
-        return False
     live_now = []
-    if stream_data['data'] is not None:
-        for streams in stream_data['data']:
+    status_batch_times.clear()
+    for url in status_urls:
+        if USE_WATCHDOG and microcontroller.watchdog.mode is not None:
+            microcontroller.watchdog.feed()  # lots of batches can take a while
+        batch_t = time.monotonic()
+        cursor = None
+        while True:
+            query = url
+            if cursor:
+                query = url + "&after=" + cursor
+            scanner = None
             if DEBUG:
-                print("Twitch Multi-Status: Data is",streams)
-                print("Twitch Multi-Status: user_name is",streams['user_name'])
-            live_now.append(streams['user_name'])
-    live_now.sort(key=lambda s: s.lower())   # sort list case-insensitive
+                print("Twitch Multi-Status: URL is",query)
+            yield
+            try:
+                profiler.begin(PHASE_REQUEST)
+                stream = helix.get(query, headers=headers)
+                if stream.status_code == 401:
+                    # Token expired or was revoked, get a new one and retry once
+                    stream.close()
+                    token_auth_failures += 1
+                    print("Twitch Multi-Status: token rejected, refreshing")
+                    refreshed = yield from token_task()
+                    if not refreshed:
+                        return False
+                    headers['Authorization'] = 'Bearer ' + token
+                    yield
+                    stream = helix.get(query, headers=headers)
+                # Twitch says how many requests are left in the bucket and when it refills
+                remaining = get_header(stream, "ratelimit-remaining")
+                if remaining is not None:
+                    ratelimit_remaining = int(remaining)
+                    ratelimit_reset = int(get_header(stream, "ratelimit-reset") or 0)
+                profiler.end(PHASE_REQUEST)
+                if stream.status_code != 200:
+                    raise RuntimeError("HTTP status " + str(stream.status_code))
+                # Scan the body a chunk per step, only keeping the fields we
+                # want rather than loading the whole response
+                scanner = helixscan.HelixScanner(STATUS_FIELDS)
+                for chunk in stream.iter_content(chunk_size=STATUS_CHUNK_SIZE):
+                    profiler.begin(PHASE_PARSE)
+                    for streams in scanner.feed(chunk):
+                        if DEBUG:
+                            print("Twitch Multi-Status: Data is",streams)
+                        live_now.append(streams)
+                    profiler.end(PHASE_PARSE)
+                    yield
+                stream.close()
+                if not scanner.done:
+                    raise ValueError("incomplete response")
+            except Exception as error:  # pylint: disable=broad-except
+                helix.close()   # don't leave the socket busy for the next poll
+                print("Exception during status request: ",error)
+                print("query was",query)
+                print("streams read were",scanner.records if scanner else None)
+                print("headers were",headers)
+                return False
+            # Twitch only sends a cursor if there may be another page
+            cursor = scanner.cursor
+            if not cursor or not scanner.records:
+                break
+        status_batch_times.append(time.monotonic() - batch_t)
     if DEBUG:
         print("live_now is",live_now)
+        print("Batch times are",status_batch_times)
     return live_now
 
-def get_twitch_token():
+def run_task(task):
+    """
+    Step a generator task like twitch_status_task() to the end in one
+    go, returns its StopIteration value
+    :param task: the generator
+    """
+    while True:
+        try:
+            next(task)
+        except StopIteration as done:
+            return done.value
+
+def get_twitch_multi_status(status_urls):
+    """
+    Retrieve twitch live status for a list of names all in one go,
+    returns the list of live stream dicts or False on failure
+    :param status_urls: list of status URLs from build_status_urls()
+    """
+    return run_task(twitch_status_task(status_urls))
+
+def status_refresh_task():
+    """
+    Look up any user ids that are missing or expired, then poll the
+    status.  The token is refreshed first if it's about to expire, if
+    that fails the old one is still good for a while so it's tried again
+    next time.  A generator like twitch_status_task() with the same value.
+    """
+    if token_expiring():
+        print("Twitch token expiring, refreshing")
+        yield from token_task()
+    yield from user_cache_task()
+    status = yield from twitch_status_task(status_urls)
+    return status
+
+def user_ids_task(logins):
+    """
+    Look up the user ids of a list of logins, one api call per batch of
+    up to 100.  A generator like twitch_status_task(), the dict of
+    login: user id (or False on failure) is the StopIteration value.
+    :param logins: list of twitch logins
+    """
+    headers = {
+        'Client-ID': secrets['twitch_client_id'],
+        'Authorization': 'Bearer ' + token
+    }
+    ids = {}
+    for i in range(0, len(logins), TWITCH_MAX_LOGINS):
+        query = TWITCH_USERS_URL + "?login=" + "&login=".join(logins[i:i+TWITCH_MAX_LOGINS])
+        yield
+        try:
+            response = helix.get(query, headers=headers)
+            if response.status_code != 200:
+                raise RuntimeError("HTTP status " + str(response.status_code))
+            scanner = helixscan.HelixScanner(("id", "login"))
+            for chunk in response.iter_content(chunk_size=STATUS_CHUNK_SIZE):
+                for user in scanner.feed(chunk):
+                    ids[user['login']] = user['id']
+                yield
+        except Exception as error:  # pylint: disable=broad-except
+            helix.close()
+            print("Exception looking up user ids:",error)
+            return False
+    return ids
+
+def user_cache_task():
+    """
+    Look up the user ids of STREAMER_NAMES that aren't in the user cache
+    or have expired, save them and rebuild status_urls.  A generator like
+    twitch_status_task(), True (or False on failure) is the StopIteration
+    value.  Nothing is requested if every id is cached, or until the rtc
+    has the time from NTP since the cache goes by it.
+    """
+    global status_urls  # pylint: disable=global-statement
+    if not time_valid:
+        return True
+    missing = user_cache.missing(STREAMER_NAMES, utc_now())
+    if not missing:
+        return True
+    print("Looking up user ids for",missing)
+    found = yield from user_ids_task(missing)
+    if found is False:
+        return False
+    user_cache.update(missing, found, utc_now())
+    user_cache.save()
+    status_urls = build_status_urls(user_cache.ids(STREAMER_NAMES),
+                                    user_cache.unresolved(STREAMER_NAMES))
+    return True
+
+def eventsub_task():
+    """
+    Start an EventSub session and subscribe to stream.online and
+    stream.offline for everyone in STREAMER_NAMES.  A generator like
+    twitch_status_task(), True (or False on failure) is the
+    StopIteration value.
+    """
+    global use_eventsub  # pylint: disable=global-statement
+    print("EventSub: connecting")
+    try:
+        push.connect()
+    except (OSError, RuntimeError) as error:
+        print("EventSub: can't connect",error)
+        return False
+    start = time.monotonic()
+    while push.session_id is None:
+        yield
+        push.poll()
+        if not push.alive or time.monotonic() - start > EVENTSUB_WELCOME_TIMEOUT:
+            print("EventSub: no welcome from twitch")
+            push.close()
+            return False
+    # Subscriptions are by user id, all of them have to be known
+    if user_cache.unresolved(STREAMER_NAMES):
+        print("EventSub: user ids not looked up yet")
+        push.close()
+        return False
+    ids = user_cache.ids(STREAMER_NAMES)
+    headers = {
+        'Client-ID': secrets['twitch_client_id'],
+        'Authorization': 'Bearer ' + secrets['twitch_user_token']
+    }
+    # Notifications that come in while subscribing wait in the socket
+    # until the main loop reads them
+    for user_id in ids:
+        for kind in ("stream.online", "stream.offline"):
+            yield
+            try:
+                response = helix.post(TWITCH_EVENTSUB_URL, headers=headers,
+                                      json=eventsub.subscription(kind, str(user_id), push.session_id))
+                status = response.status_code
+                response.close()
+            except Exception as error:  # pylint: disable=broad-except
+                helix.close()
+                print("EventSub: exception subscribing",error)
+                push.close()
+                return False
+            if status in (401, 403):
+                print("EventSub: twitch refused twitch_user_token, polling only")
+                use_eventsub = False
+                push.close()
+                return False
+            if status not in (202, 409):   # 409 is already subscribed
+                print("EventSub: subscribing failed, HTTP status",status)
+                push.close()
+                return False
+    print("EventSub: subscribed to",len(ids),"streamers")
+    return True
+
+def hub_connect_task():
     """
-    Get a twitch oAuth token.  Note you must have twitch_client_id and
-    twitch_client_secret defined in secrets.py.  Get those by registering
-    an app with "client credentials grant flow"
+    Connect to the hub and wait for its list of who is live.  A generator
+    like twitch_status_task(), the list of live stream dicts (or False if
+    the hub isn't answering) is the StopIteration value.
+    """
+    global hub_live  # pylint: disable=global-statement
+    print("Connecting to hub at",HUB_ADDRESS)
+    try:
+        hub.connect()
+    except (OSError, RuntimeError) as error:
+        print("Hub: can't connect",error)
+        hub.close()
+        return False
+    start = time.monotonic()
+    while not hub.synced:
+        yield
+        hub.poll()
+        if not hub.alive or time.monotonic() - start > HUB_SYNC_TIMEOUT:
+            print("Hub: no list of who is live")
+            hub.close()
+            return False
+    hub_live = True
+    return hub.stream_list()
+
+def token_task():
+    """
+    Get a new twitch oAuth token and remember when it expires.  Note you
+    must have twitch_client_id and twitch_client_secret defined in
+    secrets.py.  Get those by registering an app with "client credentials
+    grant flow"
     https://dev.twitch.tv/docs/authentication/register-app
     https://dev.twitch.tv/docs/authentication/getting-tokens-oauth#client-credentials-grant-flow
+    The old token is kept if this fails so it can be tried again later.
+    A generator like twitch_status_task(), True if a new token was stored
+    is the StopIteration value.
     """
+    global token, token_expires, token_lifetime, token_refreshes, snapshot_due, token_unverified  # pylint: disable=global-statement
     body = {
         'client_id': secrets['twitch_client_id'],
         'client_secret': secrets['twitch_client_secret'],
         "grant_type": 'client_credentials'
     }
-    if DEBUG:
-        print("Twitch Token: Body is",body)
-    try:
-        r = wifi.post(TWITCH_AUTH_URL, data=body)
-        keys = r.json()
+    if HELIX_REPLAY_FILE:
+        keys = {'access_token': "replay"}   # the log doesn't check it
+    else:
         if DEBUG:
-            print(keys)
-    except Exception as error:  # pylint: disable=broad-except
-        print("Exception getting twitch token:",error)
-        return None
+            print("Twitch Token: Body is",body)
+        yield
+        try:
+            r = wifi.post(TWITCH_AUTH_URL, data=body)
+            # Read the body a step at a time like the status poll
+            data = bytearray()
+            for chunk in r.iter_content(chunk_size=STATUS_CHUNK_SIZE):
+                data.extend(chunk)
+                yield
+            r.close()
+            keys = json.loads(data)
+            if DEBUG:
+                print(keys)
+        except Exception as error:  # pylint: disable=broad-except
+            print("Exception getting twitch token:",error)
+            return False
     if not "access_token" in keys:
         print("Didn't get proper access token from twitch")
-        return None
+        return False
     if DEBUG:
         print("Twitch Token: Access token is",keys['access_token'])
-    return keys['access_token']
+    token_lifetime = keys.get('expires_in', TOKEN_DEFAULT_LIFETIME)
+    token_expires = time.monotonic() + token_lifetime
+    token_refreshes += 1
+    token_unverified = False
+    if keys['access_token'] != token:
+        token = keys['access_token']
+        snapshot_due = True
+    print("Twitch token good for",token_lifetime,"s, refreshes:",token_refreshes,
+          "auth failures:",token_auth_failures)
+    return True
+
+def sync_time():
+    """
+    Set the rtc from NTP through the ESP32, returns False if the ESP32
+    doesn't have the time yet
+    """
+    try:
+        now_utc = esp.get_time()[0]
+    except OSError:
+        return False
+    # Adjust utc to local time the easy way
+    rtc.RTC().datetime = time.localtime(now_utc + TIMEZONE_OFFSET * 3600)
+    return True
+
+def show_progress(text):
+    """
+    Show what startup is doing, with the progress bar filled for the
+    boot phases done so far
+    :param str text: a few characters about what's going on
+    """
+    message_text.text = text
+    for x in range(len(boot_timeline) * display.width // len(BOOT_PHASES)):
+        progress_bitmap[x, 0] = 1
+
+def boot_phase_done(name, start):
+    """
+    Add a finished phase to the boot timeline
+    :param str name: the phase
+    :param float start: time.monotonic() it started
+    """
+    boot_timeline.append((name, start - boot_start, time.monotonic() - boot_start))
+
+def run_boot_phases(phases):
+    """
+    Run startup phases that don't depend on each other together, so
+    waiting on one (NTP) isn't time lost for the others.  Each phase is
+    a generator that yields when it's waiting or has done a piece of
+    work, they are stepped in turn until all have finished.
+    :param phases: list of (name, generator)
+    """
+    running = [(name, phase, time.monotonic()) for name, phase in phases]
+    changed = True
+    while running:
+        # Only redraw the message and progress bar when a phase finishes
+        if changed:
+            changed = False
+            show_progress(running[0][0].capitalize() + ("+%d" % (len(running) - 1) if len(running) > 1 else ""))
+        for item in list(running):
+            try:
+                next(item[1])
+            except StopIteration:
+                running.remove(item)
+                boot_phase_done(item[0], item[2])
+                changed = True
+        time.sleep(0.01)
+
+def token_phase():
+    """
+    Get the twitch token, trying again every TOKEN_RETRY_DELAY rather
+    than rebooting.  A boot phase for run_boot_phases().
+    """
+    print("Getting twitch authorization token")
+    while True:
+        got_token = yield from token_task()
+        if got_token:
+            break
+        retry = time.monotonic() + TOKEN_RETRY_DELAY
+        while time.monotonic() < retry:
+            yield
+
+def ntp_phase():
+    """
+    Wait for the ESP32 to get the time by NTP and set the rtc from it.
+    A boot phase for run_boot_phases().
+    """
+    global time_valid  # pylint: disable=global-statement
+    print("Syncing time")
+    while not sync_time():
+        retry = time.monotonic() + 1
+        while time.monotonic() < retry:
+            yield
+    time_valid = True
+
+def assets_phase():
+    """
+    Load the font and the images for the live display, yielding between
+    them so the other boot phases get turns.  wow.bmp is only needed for
+    a splash, load_nowlive_background() loads it the first time.  A boot
+    phase for run_boot_phases().
+    """
+    global streamer_font, loaded_glyphs  # pylint: disable=global-statement
+    global twitchlogo, twitchpalette, catjam, catpalette  # pylint: disable=global-statement
+    # Use the subset font from tools/bake_font.py if it's there, it has just the
+    # characters twitch logins use and loads in one pass.  Display names can
+    # have any others, those come from the full font.
+    font_time = time.monotonic()
+    try:
+        streamer_font = marquee.FallbackFont(bitmap_font.load_font(STREAMER_SUBSET_FONT),
+                                             lambda: bitmap_font.load_font(STREAMER_FONT))
+    except OSError:
+        streamer_font = bitmap_font.load_font(STREAMER_FONT)
+    loaded_glyphs = set()    # characters already loaded from streamer_font
+    load_name_glyphs([LOGIN_GLYPHS])
+    yield
+    load_name_glyphs(STREAMER_NAMES)
+    print("Font loaded in",time.monotonic() - font_time,"s")
+    yield
+    twitchlogo, twitchpalette = adafruit_imageload.load("/twitchlogo.bmp",
+                            bitmap=displayio.Bitmap,
+                            palette=displayio.Palette)
+    twitchpalette.make_transparent(5)  # make the black in the logo transparent
+    yield
+    catjam, catpalette = adafruit_imageload.load("/catjamtiles.bmp",
+                            bitmap=displayio.Bitmap,
+                            palette=displayio.Palette)
+
+def load_nowlive_background():
+    """
+    Load the splash background the first time a splash is shown, most
+    of the time nobody goes live for a while after startup
+    """
+    global nowlive_grid  # pylint: disable=global-statement
+    if nowlive_grid is not None:
+        return
+    load_time = time.monotonic()
+    background, palette = adafruit_imageload.load("/wow.bmp",
+                            bitmap=displayio.Bitmap,
+                            palette=displayio.Palette)
+    nowlive_grid = displayio.TileGrid(background, pixel_shader=palette,
+                            width=scene.background_columns,
+                            height=scene.background_rows,
+                            tile_width=BACKGROUND_TILE[0],
+                            tile_height=BACKGROUND_TILE[1])
+    nowlive_group[0] = nowlive_grid
+    print("Splash background loaded in",time.monotonic() - load_time,"s")
+
+def save_snapshot():
+    """
+    Save the token and who is live for a warm start after a reset, nvm
+    is only written if they changed
+    """
+    live = [(key, stream.get('user_name', '')) for key, stream in live_state.streams.items()
+            if isinstance(key, int)]
+    now_utc = utc_now()
+    if warm.save(token, now_utc + token_expires - time.monotonic(), now_utc, live, golive_hours):
+        print("Warm start snapshot saved, nvm writes:",warm.writes,"skipped:",warm.skipped)
+
+def check_saved_token():
+    """
+    Once the rtc has the time from NTP, work out how long the token from
+    the warm start snapshot has left from when the snapshot says it
+    expires.  Until then it's used unchecked.
+    """
+    global token_expires, token_lifetime, token_unverified  # pylint: disable=global-statement
+    if token_unverified:
+        token_unverified = False
+        token_lifetime = warm.token_expires - utc_now()
+        token_expires = time.monotonic() + token_lifetime
+        print("Saved twitch token good for",token_lifetime,"s")
+
+def token_expiring():
+    """
+    True if there is no token or it is within TOKEN_REFRESH_MARGIN, or a
+    tenth of its lifetime, of expiring
+    """
+    margin = min(TOKEN_REFRESH_MARGIN, token_lifetime // 10)
+    return token is None or time.monotonic() > token_expires - margin
 
 def format_datetime(datetime):
     """
@@ -285,45 +868,323 @@ def format_datetime(datetime):
         datetime.tm_sec,
     )
 
-def show_gone_live(name):
+def set_marquee(names):
+    """
+    Draw the list of live streamers into a new marquee strip, only
+    needed when the list changes
+    :param names: list of names to show
+    """
+    profiler.begin(PHASE_MARQUEE)
+    # With more than one row the names are shared out between them
+    texts = [s + "  " for s in names]
+    rows = [(0, len(texts))]
+    if scene.rows > 1:
+        rows = layout.split_rows([marquee.text_width(streamer_font, text) for text in texts],
+                                 scene.rows, display.width)
+    while len(marquee_group):
+        marquee_group.pop()
+    marquee_widths.clear()
+    for row, (start, end) in enumerate(rows):
+        strip, width = marquee.render_strip(streamer_font, "".join(texts[start:end]),
+                                            display.width)
+        grid = displayio.TileGrid(strip, pixel_shader=marquee_palette)
+        grid.y = (scene.row_tops[row] + MARQUEE_MIDDLE
+                  - (streamer_font.ascent - streamer_font.ascent // 2))
+        marquee_group.append(grid)
+        marquee_widths.append(width)
+    mark_dirty(group)
+    profiler.end(PHASE_MARQUEE)
+
+def show_main_display():
+    """
+    Show the live display if anyone is live, otherwise a blank idle screen
+    """
+    if streamer_status:
+        show_group(group)
+    else:
+        show_group(blank_group)
+
+def show_group(new_group):
+    """
+    Show a group on the display, which then needs a refresh
+    :param new_group: the group to show
     """
-    Show a splash screen when a streamer goes live
+    global shown_group  # pylint: disable=global-statement
+    shown_group = new_group
+    display.show(new_group)
+    mark_dirty(new_group)
+
+def mark_dirty(changed_group):
+    """
+    Something in a group changed, the display needs a refresh if it's showing
+    :param changed_group: the group that changed
+    """
+    global display_dirty  # pylint: disable=global-statement
+    if changed_group is shown_group:
+        display_dirty = True
+
+def refresh_display():
+    """
+    With frame pacing, push everything that changed this loop to the
+    display in one refresh, or nothing if nothing changed.  Refreshes are
+    at most REFRESH_FPS, a change sooner than that after the last one
+    waits and goes with whatever changes next.  Returns nanoseconds
+    until a held back refresh is due, 0 if there isn't one.
+    """
+    global display_dirty, last_refresh_ns, refresh_count, refresh_skips, refresh_held  # pylint: disable=global-statement
+    if not USE_FRAME_PACING:
+        return 0
+    if not display_dirty:
+        refresh_skips += 1
+        return 0
+    now = time.monotonic_ns()
+    if now < last_refresh_ns + 1000000000 // REFRESH_FPS:
+        refresh_held += 1
+        return last_refresh_ns + 1000000000 // REFRESH_FPS - now
+    # Not target_frames_per_second, CircuitPython skips the refresh if the
+    # last call was more than a frame ago, which it always is after
+    # sleeping until the next animation
+    display.refresh()
+    last_refresh_ns = now
+    display_dirty = False
+    refresh_count += 1
+    return 0
+
+def queue_gone_live(name):
+    """
+    Queue up a splash screen for a streamer who has gone live, the main
+    loop shows them with animate_splash() so polling keeps going
     :param str name: The name to display (not verified with twitch)
     """
     print(name,"has gone live")
-    nowlive2_text.text = name
-    nowlive_group[1].x = 24
+    nowlive_queue.append(name)
+
+def apply_events(events):
+    """
+    Show the changes from live_state, from a poll or EventSub.  The
+    marquee is only redrawn when the list of names has changed.
+    :param events: list of events from live_state
+    """
+    global streamer_status, render_count, render_skips, snapshot_due  # pylint: disable=global-statement
+    names_changed = False
+    for kind, stream, old in events:
+        name = stream.get('user_name')
+        if kind == livestate.WENT_LIVE:
+            # a garish "now live" notification screen
+            hour = time.localtime().tm_hour
+            golive_hours[hour] = min(golive_hours[hour] + GOLIVE_COUNT, 255)
+            load_name_glyphs((name,))   # display names can have characters logins don't
+            queue_gone_live(name)
+        elif kind == livestate.WENT_OFFLINE:
+            # just give an output to the serial
+            print(name,"has gone offline")
+        elif kind == livestate.RENAMED:
+            load_name_glyphs((name,))
+            print(old,"is now",name)
+        elif kind == livestate.TITLE_CHANGED:
+            print(name,"changed title to",stream['title'])
+        elif kind == livestate.GAME_CHANGED:
+            print(name,"is now playing",stream['game_name'])
+        elif kind == livestate.VIEWER_MILESTONE:
+            print(name,"has over",old,"viewers")
+        names_changed = names_changed or kind in livestate.NAME_EVENTS
+
+    # If anyone is live show the live display, otherwise blank idle
+    # screen.  Not while a splash is showing.
+    if names_changed:
+        snapshot_due = True
+        render_count += 1
+        streamer_status = live_state.names()
+        set_marquee(streamer_status)
+        if splash_items is None:
+            show_main_display()
+    else:
+        render_skips += 1
+
+def set_splash_name(name):
+    """
+    Put a name (or list of names) on the splash screen
+    :param str name: The text to display
+    """
+    global splash_scroll, splash_name_grid  # pylint: disable=global-statement
+    profiler.begin(PHASE_SPLASH)
+    # If the name is too wide to fit on the screen it is drawn
+    # ready for continuous wrap-around scrolling
+    strip, width = marquee.render_strip(streamer_font, name + "   ", display.width)
+    splash_name_grid = displayio.TileGrid(strip, pixel_shader=splash_palette)
+    splash_name_grid.y = display.height - strip.height * 6 // 5
+    splash_scroll = 0
+    if width > display.width:
+        splash_scroll = width
+    else:
+        splash_name_grid.x = (display.width - marquee.text_width(streamer_font, name)) // 2
+    nowlive_group[3] = splash_name_grid
+    profiler.end(PHASE_SPLASH)
+
+def start_splash():
+    """
+    Start the splash screen for everyone in the queue.  One name is shown
+    for NOWLIVE_DELAY, a few are rotated through NOWLIVE_ITEM_DELAY each,
+    and more than NOWLIVE_MERGE_COUNT are merged into one scrolling line.
+    """
+    global splash_items, splash_item_delay, splash_time  # pylint: disable=global-statement
+    load_nowlive_background()
+    if len(nowlive_queue) == 1:
+        splash_items = [nowlive_queue[0]]
+        splash_item_delay = NOWLIVE_DELAY
+    elif len(nowlive_queue) <= NOWLIVE_MERGE_COUNT:
+        splash_items = list(nowlive_queue)
+        splash_item_delay = NOWLIVE_ITEM_DELAY
+    else:
+        splash_items = ["  ".join(nowlive_queue)]
+        splash_item_delay = NOWLIVE_DELAY
+    nowlive_queue.clear()
+    nowlive_group[1].x = scene.splash_logo_x
     nowlive_group[1].y = 0
+    set_splash_name(splash_items[0])
+    splash_time = time.monotonic()
+    show_group(nowlive_group)
+
+def animate_splash():
+    """
+    Animate one frame of the splash screen and move on to the next name
+    when it's time.  Goes back to the main display when they're all shown.
+    Returns True if anything changed, like the other animations.
+    """
+    global splash_items, splash_time, splash_color  # pylint: disable=global-statement
+    if splash_items is None:
+        return False
+    if time.monotonic() - splash_time > splash_item_delay:
+        splash_items.pop(0)
+        if not splash_items:
+            splash_items = None
+            show_main_display()
+            return True
+        set_splash_name(splash_items[0])
+        splash_time = time.monotonic()
+
+    for tile in range(scene.background_columns * scene.background_rows):
+        nowlive_grid[tile] = splash_color  # animate background
+    splash_color += 1
+    if splash_color > 2:
+        splash_color = 0
+    nowlive_text_cycle.step()  # animate live now colours
+    # If the streamer name is wider than the display, scroll
+    if splash_scroll:
+        if splash_name_grid.x <= - splash_scroll:
+            splash_name_grid.x = 0
+        else:
+            splash_name_grid.x += -1
+    return True
+
+nowlive_queue = []       # names waiting for a "now live" splash
+splash_items = None      # names being shown on the splash screen, None if not showing
+splash_item_delay = 0    # seconds to show each of splash_items
+splash_time = 0          # when the current splash name started showing
+splash_color = 0         # background tile and colour of the splash animation
+splash_scroll = 0        # width to scroll the splash name before wrapping, 0 if it fits
 
-    # If the name is too wide to fit on the screen,
-    # prepare for continuous wrap-around scrolling
-    if nowlive2_text.width > display.width:
-        reset_scroll = nowlive2_text.bounding_box[2]
-        nowlive2_text.text += " " + name
-        nowlive2_text.x = 0
-
-    display.show(nowlive_group)
-
-    live_color = 0
-    live_t = time.monotonic()
-    while time.monotonic() - live_t < NOWLIVE_DELAY:
-        if USE_WATCHDOG:
-            microcontroller.watchdog.feed()
-        nowlive_grid[0]=live_color  # animate background
-        live_color += 1
-        nowlive1_text.color = livetext_colors[live_color]  # animate live now colours
-        if live_color > 2:
-            live_color = 0
-        # If the streamer name is wider than the display, scroll
-        if nowlive2_text.width > display.width:
-            if nowlive2_text.x <= - reset_scroll - 3:
-                nowlive2_text.x = 0
+def add_animation(step, hz, draws_on):
+    """
+    Register an animation with the scheduler
+    :param step: function that moves the animation along one step,
+        returns True if it changed anything
+    :param hz: how many steps per second
+    :param draws_on: the group it changes, the display only needs a
+        refresh for it while that group is showing
+    """
+    period = 1000000000 // hz
+    animations.append([step, period, time.monotonic_ns() + period,
+                       profiler.phase(step.__name__), draws_on])
+
+def run_animations():
+    """
+    Step every animation that is due.  If the loop was held up an animation
+    takes as many steps as it missed (up to ANIMATION_MAX_CATCHUP) so it
+    keeps its speed, and deadlines move on by whole periods so they don't
+    drift.  Times are in monotonic_ns() so they stay exact on long uptimes.
+    Returns nanoseconds until the next animation is due.
+    """
+    global animation_frames, animation_misses  # pylint: disable=global-statement
+    animation_frames += 1
+    now = time.monotonic_ns()
+    next_deadline = now + 1000000000
+    for anim in animations:
+        step, period, deadline, phase, draws_on = anim
+        if now >= deadline:
+            steps = (now - deadline) // period + 1
+            anim[2] = deadline + steps * period
+            animation_misses += steps - 1
+            profiler.begin(phase)
+            for _ in range(min(steps, ANIMATION_MAX_CATCHUP)):
+                if step():
+                    mark_dirty(draws_on)
+            profiler.end(phase)
+        next_deadline = min(next_deadline, anim[2])
+    return max(0, next_deadline - time.monotonic_ns())
+
+def animate_catjam():
+    """
+    Next frame of catJAM
+    """
+    global catjam_frame  # pylint: disable=global-statement
+    catjam_frame=catjam_frame + 1
+    if catjam_frame > 14:
+        catjam_frame = 0
+    catjam_grid[0]=catjam_frame
+    return True
+
+def animate_twitchlogo():
+    """
+    Move the twitch logo back and forth
+    """
+    global twitch_logo_direction  # pylint: disable=global-statement
+    logo_grid.x = logo_grid.x + twitch_logo_direction
+    if logo_grid.x >= scene.logo_right or logo_grid.x <= scene.logo_left:
+        twitch_logo_direction = -twitch_logo_direction
+    return True
+
+def animate_livetext():
+    """
+    Color cycle the "live" text
+    """
+    return live_text_cycle.step()
+
+def scroll_streamer_text():
+    """
+    Show the streamers who are live, scroll each row that's longer than the display
+    """
+    scrolled = False
+    for row, width in enumerate(marquee_widths):
+        if width > display.width:
+            grid = marquee_group[row]
+            if grid.x <= - width:
+                grid.x = 0
             else:
-                nowlive2_text.x += -1
-        time.sleep(0.1)
-    nowlive2_text.text=" "
+                grid.x += streamertext_direction
+            scrolled = True
+    return scrolled
+
+def animate_streamer_text_color():
+    """
+    Animate the colours of the list of names of live streamers
+    """
+    return marquee_cycle.step()
+
+animations = []          # [step function, period ns, next deadline ns, profiler phase, group] for each animation
+shown_group = message_group  # what's on the display
+display_dirty = False    # something showing has changed since the last refresh
+last_refresh_ns = 0      # time.monotonic_ns() of the last refresh
+refresh_count = 0        # display refreshes since the last report
+refresh_skips = 0        # loops that had nothing to refresh
+refresh_held = 0         # refreshes held back to keep to REFRESH_FPS
+idle_ns = 0              # loop time spent sleeping since the last report
+animation_frames = 0     # frames run since the last report, for FPS
+animation_misses = 0     # animation steps that were late since the last report
 
 # -- Network startup
+boot_timeline = []         # (phase, start s, end s) from boot_start, printed once started
+wifi_start = time.monotonic()
 # If you are using a board with pre-defined ESP32 Pins:
 esp32_cs = DigitalInOut(board.ESP_CS)
 esp32_ready = DigitalInOut(board.ESP_BUSY)
@@ -343,7 +1204,7 @@ if esp.status == adafruit_esp32spi.WL_IDLE_STATUS:
     print("ESP32 found and in idle mode")
 print("Firmware vers.", esp.firmware_version)
 print("MAC addr:", [hex(i) for i in esp.MAC_address])
-message_text.text="Connecting"
+show_progress("Connecting")
 wifi = adafruit_esp32spi_wifimanager.ESPSPI_WiFiManager(esp, secrets, status_light, debug=DEBUG)
 wifi.connect()
 while not esp.is_connected:
@@ -354,79 +1215,239 @@ while not esp.is_connected:
         continue
 print("Connected to", str(esp.ssid, "utf-8"), "\tRSSI:", esp.rssi)
 print("IP address", esp.pretty_ip(esp.ip_address))
+boot_phase_done("wifi", wifi_start)
 
-# Get twitch auth token
-message_text.text="Get Token"
-print("Getting twitch authorization token")
-token = get_twitch_token()
-if token is None:
-    message_text.text = "Token error"
-    display.show(message_group)
-    time.sleep(30)
-    microcontroller.reset()
-
-# Sync time with NTP server
-message_text.text="Sync Time"
-print("Syncing time",end="")
-time_valid = False
-while not time_valid:
-    time_valid = True
-    try:
-        current_unix_time = esp.get_time()
-    except OSError:
-        time_valid = False
-        print(".",end="")
-        time.sleep(1)
-# Adjust utc to local time the easy way
-now_timezone = time.localtime(esp.get_time()[0]+TIMEZONE_OFFSET*3600)
-rtc.RTC().datetime = now_timezone
-print("\nTime:", format_datetime(time.localtime()))
-
-# Get initial status of streamers
-message_text.text="Get status"
-streamer_status = get_twitch_multi_status(token,STREAMER_NAMES)
-streamer_status_prev = streamer_status  # no "now live" notifications if already live on boot
-
-# Make the label of live streamers for the display
-streamers_live = ""
-for s in streamer_status:
-    streamers_live += s + "  "
-streamer_text.text = streamers_live
-
-# Check if list of streamers is wider than the display
-# if so add a second copy so we can do seamless
-# wraparound scrolling
-streamertext_bound = streamer_text.bounding_box[2]
-if streamer_text.width > display.width:
-    streamer_text.text += streamer_text.text
+# Helix requests can go through a recorder, or be answered from a log
+helix_log = None
+helix_requests = wifi
+if HELIX_REPLAY_FILE or HELIX_RECORD_FILE:
+    import helixlog
+if HELIX_REPLAY_FILE:
+    helix_log = helixlog.Replay(HELIX_REPLAY_FILE, HELIX_REPLAY_SPEED)
+    helix_requests = helix_log
+    print("Replaying",helix_log.count,"Helix responses from",HELIX_REPLAY_FILE,
+          "at",HELIX_REPLAY_SPEED,"x")
+elif HELIX_RECORD_FILE:
+    helix_log = helixlog.Recorder(wifi, HELIX_RECORD_FILE)
+    helix_requests = helix_log
+    print("Recording Helix responses to",HELIX_RECORD_FILE)
+
+# Status requests keep their connection to api.twitch.tv open between polls,
+# the session the wifi manager uses is passed along so new sockets can be spotted
+helix = helixsession.HelixSession(helix_requests, getattr(requests, "_default_session", None))
+
+# With a hub there's one connection to it instead of any to twitch
+hub = None
+hub_live = False      # connected to the hub and hearing from it
+if HUB_ADDRESS:
+    import hubclient
+    hub = hubclient.HubClient(socket, HUB_ADDRESS, STREAMER_NAMES)
+
+# After a watchdog (or software) reset, start from the snapshot in nvm
+# instead of from scratch.  A power on starts cold, the snapshot's time
+# could be days old.
+warm = warmstart.WarmStart(getattr(microcontroller, "nvm", None))
+snapshot_due = False       # token or live set changed since the snapshot was saved
+warm_start = (microcontroller.cpu.reset_reason in (microcontroller.ResetReason.WATCHDOG,
+                                                   microcontroller.ResetReason.SOFTWARE)
+              and warm.load())
+print("Warm start" if warm_start else "Cold start", "after reset:",microcontroller.cpu.reset_reason)
+
+# Get the twitch token and the time from NTP while the font and images
+# load, none of them need the others.  The token request blocks but
+# NTP is mostly waiting for the ESP32, which can happen meanwhile.
+token = None               # current twitch oauth token
+token_expires = 0          # time.monotonic() when token expires
+token_lifetime = 0         # how many seconds the token was good for when it was got
+token_refreshes = 0        # how many tokens have been fetched
+token_auth_failures = 0    # how many times twitch rejected the token (401)
+token_unverified = False   # token is from the snapshot and the rtc isn't set to check it yet
+time_valid = False         # rtc set from NTP
+ntp_retry_time = 0         # time.monotonic() to try NTP again
+boot_phases = []
+# After a warm start NTP is tried once here and then from the main loop,
+# the rtc isn't set until it answers
+if warm_start:
+    time_valid = sync_time()
+else:
+    boot_phases.append(("time", ntp_phase()))
+if HUB_ADDRESS:
+    print("Live status from the hub, no twitch token needed")
+elif warm_start and warm.token:
+    # The snapshot is only written when something changes, so it can be
+    # days older than the reset.  The token is checked against when it
+    # expires once the rtc has the time, until then it's used unchecked
+    # and if twitch rejects it a new one is fetched.
+    token = warm.token
+    token_unverified = True
+    token_lifetime = TOKEN_DEFAULT_LIFETIME
+    token_expires = time.monotonic() + token_lifetime
+    if time_valid:
+        check_saved_token()
+    else:
+        print("Using saved twitch token until the time is synced")
+if not HUB_ADDRESS and token_expiring():
+    boot_phases.append(("token", token_phase()))
+boot_phases.append(("assets", assets_phase()))
+run_boot_phases(boot_phases)
+boot_phases = None
+if time_valid:
+    print("Time:", format_datetime(time.localtime()))
+else:
+    print("Time not synced yet")
+
+# --- Live display setup, now the images are loaded ---
+# A garishly complicated "now live" display featuring:
+# - "LIVE" flashing
+# - Twitch logo prowling back and forth
+# - catJAM, what more can I say
+# - list of streamers currently live
+# laid out for the size of the display
+scene = layout.Layout(display.width, display.height, (twitchlogo.width, twitchlogo.height),
+                      CATJAM_TILE, BACKGROUND_TILE)
+print("Layout:",scene,"at",matrix_bit_depth,"bits per color")
+logo_grid = displayio.TileGrid(twitchlogo, pixel_shader=twitchpalette)
+catjam_grid = displayio.TileGrid(catjam, pixel_shader=catpalette,
+                        width=1,
+                        height=1,
+                        tile_width=CATJAM_TILE,
+                        tile_height=CATJAM_TILE)
+group.append(logo_grid)    # Item 0
+group.append(catjam_grid)  # Item 1
+
+# Color cycling is palette animation: "LIVE", the names and "LIVE NOW"
+# are drawn once into bitmaps and palettecycle steps entry 1 of their
+# palettes through colors worked out here, gamma corrected for the matrix
+live_palette = displayio.Palette(2)
+live_palette.make_transparent(0)
+live_strip, live_width = marquee.render_strip(terminalio.FONT, "LIVE", display.width)
+live_text = displayio.TileGrid(live_strip, pixel_shader=live_palette)
+group.append(live_text)  # Item 2
+
+# The names of live streamers are drawn once into a bitmap strip by
+# marquee.render_strip() when the list changes, scrolling just moves it
+marquee_palette = displayio.Palette(2)
+marquee_palette.make_transparent(0)
+marquee_group = displayio.Group()   # a strip for each row in use
+marquee_widths = []   # width of the names in each row's strip, it scrolls if wider than the display
+group.append(marquee_group) # Item 3
+
+# twitch logo
+group[0].x = 0
+group[0].y = 0
+
+# catJAM
+group[1].x = scene.catjam_x
+group[1].y = 0
+
+# "LIVE" text, live_middle is the middle of the text
+terminal_ascent = marquee.font_metrics(terminalio.FONT)[0]
+group[2].x = scene.live_x
+group[2].y = scene.live_middle - (terminal_ascent - terminal_ascent // 2)
+livetext_colors = [(0,255,0),(0,255,255),(0,0,255),(255,255,0)]
+live_text_cycle = palettecycle.PaletteCycle(live_palette, (1,),
+                        palettecycle.gamma_ramp(livetext_colors, bit_depth=matrix_bit_depth))
+
+# Streamer names, set_marquee() puts a strip in each of the layout's rows
+group[3].x = 0
+# white fading to grey and back
+streamertext_colors = [(255,255,255),(150,150,150)]
+marquee_cycle = palettecycle.PaletteCycle(marquee_palette, (1,),
+                        palettecycle.gamma_ramp(streamertext_colors, steps=3,
+                                                bit_depth=matrix_bit_depth))
+
+# Splash screen for when a streamer goes live
+nowlive_group = displayio.Group()
+nowlive_grid = None   # wow.bmp, loaded by load_nowlive_background() for the first splash
+# "LIVE NOW" centred, sitting on the middle line of the display, its
+# colours go round with the three background tiles
+nowlive_palette = displayio.Palette(2)
+nowlive_palette.make_transparent(0)
+nowlive_strip, nowlive_width = marquee.render_strip(terminalio.FONT, "LIVE NOW", display.width)
+nowlive1_text = displayio.TileGrid(nowlive_strip, pixel_shader=nowlive_palette,
+                x=(display.width - nowlive_width) // 2,
+                y=display.height // 2 - nowlive_strip.height)
+nowlive_text_cycle = palettecycle.PaletteCycle(nowlive_palette, (1,),
+                        palettecycle.gamma_ramp(livetext_colors[1:], bit_depth=matrix_bit_depth))
+# The splash name is a marquee strip too
+splash_palette = displayio.Palette(2)
+splash_palette.make_transparent(0)
+splash_palette[1] = (0,255,0)
+splash_name_grid = displayio.TileGrid(displayio.Bitmap(1, 1, 2), pixel_shader=splash_palette)
+nowlive_logo = displayio.TileGrid(twitchlogo, pixel_shader=twitchpalette)
+nowlive_group.append(displayio.Group())   # 0, the background once it's loaded
+nowlive_group.append(nowlive_logo)   # 1
+nowlive_group.append(nowlive1_text)  # 2
+nowlive_group.append(splash_name_grid)  # 3
+
+# Status is polled by user id, looked up once and cached on flash
+phase_start = time.monotonic()
+user_cache = usercache.UserCache(USER_CACHE_FILE, USER_CACHE_TTL)
+print("User ids cached:",user_cache.load())
+if not warm_start and not HUB_ADDRESS:   # after a warm start the first poll looks them up
+    show_progress("Get users")
+    if not run_task(user_cache_task()):
+        print("Couldn't look up user ids, polling by login for now")
+boot_phase_done("users", phase_start)
+# Status URLs are built once, split into batches twitch will accept
+status_urls = build_status_urls(user_cache.ids(STREAMER_NAMES),
+                                user_cache.unresolved(STREAMER_NAMES))
+status_batch_times = []  # seconds taken by each batch on the last poll
+ratelimit_remaining = None  # requests left according to twitch's Ratelimit-Remaining
+ratelimit_reset = 0         # unix time twitch's rate limit bucket refills
+poll_errors = 0             # status polls that failed in a row
+golive_hours = bytearray(24)  # go-lives in each hour of the day, GOLIVE_COUNT each, fading
+golive_decay_time = time.monotonic()  # when golive_hours last faded
+if warm_start:
+    golive_hours[:] = warm.golive_hours
+
+# Get initial status of streamers, no "now live" notifications if already live on boot.
+# After a warm start who was live is in the snapshot, the first poll
+# is straight away and only splashes for anyone new.
+phase_start = time.monotonic()
+live_state = livestate.LiveState(VIEWER_MILESTONES)
+if warm_start:
+    for user_id, name in warm.live:
+        live_state.set_live({'user_id': user_id, 'user_name': name})
+else:
+    show_progress("Get status")
+    if HUB_ADDRESS:
+        initial_status = run_task(hub_connect_task())
+    else:
+        initial_status = get_twitch_multi_status(status_urls)
+    if initial_status:
+        live_state.update(initial_status)
+    initial_status = None
+    snapshot_due = True
+streamer_status = live_state.names()  # display names of who is live, for the marquee
+boot_phase_done("status", phase_start)
+
+# Make the marquee of live streamers for the display
+load_name_glyphs(streamer_status)
+marquee_time = time.monotonic()
+set_marquee(streamer_status)
+print("Marquee drawn in",time.monotonic() - marquee_time,"s")
+boot_phase_done("marquee", marquee_time)
 
 # If anyone is live from the start, show the live display
 # Otherwise, blank idle screen
-if streamer_status:
-    display.show(group)
-else:
-    display.show(blank_group)
+show_main_display()
 
 refresh_time = time.monotonic()
+poll_delay = 0 if warm_start else next_poll_delay()
 catjam_frame=0             # frame of catJAM tilegrid to show
-catjam_delay = 0           # counter interval to animate catJAM
-twitchlogo_delay = 0       # counter interval to move twitch logo
-livetext_delay = 0         # counter interval to change "LIVE" color
-streamertext_delay = 0     # counter interval to scroll streamer names (if scrollable)
-livetext_color_index = 0   # index of color in livetext_colors[] to show streamer live names in
 twitch_logo_direction = 1  # direction twitch logo moves, -1/+1 alternates
 streamertext_direction = -1 # list of live streamers scrolls to the left
-streamertext_color_index = 0  # index of color in streamertext_colors[] to show streamer live names in
-streamertext_color_delay = 0  # counter interval to update streamer name colors
 
-# --- Watchdog timer ---
-try:
-    from streamer import USE_WATCHDOG
-except ImportError:
-    print("set USE_WATCHDOG as True or False in streamer.py for watchdog reset")
-    print("assuming no watchdog")
-    USE_WATCHDOG=False
+# Each animation steps at its own rate, from the clock rather than loop counts
+add_animation(animate_catjam, CATJAM_HZ, group)
+add_animation(animate_twitchlogo, TWITCHLOGO_HZ, group)
+add_animation(animate_livetext, LIVETEXT_HZ, group)
+add_animation(scroll_streamer_text, STREAMERTEXT_SCROLL_HZ, group)
+add_animation(animate_streamer_text_color, STREAMERTEXT_COLOR_HZ, group)
+add_animation(animate_splash, NOWLIVE_HZ, nowlive_group)
 
+# --- Watchdog timer ---
 if USE_WATCHDOG:
     print("Watchdog function enabled")
     microcontroller.watchdog.timeout = 16  # 16 seconds longest possible on Matrix Portal M4
@@ -434,92 +1455,209 @@ if USE_WATCHDOG:
 else:
     print("Watchdog function disabled")
 
+boot_seconds = time.monotonic() - boot_start
+print("Boot took",boot_seconds,"s,","warm" if warm_start else "cold","start")
+for boot_phase in boot_timeline:
+    print("  %-8s %6.2f - %6.2f s" % boot_phase)
+
+status_poll = None   # status poll in progress, from twitch_status_task()
+frame_time = time.monotonic()  # when the last frame started
+frame_stall_max = 0  # longest frame since the last poll finished, seconds
+animation_report_time = time.monotonic_ns()  # when FPS was last reported
+render_count = 0     # polls that changed what's on the display
+render_skips = 0     # polls that didn't, so nothing was redrawn
+render_report_time = time.monotonic()  # when skipped redraws were last reported
+profile_dump_time = time.monotonic()   # when the profiler was last dumped
+
+# EventSub pushes go-lives as they happen if there's a user token for it
+use_eventsub = (USE_EVENTSUB and 'twitch_user_token' in secrets and not HUB_ADDRESS
+                and not HELIX_REPLAY_FILE)
+if len(STREAMER_NAMES) * 2 > EVENTSUB_MAX_SUBSCRIPTIONS:
+    print("Too many streamers for EventSub, polling only")
+    use_eventsub = False
+push = None
+if use_eventsub:
+    import eventsub
+    push = eventsub.EventSub(socket)
+push_setup = None     # EventSub setup in progress, from eventsub_task()
+push_live = False     # subscribed and hearing from twitch
+push_since = None     # when EventSub first started working
+push_retry_time = 0   # time.monotonic() to try setting up EventSub again
+push_retry_delay = EVENTSUB_RETRY_DELAY
+reconcile_time = time.monotonic()  # when the status was last polled
+requests_saved = 0    # status requests not needed thanks to EventSub
+
+# From here on the main loop refreshes the display itself
+if USE_FRAME_PACING:
+    display.auto_refresh = False
+
 # The main loop which updates the animations and checks streamer statuses
 while True:
     if USE_WATCHDOG:
         microcontroller.watchdog.feed()
-    # Update list of live streamers on schedule
-    if time.monotonic() - refresh_time > UPDATE_DELAY:
-        print("\nTime:", format_datetime(time.localtime()))
+    frame_stall_max = max(frame_stall_max, time.monotonic() - frame_time)
+    frame_time = time.monotonic()
+    # After a warm start the rtc isn't set until the ESP32 has the time,
+    # then the saved token can be checked
+    if not time_valid and frame_time > ntp_retry_time:
+        ntp_retry_time = frame_time + NTP_RETRY_DELAY
+        time_valid = sync_time()
+        if time_valid:
+            print("Time synced:", format_datetime(time.localtime()))
+            check_saved_token()
+    # The snapshot needs the real time for when the token expires
+    if snapshot_due and time_valid and status_poll is None:
+        snapshot_due = False
+        save_snapshot()
+    # Update list of live streamers on schedule.  While EventSub is
+    # working only every EVENTSUB_RECONCILE_DELAY, to catch anything missed
+    if (status_poll is None and push_setup is None
+            and time.monotonic() - refresh_time > poll_delay):
         refresh_time = time.monotonic()
-
-        print("Getting status for",STREAMER_NAMES)
-        # Build a new label of live streamers
-        streamers_live = ""
-        streamer_status_prev = streamer_status
-        streamer_status = get_twitch_multi_status(token,STREAMER_NAMES)
-        # if the streamer is live now, but in last update was not
-        # so a garish "now live" notification screen
-        for s in streamer_status:
-            if s not in streamer_status_prev:
-                show_gone_live(s)
-                streamer_text.x = 0 # text line will change, reset position
-            streamers_live += s + "  "
-        print("Currently live:",streamers_live)
-        # If streamer is not live now, but was live in the last update
-        # just give an output to the serial
-        for s in streamer_status_prev:
-            if s not in streamer_status:
-                print(s,"has gone offline")
-                streamer_text.x = 0  # text line will change, reset position
-        streamer_text.text = streamers_live
-        streamertext_bound = streamer_text.bounding_box[2]
-        # Check if list of streamers is wider than the display
-        # if so add a second copy so we can do seamless
-        # wraparound scrolling
-        if streamer_text.width > display.width:
-            streamer_text.text += streamer_text.text
-
-        # If anyone is live from the start, show the live display
-        # Otherwise, blank idle screen
-        if streamer_status:
-            display.show(group)
+        if HUB_ADDRESS:
+            # The hub polls twitch, only connect to it again if it went away
+            if not hub_live:
+                status_poll = hub_connect_task()
+        elif push_live and refresh_time - reconcile_time < EVENTSUB_RECONCILE_DELAY:
+            requests_saved += len(status_urls)
         else:
-            display.show(blank_group)
-    else:
-        time.sleep(SCROLL_DELAY)
-
-    # Animate catJAM
-    if catjam_delay > 3:
-        catjam_frame=catjam_frame + 1
-        if catjam_frame > 14:
-            catjam_frame = 0
-        catjam_grid[0]=catjam_frame
-        catjam_delay=0
-    catjam_delay += 1
-
-    # Animate Twitch logo
-    if twitchlogo_delay > 6:
-        logo_grid.x = logo_grid.x + twitch_logo_direction
-        if logo_grid.x > 27 or logo_grid.x < 1:
-            twitch_logo_direction = -twitch_logo_direction
-        twitchlogo_delay = 0
-    twitchlogo_delay += 1
-
-    # color cycle the "live" text
-    if livetext_delay > 6:
-        live_text.color = livetext_colors[livetext_color_index]
-        livetext_color_index += 1
-        if livetext_color_index > len(livetext_colors)-1:
-            livetext_color_index = 0
-        livetext_delay = 0
-    livetext_delay += 1
-
-    # Show the streamers who are live, if longer than the display scroll the text
-    if streamertext_delay > 1:
-        streamertext_delay = 0
-        if streamer_text.width > display.width:
-            if streamer_text.x <= - streamertext_bound:
-                streamer_text.x = 0
+            print("\nTime:", format_datetime(time.localtime()))
+            reconcile_time = refresh_time
+            print("Getting status for",STREAMER_NAMES)
+            status_poll = status_refresh_task()
+
+    # Set up EventSub when it's due, one step per frame like the status
+    # poll.  They share the connection to twitch so take turns.
+    if (use_eventsub and not push_live and push_setup is None and status_poll is None
+            and time.monotonic() > push_retry_time):
+        push_setup = eventsub_task()
+    if push_setup is not None:
+        try:
+            next(push_setup)
+        except StopIteration as done:
+            push_setup = None
+            if done.value:
+                push_live = True
+                push_retry_delay = EVENTSUB_RETRY_DELAY
+                if push_since is None:
+                    push_since = time.monotonic()
             else:
-                streamer_text.x += streamertext_direction
-    streamertext_delay += 1
-
-    # Animate the colours of the list of names of live streamers
-    if streamertext_color_delay > 4:
-        streamertext_color_delay=0
-        streamer_text.color = streamertext_colors[streamertext_color_index]
-        streamertext_color_index += 1
-        if streamertext_color_index > len(streamertext_colors)-1:
-            streamertext_color_index = 0
-    streamertext_color_delay += 1
+                push_retry_time = time.monotonic() + push_retry_delay
+                push_retry_delay = min(push_retry_delay * 2, POLL_MAX_DELAY)
+
+    # Go-lives pushed by EventSub, if it goes quiet go back to polling
+    if push_live:
+        for kind, event, latency in push.poll(utc_now() if time_valid else None):
+            print("EventSub:",event.get('broadcaster_user_name'),kind,"latency",latency,"s")
+            if kind == "stream.online":
+                apply_events(live_state.set_live({'user_id': event['broadcaster_user_id'],
+                                                  'user_name': event['broadcaster_user_name']}))
+            elif kind == "stream.offline":
+                apply_events(live_state.set_offline(event['broadcaster_user_id']))
+        if not push.alive:
+            print("EventSub connection lost, polling until it's back")
+            push.close()
+            push_live = False
+            push_retry_time = time.monotonic() + push_retry_delay
+            poll_delay = 0   # poll now in case something was missed
+
+    # Step the status poll along, one small piece per frame
+    new_status = None
+    if status_poll is not None:
+        profiler.begin(PHASE_POLL)
+        try:
+            next(status_poll)
+            while not POLL_STEPPED:
+                next(status_poll)
+        except StopIteration as done:
+            status_poll = None
+            new_status = done.value
+        profiler.end(PHASE_POLL)
+
+    # The hub sends what changed each time it polls twitch
+    if hub_live and new_status is None:
+        if hub.poll():
+            new_status = hub.stream_list()
+        if not hub.alive:
+            print("Lost the hub, connecting again")
+            hub.close()
+            hub_live = False
+            poll_delay = 0
+
+    if new_status is not None:
+        print("Worst frame stall since last poll",frame_stall_max,"s")
+        frame_stall_max = 0
+        report_ns = time.monotonic_ns() - animation_report_time
+        print("Animation FPS:",animation_frames * 1000000000 / report_ns,
+              "deadline misses:",animation_misses)
+        # Idle time is what's left over for polling and everything else
+        print("Display refreshes/s:",refresh_count * 1000000000 / report_ns,
+              "nothing changed:",refresh_skips,"held back:",refresh_held,
+              "idle:",idle_ns * 100 // report_ns,"%")
+        animation_report_time += report_ns
+        animation_frames = 0
+        animation_misses = 0
+        refresh_count = 0
+        refresh_skips = 0
+        refresh_held = 0
+        idle_ns = 0
+        events = []
+        if new_status is False:
+            # Request failed, keep showing what we had and try again later
+            print("Status failed, token refreshes:",token_refreshes,
+                  "auth failures:",token_auth_failures)
+            poll_errors += 1
+        else:
+            poll_errors = 0
+            profiler.begin(PHASE_DIFF)
+            events = live_state.update(new_status)
+            profiler.end(PHASE_DIFF)
+        new_status = None
+        if HUB_ADDRESS:
+            print("Hub",hub.report())
+        else:
+            print("Status took",sum(status_batch_times),"s over",len(status_batch_times),"batches")
+            print("Helix",helix.report())
+            if helix_log is not None:
+                print("Helix log",helix_log.report())
+        poll_delay = next_poll_delay()
+        if not HUB_ADDRESS:
+            print("Next poll in",poll_delay,"s, ratelimit remaining:",ratelimit_remaining)
+        if push_live:
+            print("EventSub",push.report())
+            print("Status requests saved by EventSub:",requests_saved,"about",
+                  requests_saved * 86400 // max(1, time.monotonic() - push_since),"a day")
+        apply_events(events)
+        print("Currently live:",streamer_status)
+        if time.monotonic() - render_report_time >= RENDER_REPORT_DELAY:
+            print("Redraws in the last hour:",render_count,"skipped:",render_skips)
+            render_report_time = time.monotonic()
+            render_count = 0
+            render_skips = 0
+
+    # Hours streamers have stopped going live in fade out, so they stop
+    # being polled fast
+    if time.monotonic() - golive_decay_time > GOLIVE_DECAY_DELAY:
+        golive_decay_time = time.monotonic()
+        for hour in range(24):
+            golive_hours[hour] = golive_hours[hour] * 3 // 4
+        snapshot_due = True
+
+    if USE_PROFILER and time.monotonic() - profile_dump_time > PROFILE_DUMP_DELAY:
+        profile_dump_time = time.monotonic()
+        profiler.dump()
+
+    # "Now live" splash screens, they play while polling carries on
+    if splash_items is None and nowlive_queue:
+        start_splash()
+
+    # Step the animations that are due, show what changed and sleep
+    # until the next one is due, unless there's a poll to get on with
+    animation_wait = run_animations()
+    refresh_wait = refresh_display()
+    if refresh_wait:
+        animation_wait = min(animation_wait, refresh_wait)
+    if status_poll is None:
+        sleep_start = time.monotonic_ns()
+        time.sleep(animation_wait / 1000000000)
+        idle_ns += time.monotonic_ns() - sleep_start
@@ -0,0 +1,367 @@
+"""
+Twitch EventSub over a WebSocket, so go-lives are pushed to the display
+instead of waiting for the next status poll.
+
+WebSocket is a small client for the socket module of adafruit_esp32spi:
+it does the upgrade handshake, unmasks and joins frames, answers pings
+and is read without blocking from the main loop, the handshake too.  EventSub handles the
+messages twitch sends on it: the welcome with the session id that
+subscriptions are made for, keepalives, notifications, revocations and
+reconnect requests (a new connection is opened to the URL twitch gives
+and the old one closed once it's welcomed, subscriptions carry over).
+https://dev.twitch.tv/docs/eventsub/handling-websocket-events/
+
+Subscribing is done over HTTP by the caller with subscription() bodies,
+it needs a user access token, twitch doesn't accept app tokens (the
+client credentials ones) for WebSocket subscriptions.
+"""
+import json
+import os
+import time
+import binascii
+
+EVENTSUB_URL = "wss://eventsub.wss.twitch.tv/ws"
+TLS_MODE = 2                 # adafruit_esp32spi's ESP_SPIcontrol.TLS_MODE
+KEEPALIVE_MARGIN = 5         # seconds past the keepalive timeout before giving up
+HANDSHAKE_TIMEOUT = 10       # seconds to wait for the upgrade response
+MAX_MESSAGE = 8192           # longest message kept, notifications are ~1K
+
+_OP_CONTINUATION = 0x0
+_OP_TEXT = 0x1
+_OP_CLOSE = 0x8
+_OP_PING = 0x9
+_OP_PONG = 0xA
+
+
+def split_url(url):
+    """
+    Split a wss:// URL into host, port and path
+    :param str url: the URL
+    """
+    rest = url.split("://", 1)[1]
+    host, _, path = rest.partition("/")
+    port = 443
+    if ":" in host:
+        host, port = host.split(":")
+        port = int(port)
+    return host, port, "/" + path
+
+
+def parse_timestamp(text):
+    """
+    Seconds since 1970 (UTC) for one of twitch's RFC3339 timestamps,
+    e.g. 2023-02-01T18:00:00.123456789Z, fractions of a second are dropped
+    :param str text: the timestamp
+    """
+    date, _, clock = text.partition("T")
+    year, month, day = (int(n) for n in date.split("-"))
+    hour, minute, second = (int(float(n)) for n in clock.rstrip("Z").split(":"))
+    # days since 1970 from the date, so it doesn't depend on the board's time zone
+    if month <= 2:
+        year -= 1
+        month += 12
+    days = 365 * year + year // 4 - year // 100 + year // 400 + (153 * (month - 3) + 2) // 5 + day - 719469
+    return days * 86400 + hour * 3600 + minute * 60 + second
+
+
+class WebSocket:
+    """
+    A WebSocket client connection, text messages only
+    :param socket_module: adafruit_esp32spi_socket (or anything like it)
+    :param str url: wss:// URL to connect to
+    :param int conntype: socket connect type, TLS for wss
+    """
+    def __init__(self, socket_module, url, conntype=TLS_MODE):
+        self._socket_module = socket_module
+        self.host, self.port, self.path = split_url(url)
+        self._conntype = conntype
+        self._socket = None
+        self._buffer = b""
+        self._fragments = None
+        self._opened = 0
+        self.opening = False     # upgrade request sent, waiting for the response
+        self.closed = True
+
+    def connect(self):
+        """
+        Open the connection and send the upgrade request, raises OSError
+        if it can't.  handshake() reads the response.
+        """
+        sock = self._socket_module.socket(self._socket_module.AF_INET,
+                                          self._socket_module.SOCK_STREAM)
+        sock.settimeout(HANDSHAKE_TIMEOUT)
+        sock.connect((self.host, self.port), self._conntype)
+        self._socket = sock
+        key = binascii.b2a_base64(os.urandom(16)).strip()
+        sock.send(b"GET " + self.path.encode() + b" HTTP/1.1\r\nHost: " + self.host.encode()
+                  + b"\r\nUpgrade: websocket\r\nConnection: Upgrade\r\nSec-WebSocket-Key: "
+                  + key + b"\r\nSec-WebSocket-Version: 13\r\n\r\n")
+        self._buffer = b""
+        self._opened = time.monotonic()
+        self.opening = True
+
+    def handshake(self):
+        """
+        Read what has arrived of the upgrade response without waiting,
+        returns True once the connection is open.  Raises OSError if it
+        was refused or took longer than HANDSHAKE_TIMEOUT.
+        """
+        if not self.opening:
+            return not self.closed
+        if self._socket.available():
+            self._buffer += self._socket.recv(0)
+        if b"\r\n\r\n" not in self._buffer:
+            if time.monotonic() - self._opened > HANDSHAKE_TIMEOUT or len(self._buffer) > 2048:
+                self.close()
+                raise OSError("WebSocket handshake timed out")
+            return False
+        headers, _, self._buffer = self._buffer.partition(b"\r\n\r\n")
+        if b" 101 " not in headers.split(b"\r\n", 1)[0]:
+            self.close()
+            raise OSError("WebSocket upgrade refused: " + str(headers.split(b"\r\n", 1)[0], "utf-8"))
+        self.opening = False
+        self.closed = False
+        return True
+
+    def _send(self, opcode, payload=b""):
+        # Frames from the client have to be masked
+        mask = os.urandom(4)
+        masked = bytearray(payload)
+        for i in range(len(masked)):
+            masked[i] ^= mask[i & 3]
+        self._socket.send(bytes((0x80 | opcode, 0x80 | len(masked))) + mask + masked)
+
+    def _next_frame(self):
+        """
+        Take a whole frame off the buffer, returns (fin, opcode, payload)
+        or None if there isn't a whole one yet
+        """
+        buf = self._buffer
+        if len(buf) < 2:
+            return None
+        length = buf[1] & 0x7F
+        start = 2
+        if length == 126:
+            if len(buf) < 4:
+                return None
+            length = (buf[2] << 8) | buf[3]
+            start = 4
+        elif length == 127:
+            if len(buf) < 10:
+                return None
+            length = int.from_bytes(buf[2:10], "big")
+            start = 10
+        if buf[1] & 0x80:
+            start += 4   # servers shouldn't mask, skip the key if one does
+        if length > MAX_MESSAGE:
+            raise OSError("WebSocket message too long")
+        if len(buf) < start + length:
+            return None
+        payload = buf[start:start + length]
+        if buf[1] & 0x80:
+            mask = buf[start - 4:start]
+            payload = bytes(b ^ mask[i & 3] for i, b in enumerate(payload))
+        self._buffer = buf[start + length:]
+        return buf[0] & 0x80, buf[0] & 0x0F, payload
+
+    def receive(self):
+        """
+        Read whatever has arrived without waiting, returns a list of the
+        text messages completed.  Sets closed if the connection went away.
+        """
+        messages = []
+        if self.closed:
+            return messages
+        try:
+            if self._socket.available():
+                data = self._socket.recv(0)
+                if not data:
+                    raise OSError("connection closed")   # readable with nothing to read
+                self._buffer += data
+            while True:
+                frame = self._next_frame()
+                if frame is None:
+                    break
+                fin, opcode, payload = frame
+                if opcode == _OP_PING:
+                    self._send(_OP_PONG, payload)
+                elif opcode == _OP_CLOSE:
+                    self.close()
+                    break
+                elif opcode in (_OP_TEXT, _OP_CONTINUATION):
+                    if opcode == _OP_TEXT:
+                        self._fragments = payload
+                    elif self._fragments is not None:
+                        self._fragments += payload
+                    if fin and self._fragments is not None:
+                        messages.append(str(self._fragments, "utf-8"))
+                        self._fragments = None
+        except (OSError, RuntimeError) as error:
+            print("WebSocket error:", error)
+            self.close()
+        return messages
+
+    def close(self):
+        """
+        Close the connection, saying goodbye first if it's still up
+        """
+        if self._socket is not None:
+            try:
+                if not self.closed:
+                    self._send(_OP_CLOSE, b"\x03\xe8")   # 1000, normal closure
+            except (OSError, RuntimeError):
+                pass
+            self._socket.close()
+            self._socket = None
+        self.opening = False
+        self.closed = True
+        self._buffer = b""
+
+
+class EventSub:
+    """
+    An EventSub WebSocket session
+    :param socket_module: adafruit_esp32spi_socket (or anything like it)
+    :param str url: where to connect, the real EventSub server by default
+    """
+    # pylint: disable=too-many-instance-attributes
+    def __init__(self, socket_module, url=EVENTSUB_URL):
+        self._socket_module = socket_module
+        self.url = url
+        self._ws = None
+        self._new_ws = None          # the connection twitch asked us to move to
+        self.session_id = None       # set by the welcome, subscribe with it
+        self.keepalive_timeout = 10
+        self._last_message = 0
+        self._seen = []              # recent message ids, twitch can send one twice
+        self.notifications = 0
+        self.latency_total = 0       # seconds from twitch sending to us reading
+        self.latency_max = 0
+        self.reconnects = 0
+        self.revoked = 0
+
+    def connect(self):
+        """
+        Open a new session, raises OSError if it can't connect.  poll()
+        does the handshake, the session_id is set once it has read the
+        welcome.
+        """
+        self.close()
+        self._ws = WebSocket(self._socket_module, self.url)
+        self._ws.connect()
+        self._last_message = time.monotonic()
+
+    @property
+    def alive(self):
+        """
+        Connected and hearing from twitch at least as often as it promised
+        """
+        return (self._ws is not None and (self._ws.opening or not self._ws.closed) and
+                time.monotonic() - self._last_message < self.keepalive_timeout + KEEPALIVE_MARGIN)
+
+    def poll(self, utc_now=None):
+        """
+        Handle what has arrived, returns a list of (subscription type,
+        event, seconds since twitch sent it) notifications.
+        :param utc_now: current seconds since 1970 UTC, to measure latency
+        """
+        notifications = []
+        if self._new_ws is not None:
+            self._read(self._new_ws, notifications, utc_now)
+            if self._new_ws is not None and self._new_ws.closed and not self._new_ws.opening:
+                self._new_ws = None   # the reconnect didn't work, stay on the old one
+        if self._ws is not None:
+            self._read(self._ws, notifications, utc_now)
+        return notifications
+
+    def _read(self, ws, notifications, utc_now):
+        # A step of the handshake until it's done, then messages
+        if ws.opening:
+            try:
+                if not ws.handshake():
+                    return
+            except (OSError, RuntimeError) as error:
+                print("EventSub:", error)
+                return
+        for message in ws.receive():
+            self._handle(message, notifications, utc_now)
+
+    def _handle(self, text, notifications, utc_now):
+        # pylint: disable=too-many-branches
+        try:
+            message = json.loads(text)
+            metadata = message["metadata"]
+            payload = message["payload"]
+            kind = metadata["message_type"]
+        except (ValueError, KeyError, TypeError):
+            print("EventSub: can't read message", text[:80])
+            return
+        self._last_message = time.monotonic()
+        message_id = metadata.get("message_id")
+        if message_id in self._seen:
+            return
+        self._seen.append(message_id)
+        if len(self._seen) > 10:
+            self._seen.pop(0)
+        if kind == "session_welcome":
+            session = payload["session"]
+            self.session_id = session["id"]
+            self.keepalive_timeout = session.get("keepalive_timeout_seconds") or self.keepalive_timeout
+            if self._new_ws is not None:
+                # Welcomed on the new connection, so the old one can go
+                self._ws.close()
+                self._ws = self._new_ws
+                self._new_ws = None
+        elif kind == "notification":
+            latency = None
+            if utc_now is not None and "message_timestamp" in metadata:
+                latency = max(0, utc_now - parse_timestamp(metadata["message_timestamp"]))
+                self.latency_total += latency
+                self.latency_max = max(self.latency_max, latency)
+            self.notifications += 1
+            notifications.append((payload["subscription"]["type"], payload["event"], latency))
+        elif kind == "session_reconnect":
+            print("EventSub: twitch asked to reconnect")
+            self.reconnects += 1
+            # Only the connect is done here, poll() steps the handshake
+            self._new_ws = WebSocket(self._socket_module, payload["session"]["reconnect_url"])
+            try:
+                self._new_ws.connect()
+            except (OSError, RuntimeError) as error:
+                print("EventSub: reconnect failed", error)
+                self._new_ws = None
+        elif kind == "revocation":
+            self.revoked += 1
+            print("EventSub: subscription revoked,", payload["subscription"].get("status"))
+
+    def close(self):
+        """
+        Close the session, its subscriptions end with it
+        """
+        for ws in (self._ws, self._new_ws):
+            if ws is not None:
+                ws.close()
+        self._ws = None
+        self._new_ws = None
+        self.session_id = None
+
+    def report(self):
+        """
+        A line about notifications for the serial console
+        """
+        return "notifications: %d latency avg %d s max %d s, reconnects: %d, revoked: %d" % (
+            self.notifications, self.latency_total // max(self.notifications, 1),
+            self.latency_max, self.reconnects, self.revoked)
+
+
+def subscription(kind, user_id, session_id):
+    """
+    The body to POST to /helix/eventsub/subscriptions to get kind
+    ("stream.online" or "stream.offline") notifications for a broadcaster
+    :param str kind: subscription type
+    :param str user_id: the broadcaster's user id
+    :param str session_id: EventSub.session_id
+    """
+    return {"type": kind, "version": "1",
+            "condition": {"broadcaster_user_id": user_id},
+            "transport": {"method": "websocket", "session_id": session_id}}
@@ -0,0 +1,159 @@
+"""
+Heap and timing profiler for the main loop.
+
+Code is marked out into named phases with begin() and end().  Each end()
+records how long the phase took, gc.mem_free() after it and how much it
+allocated (the change in gc.mem_alloc(), negative if a collection ran in
+the middle) into a fixed size ring buffer, so profiling doesn't itself
+use more memory the longer it runs.  Totals per phase are kept too.
+
+dump() prints the buffer and the totals to the serial console as short
+lines starting with "prof" that tools/plot_profile.py turns into charts:
+    prof H <uptime ms> <mem_free> <largest free block> <samples lost>
+    prof S <phase> <ms since last dump> <us> <mem_free> <allocated>
+    prof T <phase> <count> <total us> <max us> <total allocated>
+"""
+import gc
+import time
+from array import array
+
+
+def mem_free():
+    """
+    Free heap in bytes, 0 where gc.mem_free() isn't available (CPython)
+    """
+    try:
+        return gc.mem_free()
+    except AttributeError:
+        return 0
+
+
+def mem_alloc():
+    """
+    Allocated heap in bytes, 0 where gc.mem_alloc() isn't available (CPython)
+    """
+    try:
+        return gc.mem_alloc()
+    except AttributeError:
+        return 0
+
+
+def largest_free_block(step=256):
+    """
+    Estimate the largest block that can be allocated by trying sizes
+    (a binary search down to step bytes).  The heap fragments over time
+    so this falls well short of mem_free() on a long running board.
+    Allocates, so only call it now and then, e.g. from dump().
+    :param int step: how close the estimate needs to be
+    """
+    low = 0
+    high = mem_free()
+    while high - low > step:
+        size = (low + high) // 2
+        try:
+            block = bytearray(size)
+            block = None
+            low = size
+        except MemoryError:
+            high = size
+    return low
+
+
+class Profiler:
+    """
+    Ring buffer of phase timings and heap use
+    :param int size: samples kept between dumps, older ones are lost
+    :param bool enabled: if False begin() and end() do nothing
+    """
+    # pylint: disable=too-many-instance-attributes
+    def __init__(self, size=128, enabled=True):
+        self.enabled = enabled
+        self.names = []
+        self._size = size
+        self._next = 0         # where the next sample goes
+        self._count = 0        # samples since the last dump
+        self._lost = 0         # samples overwritten before they were dumped
+        self._dump_ns = time.monotonic_ns()
+        self._boot_ns = self._dump_ns
+        # Samples, one entry per sample
+        self._phase = bytearray(size)
+        self._when = array("L", [0] * size)     # ms since the last dump
+        self._took = array("L", [0] * size)     # microseconds
+        self._free = array("L", [0] * size)
+        self._alloc = array("l", [0] * size)
+        # Per phase, grown by phase()
+        self._start_ns = []
+        self._start_alloc = []
+        self._total_count = []
+        self._total_us = []
+        self._max_us = []
+        self._total_alloc = []
+
+    def phase(self, name):
+        """
+        Register a phase, returns its number for begin() and end()
+        :param str name: short name for the dump, no spaces
+        """
+        if name in self.names:
+            return self.names.index(name)
+        self.names.append(name)
+        for totals in (self._start_ns, self._start_alloc, self._total_count,
+                       self._total_us, self._max_us, self._total_alloc):
+            totals.append(0)
+        return len(self.names) - 1
+
+    def begin(self, phase):
+        """
+        Start timing a phase
+        :param int phase: number from phase()
+        """
+        if self.enabled:
+            self._start_alloc[phase] = mem_alloc()
+            self._start_ns[phase] = time.monotonic_ns()
+
+    def end(self, phase):
+        """
+        Finish timing a phase and record a sample
+        :param int phase: number from phase()
+        """
+        if not self.enabled:
+            return
+        now = time.monotonic_ns()
+        took = (now - self._start_ns[phase]) // 1000
+        allocated = mem_alloc() - self._start_alloc[phase]
+        i = self._next
+        self._phase[i] = phase
+        self._when[i] = (now - self._dump_ns) // 1000000
+        self._took[i] = took
+        self._free[i] = mem_free()
+        self._alloc[i] = allocated
+        self._next = (i + 1) % self._size
+        if self._count == self._size:
+            self._lost += 1
+        else:
+            self._count += 1
+        self._total_count[phase] += 1
+        self._total_us[phase] += took
+        self._max_us[phase] = max(self._max_us[phase], took)
+        self._total_alloc[phase] += allocated
+
+    def dump(self):
+        """
+        Print the samples since the last dump and the totals so far
+        """
+        if not self.enabled:
+            return
+        now = time.monotonic_ns()
+        print("prof H", (now - self._boot_ns) // 1000000, mem_free(),
+              largest_free_block(), self._lost)
+        i = (self._next - self._count) % self._size
+        for _ in range(self._count):
+            print("prof S", self.names[self._phase[i]], self._when[i], self._took[i],
+                  self._free[i], self._alloc[i])
+            i = (i + 1) % self._size
+        for phase, name in enumerate(self.names):
+            print("prof T", name, self._total_count[phase], self._total_us[phase],
+                  self._max_us[phase], self._total_alloc[phase])
+        self._count = 0
+        self._lost = 0
+        self._dump_ns = now
@@ -0,0 +1,442 @@
+"""
+Record what the Helix API sends, and play it back in place of twitch.
+
+A Recorder sits between HelixSession and the wifi manager and appends
+each response, with its headers and when it came, to a log file.  A
+Replay reads the log and answers the same requests from it, so a burst
+of go-lives, a huge watch list or a broken response can be played into
+code.py again, on the board or in the simulator, as fast as it happened
+or faster.
+
+The log is a record per response:
+    <ms> <method> <status> <body length> <url>     tab separated
+    <name>: <value>                                headers, tab separated
+    <body>                                         body length bytes, then a newline
+ms counts from the first request, it starts again from 0 after a reset
+and replay carries on from where the last run left off.  A status of 0
+is a request that failed, the body is the error.  Request headers
+aren't kept, so the token isn't in the log.
+
+The Recorder appends the body a chunk at a time as code.py reads it,
+so a big response is never held in memory.  The body length is written
+as spaces first and filled in once the body is done, a record left
+without one (the board reset part way through) ends the log.
+"""
+import json
+import time
+
+MAX_BYTES = 512 * 1024   # stop recording once the log is this big, CIRCUITPY is small
+LENGTH_WIDTH = 10        # room for a body length filled in after the body
+NOT_FOUND = b'{"error":"Not Found","status":404,"message":"Not in the replay log"}'
+
+
+def _record_header(ms, method, status, url, headers):
+    """
+    The two lines before a record's body, as the bytes before and after
+    the body length
+    """
+    fields = ""
+    for name, value in headers.items():
+        if fields:
+            fields += "\t"
+        fields += name.lower() + ": " + str(value).replace("\t", " ").replace("\n", " ")
+    return ("%d\t%s\t%d\t" % (ms, method, status)).encode(), ("\t%s\n%s\n" % (url, fields)).encode()
+
+
+def write_record(log, ms, method, status, url, headers, body):
+    """
+    Write one record to an open log file, returns the bytes written
+    :param log: the log file, opened "ab"
+    :param int ms: milliseconds since the first request
+    :param str method: "GET" or "POST"
+    :param int status: the HTTP status, 0 if the request failed
+    :param str url: the URL asked for
+    :param headers: dict of response headers
+    :param body: the response body, bytes
+    """
+    before, after = _record_header(ms, method, status, url, headers)
+    data = before + str(len(body)).encode() + after + bytes(body) + b"\n"
+    log.write(data)
+    return len(data)
+
+
+class _RecordedResponse:
+    """
+    A response whose body is added to the log as it's read
+    """
+    def __init__(self, recorder, response, record):
+        self._recorder = recorder
+        self._response = response
+        self._done = False
+        self.status_code = response.status_code
+        self.headers = response.headers
+        ms, method, url = record
+        recorder.begin(self, ms, method, self.status_code, url, self.headers)
+
+    def _finish(self):
+        if not self._done:
+            self._done = True
+            self._recorder.end(self)
+
+    def iter_content(self, chunk_size=1, decode_unicode=False):
+        # pylint: disable=unused-argument
+        for chunk in self._response.iter_content(chunk_size=chunk_size):
+            self._recorder.add(self, chunk)
+            yield chunk
+        self._finish()
+
+    @property
+    def content(self):
+        if self._done:
+            return self._response.content
+        content = self._response.content
+        self._recorder.add(self, content)
+        self._finish()
+        return content
+
+    @property
+    def text(self):
+        return str(self.content, "utf-8")
+
+    def json(self):
+        return json.loads(self.text)
+
+    def close(self):
+        if not self._done:
+            # Read what's left so the log has the whole body
+            try:
+                for chunk in self._response.iter_content(chunk_size=256):
+                    self._recorder.add(self, chunk)
+            finally:
+                self._finish()
+        self._response.close()
+
+
+class Recorder:
+    """
+    Passes requests on and logs the responses
+    :param requests: something with get() and post(), e.g. an ESPSPI_WiFiManager
+    :param str path: the log file, added to if it's there
+    :param int max_bytes: stop recording when the log gets this big, the
+        record being written is finished
+    """
+    # pylint: disable=too-many-instance-attributes
+    def __init__(self, requests, path, max_bytes=MAX_BYTES):
+        self._requests = requests
+        self.path = path
+        self.max_bytes = max_bytes
+        self.records = 0
+        self.written = 0
+        self.writable = True   # False once a write has failed or the log is full
+        self._start = None
+        self._log = None       # the log file while a record's body is being added
+        self._owner = None     # the response it's for
+        self._length_at = 0    # where in the log its body length goes
+        self._length = 0       # body bytes so far
+
+    def get(self, url, **kw):
+        """
+        GET a URL like requests does
+        """
+        return self._request("GET", self._requests.get, url, kw)
+
+    def post(self, url, **kw):
+        """
+        POST to a URL like requests does
+        """
+        return self._request("POST", self._requests.post, url, kw)
+
+    def _request(self, method, send, url, kw):
+        now = time.monotonic_ns() // 1000000
+        if self._start is None:
+            self._start = now
+        record = (now - self._start, method, url)
+        try:
+            response = send(url, **kw)
+        except Exception as error:
+            self.save(record[0], method, 0, url, {}, str(error).encode())
+            raise
+        return _RecordedResponse(self, response, record)
+
+    def save(self, ms, method, status, url, headers, body):
+        """
+        Append a whole record to the log, unless it's full or can't be written
+        """
+        owner = object()
+        self.begin(owner, ms, method, status, url, headers)
+        self.add(owner, body)
+        self.end(owner)
+
+    def begin(self, owner, ms, method, status, url, headers):
+        """
+        Start a record for a response, add() appends its body and end()
+        fills in the length.  A record still being written is ended first.
+        :param owner: the response, only its add() and end() count
+        """
+        self.end(self._owner)
+        if not self.writable:
+            return
+        if self.written >= self.max_bytes:
+            print("Helix log", self.path, "is full, not recording any more")
+            self.writable = False
+            return
+        before, after = _record_header(ms, method, status, url, headers)
+        log = None
+        try:
+            # r+b so the length can be written after the body, w+b for a new log
+            try:
+                log = open(self.path, "r+b")  # pylint: disable=consider-using-with
+            except OSError:
+                log = open(self.path, "w+b")  # pylint: disable=consider-using-with
+            log.seek(0, 2)
+            self._length_at = log.tell() + len(before)
+            log.write(before + b" " * LENGTH_WIDTH + after)
+        except OSError as error:
+            if log is not None:
+                log.close()
+            self._failed(error)
+            return
+        self.written += len(before) + LENGTH_WIDTH + len(after)
+        self._log = log
+        self._owner = owner
+        self._length = 0
+
+    def add(self, owner, chunk):
+        """
+        Append a chunk of the body to the owner's record
+        """
+        if self._log is None or owner is not self._owner:
+            return
+        try:
+            self._log.write(chunk)
+        except OSError as error:
+            self._failed(error)
+            return
+        self._length += len(chunk)
+        self.written += len(chunk)
+
+    def end(self, owner):
+        """
+        Finish the owner's record, writing in its body length
+        """
+        if self._log is None or owner is not self._owner:
+            return
+        log = self._log
+        length = str(self._length)
+        try:
+            log.write(b"\n")
+            log.seek(self._length_at)
+            log.write((" " * (LENGTH_WIDTH - len(length)) + length).encode())
+        except OSError as error:
+            self._failed(error)
+            return
+        log.close()
+        self._log = None
+        self._owner = None
+        self.written += 1
+        self.records += 1
+
+    def _failed(self, error):
+        print("Can't write the Helix log", self.path, error, "- not recording")
+        self.writable = False
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+            self._owner = None
+
+    def report(self):
+        """
+        A line about the log for the serial console
+        """
+        return "recorded: %d responses, %d bytes%s" % (
+            self.records, self.written, "" if self.writable else ", stopped")
+
+
+class _ReplayResponse:
+    """
+    A response from the log, the body is read from the file as it's
+    asked for.  Without a replay the body is given instead.
+    """
+    # pylint: disable=too-many-arguments
+    def __init__(self, replay, status, headers, offset, length, body=None):
+        self._replay = replay
+        self._offset = offset
+        self._length = length
+        self._body = body
+        self._read = 0
+        self.status_code = status
+        self.headers = headers
+
+    def _take(self, size):
+        start = self._read
+        self._read += size
+        if self._replay is None:
+            return self._body[start:start + size]
+        return self._replay.read(self._offset + start, size)
+
+    def iter_content(self, chunk_size=1, decode_unicode=False):
+        # pylint: disable=unused-argument
+        while self._read < self._length:
+            yield self._take(min(chunk_size, self._length - self._read))
+
+    @property
+    def content(self):
+        return self._take(self._length - self._read)
+
+    @property
+    def text(self):
+        return str(self.content, "utf-8")
+
+    def json(self):
+        return json.loads(self.text)
+
+    def close(self):
+        self._read = self._length
+
+
+class Replay:
+    """
+    Answers requests from a log made by a Recorder.  Each request gets
+    the response recorded for the same URL at the same point in the log,
+    or for the same path if that URL was never asked for (a different
+    watch list, say), or a 404 if there's neither.
+    :param str path: the log file
+    :param float speed: how many times faster than it was recorded to
+        play, or 0 to give each URL's responses in order, one per request
+    :param clock: what to time the replay with, time.monotonic_ns by default
+    """
+    # pylint: disable=too-many-instance-attributes
+    def __init__(self, path, speed=1, clock=None):
+        self.path = path
+        self.speed = speed
+        self._clock = clock or time.monotonic_ns
+        self._records = {}   # (method, url or path): list of (ms, status, headers, offset, length)
+        self._next = {}      # the same keys: index of the next record to give
+        self._urls = []      # the keys of URLs as they were asked for
+        self._start = None
+        self.length_ms = 0   # time from the first record to the last
+        self.count = 0       # records in the log
+        self.served = 0      # requests answered from the log
+        self.missing = 0     # requests that weren't in it
+        self._file = open(path, "rb")  # pylint: disable=consider-using-with
+        self._load()
+
+    def _load(self):
+        log = self._file
+        last = 0      # time of the last record, for when the times start again
+        offset = 0    # added to times after a reset
+        while True:
+            line = log.readline()
+            if not line:
+                break
+            if not line.strip():
+                continue
+            try:
+                ms, method, status, length, url = str(line, "utf-8").rstrip("\r\n").split("\t", 4)
+                length = int(length)
+            except ValueError:
+                # A record the Recorder didn't finish, the board was reset
+                print("Helix log", self.path, "ends with an unfinished record")
+                break
+            headers = {}
+            for field in str(log.readline(), "utf-8").rstrip("\r\n").split("\t"):
+                if field:
+                    name, _, value = field.partition(": ")
+                    headers[name] = value
+            if int(ms) + offset < last:
+                offset = last    # the times started again, the board was reset
+            ms = int(ms) + offset
+            last = ms
+            record = (ms, int(status), headers, log.tell(), length)
+            if (method, url) not in self._records:
+                self._urls.append((method, url))
+            self._records.setdefault((method, url), []).append(record)
+            path = url.split("?", 1)[0]
+            if path != url:
+                self._records.setdefault((method, path), []).append(record)
+            self.count += 1
+            log.seek(length + 1, 1)
+        self.length_ms = last
+
+    def read(self, offset, size):
+        """
+        Bytes of a body from the log
+        """
+        self._file.seek(offset)
+        return self._file.read(size)
+
+    def elapsed_ms(self):
+        """
+        How far into the log the replay is, 0 until the first request
+        """
+        if self._start is None:
+            return 0
+        return (self._clock() - self._start) * self.speed // 1000000
+
+    @property
+    def done(self):
+        """
+        Played to the end of the log
+        """
+        if self.speed:
+            return self._start is not None and self.elapsed_ms() >= self.length_ms
+        return all(self._next.get(key, 0) >= len(self._records[key]) for key in self._urls)
+
+    def _pick(self, method, url):
+        key = (method, url)
+        if key not in self._records:
+            key = (method, url.split("?", 1)[0])
+        records = self._records.get(key)
+        if not records:
+            return None
+        index = self._next.get(key, 0)
+        if self.speed:
+            # The one recorded nearest this point in the log, polls on
+            # the replay don't land on exactly the same times
+            now = self.elapsed_ms()
+            while (index + 1 < len(records)
+                   and records[index + 1][0] - now < now - records[index][0]):
+                index += 1
+            self._next[key] = index
+            return records[index]
+        self._next[key] = index + 1
+        return records[min(index, len(records) - 1)]
+
+    def _request(self, method, url):
+        if self._start is None:
+            self._start = self._clock()
+        record = self._pick(method, url)
+        if record is None:
+            self.missing += 1
+            return _ReplayResponse(None, 404, {}, 0, len(NOT_FOUND), NOT_FOUND)
+        self.served += 1
+        _, status, headers, offset, length = record
+        if status == 0:
+            raise OSError(str(self.read(offset, length), "utf-8"))
+        return _ReplayResponse(self, status, headers, offset, length)
+
+    def get(self, url, **kw):  # pylint: disable=unused-argument
+        """
+        GET a URL, from the log
+        """
+        return self._request("GET", url)
+
+    def post(self, url, **kw):  # pylint: disable=unused-argument
+        """
+        POST to a URL, from the log
+        """
+        return self._request("POST", url)
+
+    def close(self):
+        """
+        Close the log file
+        """
+        self._file.close()
+
+    def report(self):
+        """
+        A line about the replay for the serial console
+        """
+        return "replayed: %d requests, %d not in the log, %d of %d s%s" % (
+            self.served, self.missing, self.elapsed_ms() // 1000, self.length_ms // 1000,
+            ", done" if self.done else "")
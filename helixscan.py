@@ -0,0 +1,195 @@
+"""
+A streaming scanner for Helix JSON responses.
+
+Helix /streams and /users responses are {"data": [{...}, {...}], "pagination":
+{"cursor": "..."}}.  Rather than buffering the whole body and building the
+full dict tree with json.loads(), HelixScanner is fed the body a chunk at
+a time and only keeps the fields asked for from each object in "data",
+plus the pagination cursor.  Everything else (titles, thumbnail URLs,
+tags...) is skipped over without being stored, so memory use stays about
+the size of one chunk no matter how big the response is.
+"""
+import json
+
+_QUOTE = 0x22       # "
+_BACKSLASH = 0x5C   # \\
+_COLON = 0x3A
+_COMMA = 0x2C
+_OPEN_OBJECT = 0x7B
+_CLOSE_OBJECT = 0x7D
+_OPEN_ARRAY = 0x5B
+_CLOSE_ARRAY = 0x5D
+_WHITESPACE = b" \t\r\n"
+
+_RECORD_DEPTH = 3   # root object, "data" array, stream object
+_MAX_KEY = 32       # keys longer than this are never wanted
+
+
+class HelixScanner:
+    """
+    Feed a Helix response body in with feed(), which returns the records
+    completed by that chunk.  Each record is a dict of the wanted fields
+    that were in that object.
+    :param fields: names of the fields wanted from each object in "data"
+    :param int max_value: longest value kept, longer ones are cut short
+    """
+    # pylint: disable=too-many-instance-attributes
+    def __init__(self, fields=("user_name",), max_value=128):
+        self.fields = [f.encode() for f in fields]
+        self.max_value = max_value
+        self.cursor = None       # pagination cursor, None if there isn't one
+        self.records = 0         # records found so far
+        self.started = False     # seen the opening {
+        self._stack = []         # open containers, { or [
+        self._in_string = False
+        self._escape = False
+        self._is_key = False     # the string or scalar being read is a key
+        self._expect_key = False # next string in this object is a key
+        self._key = bytearray()
+        self._last_key = b""
+        self._capture = None     # bytearray of the value being kept, or None
+        self._in_scalar = False
+        self._record = None
+
+    @property
+    def done(self):
+        """
+        True once the whole top level object has been read
+        """
+        return self.started and not self._stack
+
+    def _start_value(self):
+        """
+        A value is starting, work out if it is one to keep
+        """
+        depth = len(self._stack)
+        if depth == _RECORD_DEPTH and self._record is not None and self._last_key in self.fields:
+            self._capture = bytearray()
+        elif depth == 2 and self._last_key == b"cursor":
+            self._capture = bytearray()
+        else:
+            self._capture = None
+
+    def _end_value(self):
+        """
+        A kept value has been read, decode it and store it
+        """
+        raw = self._capture
+        self._capture = None
+        if raw is None:
+            return
+        try:
+            value = json.loads(str(raw, "utf-8"))
+        except ValueError:
+            return  # cut short by max_value in the middle of something
+        if len(self._stack) == 2:
+            self.cursor = value
+        else:
+            self._record[self._last_key.decode()] = value
+
+    def feed(self, chunk):
+        """
+        Scan the next chunk of the body.  Returns a list of the records
+        (dicts of wanted fields) finished in this chunk.
+        :param chunk: bytes of the body
+        """
+        # pylint: disable=too-many-branches,too-many-statements
+        done = []
+        i = 0
+        n = len(chunk)
+        next_backslash = -1
+        while i < n:
+            if self._in_string:
+                # Skip ahead to the next quote or backslash in one go
+                if not self._escape:
+                    if next_backslash != n and next_backslash < i:
+                        next_backslash = chunk.find(b"\\", i)
+                        if next_backslash < 0:
+                            next_backslash = n
+                    j = chunk.find(b'"', i)
+                    if j < 0 or j > next_backslash:
+                        j = next_backslash
+                    if self._capture is not None and j > i:
+                        if len(self._capture) < self.max_value:
+                            self._capture.extend(chunk[i:min(j, i + self.max_value)])
+                    elif self._is_key and j > i and len(self._key) <= _MAX_KEY:
+                        self._key.extend(chunk[i:min(j, i + _MAX_KEY + 1)])
+                    i = j
+                    if i >= n:
+                        break
+                c = chunk[i]
+                if self._escape:
+                    self._escape = False
+                    self._add_string_byte(c)
+                elif c == _BACKSLASH:
+                    self._escape = True
+                    self._add_string_byte(c)
+                else:  # closing quote
+                    self._in_string = False
+                    if self._is_key:
+                        self._last_key = bytes(self._key)
+                    elif self._capture is not None:
+                        self._capture.append(_QUOTE)
+                        self._end_value()
+                i += 1
+                continue
+
+            c = chunk[i]
+            if self._in_scalar:
+                if c in _WHITESPACE or c in (_COMMA, _CLOSE_OBJECT, _CLOSE_ARRAY):
+                    self._in_scalar = False
+                    if self._capture is not None:
+                        self._end_value()
+                    # fall through to handle the delimiter
+                else:
+                    if self._capture is not None:
+                        self._capture.append(c)
+                    i += 1
+                    continue
+
+            if c == _QUOTE:
+                self._in_string = True
+                if self._stack and self._stack[-1] == _OPEN_OBJECT and self._expect_key:
+                    self._is_key = True
+                    self._key = bytearray()
+                    self._capture = None
+                else:
+                    self._is_key = False
+                    self._start_value()
+                    if self._capture is not None:
+                        self._capture.append(_QUOTE)
+            elif c == _COLON:
+                self._expect_key = False
+            elif c == _COMMA:
+                self._expect_key = bool(self._stack) and self._stack[-1] == _OPEN_OBJECT
+            elif c == _OPEN_OBJECT or c == _OPEN_ARRAY:
+                self.started = True
+                self._stack.append(c)
+                self._expect_key = c == _OPEN_OBJECT
+                if c == _OPEN_OBJECT and len(self._stack) == _RECORD_DEPTH \
+                        and self._stack[-2] == _OPEN_ARRAY:
+                    self._record = {}
+            elif c == _CLOSE_OBJECT or c == _CLOSE_ARRAY:
+                if self._stack:
+                    if len(self._stack) == _RECORD_DEPTH and self._record is not None:
+                        done.append(self._record)
+                        self.records += 1
+                        self._record = None
+                    self._stack.pop()
+                self._expect_key = False
+            elif c not in _WHITESPACE:
+                # number, true, false or null
+                self._in_scalar = True
+                self._is_key = False
+                self._start_value()
+                if self._capture is not None:
+                    self._capture.append(c)
+            i += 1
+        return done
+
+    def _add_string_byte(self, c):
+        if self._capture is not None:
+            if len(self._capture) < self.max_value:
+                self._capture.append(c)
+        elif self._is_key and len(self._key) <= _MAX_KEY:
+            self._key.append(c)
@@ -0,0 +1,123 @@
+"""
+Keep-alive requests to the Helix API.
+
+adafruit_requests keeps a socket open per host once a response has been
+read to the end, so the next request to api.twitch.tv can skip the TLS
+handshake, which is most of the time a request takes through the ESP32.
+HelixSession makes sure that happens: responses are closed even when a
+request fails (otherwise the socket is left busy and the next request
+opens another), a request on a socket twitch has since dropped is retried
+once on a new connection, and the time to the response headers is kept
+separately for requests that needed a new connection and ones that reused
+one.  Batches of status requests go one after another on the same
+connection, adafruit_requests only has one response open per socket so
+they can't be pipelined.
+"""
+import time
+
+
+class HelixSession:
+    """
+    Requests through a requests session (or ESPSPI_WiFiManager) that keep
+    the connection to the Helix host open between polls
+    :param requests: something with get(), e.g. an ESPSPI_WiFiManager
+    :param session: the adafruit_requests Session it uses, to see when it
+        opens a new socket.  Without it every request after the first good
+        one is counted as reused.
+    """
+    # pylint: disable=too-many-instance-attributes
+    def __init__(self, requests, session=None):
+        self._requests = requests
+        self._session = session
+        self._open = False       # a good response came back and was read to the end
+        self.connects = 0        # requests that needed a new connection
+        self.connect_ms = 0      # total and worst time to headers for those
+        self.connect_max_ms = 0
+        self.reuses = 0          # requests on an open connection
+        self.reuse_ms = 0
+        self.reuse_max_ms = 0
+        self.retries = 0         # requests retried after the connection was dropped
+        self._response = None
+
+    def _sockets(self):
+        """
+        The sockets the requests session has open, if it can be seen
+        """
+        sockets = getattr(self._session, "_open_sockets", None)
+        if sockets is None:
+            return None
+        return list(sockets.values())
+
+    def get(self, url, headers=None):
+        """
+        GET a URL, returns the response.  Read it to the end or close() it
+        before the next request so the connection can be used again.
+        :param str url: the URL
+        :param headers: dict of request headers
+        """
+        return self._request(self._requests.get, url, headers=headers)
+
+    def post(self, url, json=None, headers=None):
+        """
+        POST JSON to a URL, returns the response like get()
+        :param str url: the URL
+        :param json: the body, sent as JSON
+        :param headers: dict of request headers
+        """
+        return self._request(self._requests.post, url, json=json, headers=headers)
+
+    def _request(self, send, url, **kw):
+        self.close()
+        for attempt in range(2):
+            before = self._sockets()
+            start = time.monotonic_ns()
+            try:
+                self._response = send(url, **kw)
+            except Exception as error:  # pylint: disable=broad-except
+                # Twitch closes connections that sit idle, try once more on a new one
+                self._open = False
+                if attempt:
+                    raise
+                print("Helix connection dropped, reconnecting:", error)
+                self.retries += 1
+                continue
+            took = (time.monotonic_ns() - start) // 1000000
+            after = self._sockets()
+            if before is not None and after is not None:
+                reused = all(s in before for s in after)
+            else:
+                reused = self._open
+            if reused:
+                self.reuses += 1
+                self.reuse_ms += took
+                self.reuse_max_ms = max(self.reuse_max_ms, took)
+            else:
+                self.connects += 1
+                self.connect_ms += took
+                self.connect_max_ms = max(self.connect_max_ms, took)
+            response_headers = self._response.headers
+            connection = (response_headers.get("connection")
+                          or response_headers.get("Connection") or "")
+            self._open = connection.lower() != "close"
+            return self._response
+        return None
+
+    def close(self):
+        """
+        Close the last response, reading what's left of it so the
+        connection stays usable
+        """
+        if self._response is not None:
+            try:
+                self._response.close()
+            except Exception:  # pylint: disable=broad-except
+                self._open = False
+            self._response = None
+
+    def report(self):
+        """
+        A line about connections and latency for the serial console
+        """
+        return "new connections: %d avg %d ms max %d ms, reused: %d avg %d ms max %d ms, retries: %d" % (
+            self.connects, self.connect_ms // max(self.connects, 1), self.connect_max_ms,
+            self.reuses, self.reuse_ms // max(self.reuses, 1), self.reuse_max_ms, self.retries)
@@ -0,0 +1,172 @@
+"""
+Live status from a hub (tools/hub.py) instead of from twitch.
+
+With a lot of displays the hub polls twitch once for all of them and
+each board only keeps a plain TCP connection to it.  The board says
+which logins it watches and the hub sends back who of them is live,
+then only what changes.  No twitch token is needed on the board.
+
+The feed is one message per line, fields separated by tabs:
+  board to hub   W <login> <login> ...     what to watch, space separated
+  hub to board   H <keepalive seconds>     on connect
+                 L <user id> <login> <display name> <viewers> <game> <title>
+                                           went live, or renamed, new title or game
+                 V <user id> <viewers>     viewer count changed
+                 O <user id>               went offline
+                 U <login>                 twitch has no such user
+                 S                         end of a poll's changes, the first S
+                                           after W ends the full list of who's live
+                 K                         keepalive, when nothing else was sent
+Streams are kept as the same dicts a status poll gives, keyed by user
+id, so they go straight into livestate.
+"""
+import time
+
+TCP_MODE = 0            # adafruit_esp32spi's ESP_SPIcontrol.TCP_MODE
+CONNECT_TIMEOUT = 10    # seconds to wait for the hub to answer
+KEEPALIVE_MARGIN = 5    # seconds past the keepalive before giving up on the hub
+MAX_LINE = 1024         # longest line kept, L lines are ~150 bytes
+
+
+def parse_address(address):
+    """
+    Host and port from "host:port" or a (host, port) tuple
+    :param address: the hub's address
+    """
+    if isinstance(address, str):
+        host, port = address.rsplit(":", 1)
+        return host, int(port)
+    return address[0], int(address[1])
+
+
+class HubClient:
+    """
+    A connection to the hub
+    :param socket_module: adafruit_esp32spi_socket (or anything like it)
+    :param address: the hub's "host:port"
+    :param logins: twitch logins to watch
+    """
+    # pylint: disable=too-many-instance-attributes
+    def __init__(self, socket_module, address, logins):
+        self._socket_module = socket_module
+        self.host, self.port = parse_address(address)
+        self.logins = [login.strip().lower() for login in logins]
+        self._socket = None
+        self._buffer = b""
+        self._last_message = 0
+        self.keepalive = 30          # until the hub says
+        self.streams = {}            # user id: stream dict, of who is live
+        self.synced = False          # has the full list since connecting
+        self.updates = 0             # S lines, each is a poll by the hub
+        self.received = 0            # bytes from the hub
+        self.connects = 0
+
+    def connect(self):
+        """
+        Connect and say what to watch, raises OSError if the hub isn't
+        there.  The hub starts over with the full list, streams is
+        complete again once poll() has seen the first S.
+        """
+        self.close()
+        self.streams = {}
+        sock = self._socket_module.socket(self._socket_module.AF_INET,
+                                          self._socket_module.SOCK_STREAM)
+        sock.settimeout(CONNECT_TIMEOUT)
+        sock.connect((self.host, self.port), TCP_MODE)
+        self._socket = sock
+        sock.send(("W\t" + " ".join(self.logins) + "\n").encode())
+        self._last_message = time.monotonic()
+        self.connects += 1
+
+    @property
+    def alive(self):
+        """
+        Connected and hearing from the hub at least as often as it promised
+        """
+        return (self._socket is not None and
+                time.monotonic() - self._last_message < self.keepalive * 2 + KEEPALIVE_MARGIN)
+
+    def poll(self):
+        """
+        Handle what has arrived without waiting.  Returns True if one or
+        more updates were completed, streams is then up to date.
+        """
+        if self._socket is None:
+            return False
+        updated = False
+        try:
+            if self._socket.available():
+                data = self._socket.recv(0)
+                if not data:
+                    raise OSError("connection closed")   # readable with nothing to read
+                self.received += len(data)
+                self._buffer += data
+            while True:
+                end = self._buffer.find(b"\n")
+                if end < 0:
+                    if len(self._buffer) > MAX_LINE:
+                        raise OSError("line from hub too long")
+                    break
+                line = str(self._buffer[:end], "utf-8")
+                self._buffer = self._buffer[end + 1:]
+                self._last_message = time.monotonic()
+                if self._handle(line.split("\t")):
+                    updated = True
+        except (OSError, RuntimeError, ValueError, IndexError) as error:
+            print("Hub error:", error)
+            self.close()
+        return updated
+
+    def _handle(self, fields):
+        """
+        One line from the hub, returns True at the end of an update
+        """
+        kind = fields[0]
+        if kind == "L":
+            user_id = int(fields[1])
+            self.streams[user_id] = {'user_id': user_id, 'user_login': fields[2],
+                                     'user_name': fields[3], 'viewer_count': int(fields[4]),
+                                     'game_name': fields[5], 'title': fields[6]}
+        elif kind == "V":
+            old = self.streams.get(int(fields[1]))
+            if old is not None:
+                # a new dict, livestate compares it with the old one
+                stream = dict(old)
+                stream['viewer_count'] = int(fields[2])
+                self.streams[stream['user_id']] = stream
+        elif kind == "O":
+            self.streams.pop(int(fields[1]), None)
+        elif kind == "S":
+            self.synced = True
+            self.updates += 1
+            return True
+        elif kind == "H":
+            self.keepalive = int(fields[1])
+        elif kind == "U":
+            print("Twitch has no user", fields[1])
+        return False
+
+    def stream_list(self):
+        """
+        The live streams, like the list a status poll returns
+        """
+        return list(self.streams.values())
+
+    def close(self):
+        """
+        Close the connection
+        """
+        if self._socket is not None:
+            try:
+                self._socket.close()
+            except (OSError, RuntimeError):
+                pass
+            self._socket = None
+        self._buffer = b""
+        self.synced = False
+
+    def report(self):
+        """
+        A line about the feed for the serial console
+        """
+        return "updates: %d, bytes: %d, connects: %d" % (self.updates, self.received, self.connects)
@@ -0,0 +1,99 @@
+"""
+Where things go on the display, worked out from its size.
+
+The live display is a band along the top as tall as the twitch logo and
+catJAM, with "LIVE" on the left, catJAM on the right and the logo
+bouncing between them, then as many marquee rows of live names as fit
+below.  The splash background is tiled to cover the display.  A single
+64x32 panel gets one marquee row; chained or taller panels get more room
+for the header and more rows, so a long live list scrolls less.
+
+Chaining panels also slows the matrix refresh down, bit_depth() picks
+how many color bits the matrix can have and still keep up.
+"""
+
+MARGIN = 5            # "LIVE" in from the left, catJAM in from the right
+ROW_HEIGHT = 16       # a marquee row, the streamer font's ascent plus a row
+REFRESH_BUDGET = 16 * 64 * (2 ** 4 - 1)   # one 64x32 panel at 4 bits refreshes fast enough
+
+
+def bit_depth(width, height, most=6, least=1, budget=REFRESH_BUDGET):
+    """
+    The most color bits per channel, up to most, that keep a refresh of
+    the matrix within budget.  The matrix lights two rows at a time and
+    shows each bit of them for twice as long as the one before, so a
+    refresh takes about height / 2 * width * (2 ** bits - 1) ticks.
+    :param int width: the display's width, all the chained panels
+    :param int height: the display's height
+    :param int most: most bits to use
+    :param int least: fewest bits to use however slow it gets
+    :param int budget: ticks a refresh can take
+    """
+    bits = most
+    while bits > least and height // 2 * width * (2 ** bits - 1) > budget:
+        bits -= 1
+    return bits
+
+
+def split_rows(widths, rows, row_width):
+    """
+    Share names out between marquee rows, in order and about the same
+    width in each.  Only as many rows as it takes to show them all
+    without scrolling are used, or all of them if they'd still scroll.
+    Returns a list of (start, end) slices of the names for each row.
+    :param widths: the width of each name with the space after it
+    :param int rows: marquee rows there are
+    :param int row_width: width of a row, the display's width
+    """
+    total = sum(widths)
+    count = max(1, min(rows, len(widths), (total + row_width - 1) // row_width))
+    slices = []
+    start = 0
+    done = 0
+    for i, width in enumerate(widths):
+        done += width
+        if (len(slices) < count - 1 and i + 1 < len(widths)
+                and done * count >= total * (len(slices) + 1)):
+            slices.append((start, i + 1))
+            start = i + 1
+    slices.append((start, len(widths)))
+    return slices
+
+
+class Layout:
+    """
+    Positions and scroll bounds for a display of width x height
+    :param int width: display.width
+    :param int height: display.height
+    :param logo_size: (width, height) of the twitch logo
+    :param int catjam_size: width and height of a catJAM frame
+    :param background_tile: (width, height) of a splash background tile
+    :param int row_height: height of a marquee row
+    """
+    # pylint: disable=too-many-instance-attributes,too-few-public-methods,too-many-arguments
+    def __init__(self, width, height, logo_size, catjam_size, background_tile,
+                 row_height=ROW_HEIGHT):
+        self.width = width
+        self.height = height
+        logo_width, logo_height = logo_size
+        # The header: "LIVE" at the left, catJAM at the right and the logo
+        # bouncing from the left edge to just short of catJAM
+        header = max(logo_height, catjam_size)
+        self.catjam_x = width - catjam_size - MARGIN
+        self.live_x = MARGIN
+        self.live_middle = header // 2 - 1          # middle of the "LIVE" text
+        self.logo_left = 0
+        self.logo_right = self.catjam_x - logo_width - 1
+        # Marquee rows fill the rest, what's left over split above and below
+        self.rows = max(1, (height - header) // row_height)
+        spare = max(0, height - header - self.rows * row_height)
+        self.row_tops = [header + spare // 2 + row * row_height for row in range(self.rows)]
+        # The splash background is tiled across and down, the logo goes
+        # a pixel left of centre
+        self.background_columns = (width + background_tile[0] - 1) // background_tile[0]
+        self.background_rows = (height + background_tile[1] - 1) // background_tile[1]
+        self.splash_logo_x = (width - logo_width) // 2 - 1
+
+    def __str__(self):
+        return "%dx%d, %d marquee row%s" % (self.width, self.height, self.rows,
+                                           "" if self.rows == 1 else "s")
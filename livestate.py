@@ -0,0 +1,122 @@
+"""
+Who is live, kept between status polls.
+
+LiveState holds the streams from the last poll keyed by user_id (as an
+integer, so comparing keys doesn't compare strings).  Each
+new poll is compared against it with dict lookups (one pass over each
+side, not a list search per name) and the differences come back as
+events, so the display only redraws the parts something changed for.
+
+Events are (kind, stream, old) tuples where stream is the new stream
+dict (the old one for WENT_OFFLINE) and old is the previous value of
+whatever changed, or None.
+"""
+
+WENT_LIVE = "went live"
+WENT_OFFLINE = "went offline"
+RENAMED = "renamed"              # display name changed, the marquee needs redrawing
+TITLE_CHANGED = "title changed"
+GAME_CHANGED = "game changed"
+VIEWER_MILESTONE = "viewer milestone"
+
+# Events that change the list of live names on the display
+NAME_EVENTS = (WENT_LIVE, WENT_OFFLINE, RENAMED)
+
+
+class LiveState:
+    """
+    The streams that are live, keyed by user_id
+    :param milestones: viewer counts that make a VIEWER_MILESTONE event
+        when a stream goes over them
+    """
+    def __init__(self, milestones=(100, 1000, 10000)):
+        self.milestones = sorted(milestones)
+        self.streams = {}
+
+    @staticmethod
+    def _key(stream):
+        # user_id doesn't change when a streamer renames, fall back to the
+        # name if the poll wasn't asked for ids
+        user_id = stream.get("user_id")
+        if user_id:
+            return int(user_id)
+        return stream.get("user_name")
+
+    def _milestone(self, old, new):
+        """
+        The highest milestone passed going from old to new viewers, or None
+        """
+        passed = None
+        for milestone in self.milestones:
+            if old < milestone <= new:
+                passed = milestone
+        return passed
+
+    def _compare(self, old, stream, events):
+        """
+        Add the events for a stream that was old and is now stream
+        """
+        if old is None:
+            events.append((WENT_LIVE, stream, None))
+            return
+        for field, kind in (("user_name", RENAMED), ("title", TITLE_CHANGED),
+                            ("game_name", GAME_CHANGED)):
+            if field in stream and field in old and stream[field] != old[field]:
+                events.append((kind, stream, old[field]))
+        if "viewer_count" in stream and "viewer_count" in old:
+            milestone = self._milestone(old["viewer_count"], stream["viewer_count"])
+            if milestone is not None:
+                events.append((VIEWER_MILESTONE, stream, milestone))
+
+    def update(self, streams):
+        """
+        Replace the live streams with the ones from a new poll.  Returns
+        the list of events for what changed.
+        :param streams: list of stream dicts from the poll
+        """
+        events = []
+        old_streams = self.streams
+        new_streams = {}
+        for stream in streams:
+            new_streams[self._key(stream)] = stream
+        for key, stream in new_streams.items():
+            self._compare(old_streams.get(key), stream, events)
+        for key, old in old_streams.items():
+            if key not in new_streams:
+                events.append((WENT_OFFLINE, old, None))
+        self.streams = new_streams
+        return events
+
+    def set_live(self, stream):
+        """
+        One stream is live, e.g. from an EventSub notification.  Fields
+        it doesn't have are kept from what was known.  Returns the events.
+        :param stream: stream dict with at least user_id or user_name
+        """
+        events = []
+        key = self._key(stream)
+        old = self.streams.get(key)
+        self._compare(old, stream, events)
+        if old is not None:
+            merged = dict(old)
+            merged.update(stream)
+            stream = merged
+        self.streams[key] = stream
+        return events
+
+    def set_offline(self, key):
+        """
+        One stream has ended.  Returns the events.
+        :param key: the stream's user_id
+        """
+        old = self.streams.pop(int(key), None)
+        if old is None:
+            return []
+        return [(WENT_OFFLINE, old, None)]
+
+    def names(self):
+        """
+        Display names of everyone live, sorted case-insensitive
+        """
+        return sorted((s.get("user_name", "") for s in self.streams.values()),
+                      key=lambda s: s.lower())
@@ -0,0 +1,131 @@
+"""
+Scrolling text pre-rendered into one bitmap strip.
+
+The text is drawn once into a 2 color bitmap, followed by a copy of its
+first wrap_width columns so a TileGrid of the strip can scroll from x=0
+to x=-text_width and jump back without a seam.  Scrolling is then just
+moving the TileGrid, and the color is palette entry 1.
+
+Fonts from bitmap_font.load_font() and the built in terminalio.FONT
+both work, and so does a FallbackFont of a subset and the full font.
+"""
+import displayio
+try:
+    from bitmaptools import blit as _blit
+except ImportError:
+    # CircuitPython 7 has Bitmap.blit() instead, 8 moved it to bitmaptools
+    def _blit(dest_bitmap, source_bitmap, x, y, **kwargs):
+        dest_bitmap.blit(x, y, source_bitmap, **kwargs)
+
+
+class FallbackFont:
+    """
+    A subset font, with any characters it lacks taken from the full font
+    instead.  The full font is only opened when the subset is missing a
+    character, so names the subset covers never read it.
+    :param subset: a font from bitmap_font.load_font()
+    :param open_full: a function that loads the full font
+    """
+    def __init__(self, subset, open_full):
+        self._subset = subset
+        self._open_full = open_full
+        self._full = None
+        self.ascent, self.descent = font_metrics(subset)
+
+    def _full_font(self):
+        if self._full is None:
+            self._full = self._open_full()
+        return self._full
+
+    def get_bounding_box(self):
+        return self._subset.get_bounding_box()
+
+    def load_glyphs(self, chars):
+        """
+        Load glyphs from the subset, and from the full font any it doesn't have
+        :param str chars: the characters
+        """
+        self._subset.load_glyphs(chars)
+        missing = "".join(c for c in chars if self._subset.get_glyph(ord(c)) is None)
+        if missing:
+            self._full_font().load_glyphs(missing)
+
+    def get_glyph(self, code):
+        glyph = self._subset.get_glyph(code)
+        if glyph is None:
+            glyph = self._full_font().get_glyph(code)
+        return glyph
+
+
+def text_width(font, text):
+    """
+    Width in pixels of a line of text
+    :param font: a font from bitmap_font.load_font()
+    :param str text: the text
+    """
+    width = 0
+    for c in text:
+        glyph = font.get_glyph(ord(c))
+        if glyph:
+            width += glyph.shift_x
+    return width
+
+
+def font_metrics(font):
+    """
+    The font's ascent and descent.  The built in font doesn't have them,
+    its glyphs fill the bounding box from the baseline up.
+    :param font: a font from bitmap_font.load_font(), or terminalio.FONT
+    """
+    if hasattr(font, "ascent"):
+        return font.ascent, font.descent
+    return font.get_bounding_box()[1], 0
+
+
+def render_strip(font, text, wrap_width):
+    """
+    Draw a line of text into a bitmap strip.  If the text is wider than
+    wrap_width its first wrap_width columns are repeated on the end for
+    wraparound scrolling.  The baseline is the font's ascent rows down.
+    Returns the bitmap and the width of the text.
+    :param font: a font from bitmap_font.load_font()
+    :param str text: the text
+    :param int wrap_width: width of the display the strip scrolls across
+    """
+    width = text_width(font, text)
+    ascent, descent = font_metrics(font)
+    height = ascent + descent
+    strip_width = width
+    if width > wrap_width:
+        strip_width += wrap_width
+    strip = displayio.Bitmap(max(strip_width, 1), height, 2)
+    if width == 0:
+        return strip, 0
+    x = 0
+    while x < strip_width:
+        for c in text:
+            glyph = font.get_glyph(ord(c))
+            if not glyph:
+                continue
+            _blit_glyph(strip, glyph, x, ascent)
+            x += glyph.shift_x
+            if x >= strip_width:
+                break
+    return strip, width
+
+
+def _blit_glyph(strip, glyph, x, baseline):
+    """
+    Copy a glyph into the strip at x, clipped to the strip.  The built
+    in font's glyphs are tiles of one bitmap, tile_index picks the column.
+    """
+    src = glyph.tile_index * glyph.width
+    left = x + glyph.dx
+    top = baseline - glyph.height - glyph.dy
+    x1 = max(0, -left)
+    y1 = max(0, -top)
+    x2 = min(glyph.width, strip.width - left)
+    y2 = min(glyph.height, strip.height - top)
+    if x1 < x2 and y1 < y2:
+        _blit(strip, glyph.bitmap, left + x1, top + y1,
+              x1=src + x1, y1=y1, x2=src + x2, y2=y2, skip_index=0)
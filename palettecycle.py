@@ -0,0 +1,98 @@
+"""
+Color cycling by palette animation.
+
+Text and shapes are drawn once into bitmaps, and an animation only
+writes new colors into palette entries, so nothing is re-drawn or laid
+out again.  The colors are worked out once at startup by gamma_ramp():
+the steps between some key colors, gamma corrected for the LED matrix
+and rounded to the levels its bit depth can show, so every step of a
+ramp is a color the panel can actually tell apart from the last.
+
+PaletteCycle steps a ramp through one or more palette entries.  With
+several entries each is a spread further along the ramp than the one
+before, so a bitmap drawn with those entries has the colors rotate
+through it.  Stepping only reads precomputed ints and writes palette
+entries, it doesn't allocate.
+"""
+
+GAMMA = 2.2   # the matrix's LEDs are linear, eyes aren't
+
+
+def _level(value, bit_depth, gamma):
+    """
+    One channel, 0-255, gamma corrected and rounded to a level the
+    matrix can show at bit_depth.  Returned as 0-255 with the level in
+    the top bits, which are the ones the matrix uses.
+    """
+    levels = (1 << bit_depth) - 1
+    level = round(((value / 255) ** gamma) * levels)
+    if value and not level:
+        level = 1   # dim but not off, don't let it go black
+    return level << (8 - bit_depth)
+
+
+def gamma_ramp(keys, steps=1, bit_depth=4, gamma=GAMMA, loop=True):
+    """
+    Colors going smoothly from each key color to the next, as 0xRRGGBB
+    ints gamma corrected for the matrix.  Steps that come out the same
+    color at bit_depth are dropped, they'd just look like a pause.
+    :param keys: list of (r, g, b) colors to go through
+    :param int steps: colors from one key to the next, 1 to jump straight to it
+    :param int bit_depth: the matrix's bit depth
+    :param float gamma: gamma correction
+    :param bool loop: go from the last key back to the first as well
+    """
+    ramp = []
+    segments = len(keys) if loop else len(keys) - 1
+    for k in range(max(segments, 1)):
+        start = keys[k]
+        end = keys[(k + 1) % len(keys)]
+        for s in range(steps):
+            color = 0
+            for channel in range(3):
+                value = start[channel] + (end[channel] - start[channel]) * s / steps
+                color = (color << 8) | _level(value, bit_depth, gamma)
+            if not ramp or ramp[-1] != color:
+                ramp.append(color)
+    if not loop:
+        color = 0
+        for channel in range(3):
+            color = (color << 8) | _level(keys[-1][channel], bit_depth, gamma)
+        if ramp[-1] != color:
+            ramp.append(color)
+    if loop and len(ramp) > 1 and ramp[-1] == ramp[0]:
+        ramp.pop()
+    return tuple(ramp)
+
+
+class PaletteCycle:
+    """
+    Cycle palette entries through a ramp of colors
+    :param palette: the displayio.Palette
+    :param entries: palette indexes to cycle, the first one leads
+    :param ramp: colors from gamma_ramp()
+    :param int spread: ramp steps between one entry and the next
+    """
+    def __init__(self, palette, entries, ramp, spread=1):
+        self._palette = palette
+        self._entries = tuple(entries)
+        self._ramp = ramp
+        self._spread = spread
+        self.position = -1
+        self.step()
+
+    def step(self):
+        """
+        Move every entry one color along the ramp.  Returns True, the
+        palette changed, like the other animations.
+        """
+        ramp = self._ramp
+        count = len(ramp)
+        position = self.position + 1
+        if position >= count:
+            position = 0
+        self.position = position
+        entries = self._entries
+        for i in range(len(entries)):
+            self._palette[entries[i]] = ramp[(position + i * self._spread) % count]
+        return True
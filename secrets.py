@@ -12,6 +12,12 @@ Settings for secrets: ssid, password, twitch_client_id, twitch_client_secret
 # Logging into your twitch dev console https://dev.twitch.tv/console
 # Register your app as category "other", and use "http://localhost" for the oauth callback.
 # Generate a new secret and copy/paste the id and secret into the variables below:
+#
+# Optional: twitch_user_token lets twitch push "now live" over EventSub as it happens
+# instead of waiting for the next poll.  Twitch only allows this with a user access
+# token (no scopes needed) for the same client id, e.g. from the implicit grant flow:
+# https://dev.twitch.tv/docs/authentication/getting-tokens-oauth/#implicit-grant-flow
+# User tokens expire, when twitch refuses it the display goes back to polling.
 
 secrets = {
     'ssid' : 'Your-ssid',
@@ -19,4 +25,5 @@ secrets = {
     'timezone' : "America/NewYork", # http://worldtimeapi.org/timezones
     'twitch_client_id': 'your-twitch-client-id',
     'twitch_client_secret': 'your-twitch-client-secret',
+    # 'twitch_user_token': 'your-twitch-user-access-token',
     }
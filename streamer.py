@@ -5,4 +5,13 @@ STREAMER_NAMES = ["kruge","mst3k","gamesdonequick","tinnvec"]
 
 TIMEZONE_OFFSET = -5  # hours off from UTC for your local time zone
 USE_WATCHDOG = True   # reboot the display if the watchdog timer goes off
-
+POLL_MIN_DELAY = 30   # fastest to check twitch status, in seconds
+POLL_MAX_DELAY = 600  # slowest to check twitch status when backing off from errors
+USE_PROFILER = False  # print heap and timing profiles to the serial console
+USE_EVENTSUB = True   # have twitch push go-lives, if twitch_user_token is in secrets.py
+USE_FRAME_PACING = True  # refresh the display only when something on it changed
+# HUB_ADDRESS = "192.168.1.10:7457"  # get live status from tools/hub.py instead of twitch
+# HELIX_RECORD_FILE = "/helix.log"  # record what twitch sends, for tools/run_headless.py --replay
+# HELIX_REPLAY_FILE = "/helix.log"  # play a recorded log back instead of asking twitch
+# MATRIX_WIDTH = 128  # pixels across all the chained panels, 64 for one panel
+# MATRIX_HEIGHT = 32  # 64 for a 64x64 panel
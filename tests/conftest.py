@@ -0,0 +1,9 @@
+"""
+The modules under test are in the repo root and tools/, not a package
+"""
+import os
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_DIR, "tools"))
+sys.path.insert(0, REPO_DIR)
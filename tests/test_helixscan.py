@@ -0,0 +1,74 @@
+"""
+Helix bodies scanned a chunk at a time
+"""
+import json
+
+import helixscan
+
+BODY = json.dumps({
+    "data": [
+        {"user_id": "141981764", "user_name": "TwitchDev", "viewer_count": 78365,
+         "tags": ["English", {"nested": [1, [2, 3], {"user_name": "not me"}]}],
+         "title": "a \"quoted\" title with a \\ and {braces} [too]"},
+        {"user_id": "2", "user_name": "Café ☃", "viewer_count": 0,
+         "is_mature": False, "tag_ids": None},
+        {"user_id": "3", "user_name": "say \"hi\"", "extra": {"user_name": "deeper"}},
+    ],
+    "pagination": {"cursor": "eyJiIjp7IkN1cnNvciI6ImV5SnpJam8zT0RNMk5TNDBOVFl4In19fQ"},
+}).encode()
+
+WANTED = [
+    {"user_id": "141981764", "user_name": "TwitchDev", "viewer_count": 78365},
+    {"user_id": "2", "user_name": "Café ☃", "viewer_count": 0},
+    {"user_id": "3", "user_name": "say \"hi\""},
+]
+
+
+def scan(body, chunk_size):
+    scanner = helixscan.HelixScanner(("user_id", "user_name", "viewer_count"))
+    records = []
+    for i in range(0, len(body), chunk_size):
+        records.extend(scanner.feed(body[i:i + chunk_size]))
+    return scanner, records
+
+
+def test_whole_body():
+    scanner, records = scan(BODY, len(BODY))
+    assert records == WANTED
+    assert scanner.records == 3
+    assert scanner.cursor == "eyJiIjp7IkN1cnNvciI6ImV5SnpJam8zT0RNMk5TNDBOVFl4In19fQ"
+    assert scanner.done
+
+
+def test_split_across_chunks():
+    # every token gets cut somewhere by one of these
+    for chunk_size in (1, 2, 3, 5, 7, 64):
+        scanner, records = scan(BODY, chunk_size)
+        assert records == WANTED, chunk_size
+        assert scanner.cursor == "eyJiIjp7IkN1cnNvciI6ImV5SnpJam8zT0RNMk5TNDBOVFl4In19fQ"
+        assert scanner.done
+
+
+def test_escapes():
+    body = b'{"data": [{"user_name": "\\u0041b\\"c\\\\", "title": "\\"}"}], "pagination": {}}'
+    for chunk_size in (1, len(body)):
+        scanner, records = scan(body, chunk_size)
+        assert records == [{"user_name": 'Ab"c\\'}]
+        assert scanner.cursor is None
+        assert scanner.done
+
+
+def test_not_done_until_the_end():
+    scanner, records = scan(BODY[:-1], 16)
+    assert records == WANTED
+    assert not scanner.done
+    assert scanner.feed(BODY[-1:]) == []
+    assert scanner.done
+
+
+def test_empty_page():
+    scanner, records = scan(b'{"data": [], "pagination": {}}', 4)
+    assert records == []
+    assert scanner.records == 0
+    assert scanner.cursor is None
+    assert scanner.done
@@ -0,0 +1,66 @@
+"""
+Status polls compared with LiveState and the events they make
+"""
+from livestate import (LiveState, WENT_LIVE, WENT_OFFLINE, RENAMED, TITLE_CHANGED,
+                       GAME_CHANGED, VIEWER_MILESTONE, NAME_EVENTS)
+
+
+def stream(user_id, name, title="Speedruns", game="Tetris", viewers=10):
+    return {"user_id": user_id, "user_name": name, "title": title,
+            "game_name": game, "viewer_count": viewers}
+
+
+def kinds(events):
+    return [(kind, s["user_name"], old) for kind, s, old in events]
+
+
+def test_successive_polls():
+    state = LiveState(milestones=(100, 1000))
+    kruge = stream("1", "kruge")
+    mst3k = stream("2", "mst3k", viewers=50)
+    assert kinds(state.update([kruge, mst3k])) == [
+        (WENT_LIVE, "kruge", None), (WENT_LIVE, "mst3k", None)]
+    # nothing changed
+    assert state.update([stream("1", "kruge"), stream("2", "mst3k", viewers=50)]) == []
+    # title and game change while live, and mst3k goes over two milestones
+    assert kinds(state.update([stream("1", "kruge", title="Any%", game="Doom"),
+                               stream("2", "mst3k", viewers=1500)])) == [
+        (TITLE_CHANGED, "kruge", "Speedruns"), (GAME_CHANGED, "kruge", "Tetris"),
+        (VIEWER_MILESTONE, "mst3k", 1000)]
+    # mst3k drops out of the page and someone new is on it
+    assert kinds(state.update([stream("1", "kruge", title="Any%", game="Doom"),
+                               stream("3", "gamesdonequick")])) == [
+        (WENT_LIVE, "gamesdonequick", None), (WENT_OFFLINE, "mst3k", None)]
+    assert state.names() == ["gamesdonequick", "kruge"]
+    assert kinds(state.update([])) == [
+        (WENT_OFFLINE, "kruge", None), (WENT_OFFLINE, "gamesdonequick", None)]
+    assert state.names() == []
+
+
+def test_rename_is_the_same_stream():
+    state = LiveState()
+    state.update([stream("1", "kruge")])
+    events = state.update([stream("1", "Kruge2")])
+    assert kinds(events) == [(RENAMED, "Kruge2", "kruge")]
+    assert all(kind in NAME_EVENTS for kind, _, _ in events)
+    assert state.names() == ["Kruge2"]
+
+
+def test_names_sorted_ignoring_case():
+    state = LiveState()
+    state.update([stream("1", "zed"), stream("2", "Alpha"), stream("3", "beta")])
+    assert state.names() == ["Alpha", "beta", "zed"]
+
+
+def test_set_live_keeps_known_fields():
+    state = LiveState()
+    state.update([stream("1", "kruge")])
+    # an EventSub notification only has some of the fields
+    assert kinds(state.set_live({"user_id": "1", "user_name": "kruge",
+                                 "title": "Any%"})) == [(TITLE_CHANGED, "kruge", "Speedruns")]
+    assert state.streams[1]["game_name"] == "Tetris"
+    assert kinds(state.set_live({"user_id": "2", "user_name": "mst3k"})) == [
+        (WENT_LIVE, "mst3k", None)]
+    assert kinds(state.set_offline("2")) == [(WENT_OFFLINE, "mst3k", None)]
+    assert state.set_offline("2") == []
+    assert state.names() == ["kruge"]
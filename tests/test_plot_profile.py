@@ -0,0 +1,28 @@
+"""
+Profiler dumps read back by tools/plot_profile.py, and timed from the dump before
+"""
+import plot_profile
+
+TRANSCRIPT = """\
+Getting status for ['kruge']
+prof H 60000 90000 40000 0
+prof S poll 10000 1500 89000 -120
+prof S parse 10005 300 88900 64
+prof T poll 1 1500 1500 -120
+prof T parse 1 300 300 64
+prof H 120000 89500 39000 2
+prof S poll 10000 1700 89100 0
+prof S poll oops 1 2 3
+prof H 180000 89000 38000 0
+prof S poll 10000 1600 88800 32
+prof T poll 3 4800 1700 -88
+"""
+
+
+def test_samples_are_timed_from_the_dump_before():
+    heap, samples, totals = plot_profile.parse(TRANSCRIPT.splitlines())
+    assert heap == [(60, 90000, 40000), (120, 89500, 39000), (180, 89000, 38000)]
+    assert samples["poll"] == [(10, 1500, 89000, -120), (70, 1700, 89100, 0),
+                               (130, 1600, 88800, 32)]
+    assert samples["parse"] == [(10.005, 300, 88900, 64)]
+    assert totals == {"poll": (3, 4800, 1700, -88), "parse": (1, 300, 300, 64)}
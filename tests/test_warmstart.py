@@ -0,0 +1,137 @@
+"""
+Round trips of the warm start snapshot through a bytearray standing in for nvm
+"""
+import warmstart
+
+
+def saved_and_loaded(token, expires, saved, live, size=1024):
+    nvm = bytearray(size)
+    assert warmstart.WarmStart(nvm).save(token, expires, saved, live)
+    snapshot = warmstart.WarmStart(nvm)
+    assert snapshot.load()
+    return snapshot
+
+
+def test_round_trip():
+    live = [(123, "kruge"), (456, "MST3K"), (789, "GamesDoneQuick")]
+    snapshot = saved_and_loaded("abcdefghijklmnopqrstuvwxyz0123", 1700003600, 1700000000, live)
+    assert snapshot.token == "abcdefghijklmnopqrstuvwxyz0123"
+    assert snapshot.token_expires == 1700003600
+    assert snapshot.saved == 1700000000
+    assert snapshot.live == live
+
+
+def test_no_token_no_one_live():
+    snapshot = saved_and_loaded(None, 0, 1700000000, [])
+    assert snapshot.token is None
+    assert snapshot.live == []
+
+
+def test_non_ascii_names():
+    live = [(1, "日本語の名前"), (2, "Café_Ünïcode"), (3, "한국어")]
+    assert saved_and_loaded("tok", 1, 2, live).live == live
+
+
+def test_long_non_ascii_name_cut_on_a_character():
+    # 13 characters of 3 bytes, MAX_NAME cuts it inside the eleventh
+    name = "日本語の名前テスト長い名前"
+    snapshot = saved_and_loaded("tok", 1, 2, [(456, name), (789, "after")])
+    cut = snapshot.live[0][1]
+    assert name.startswith(cut)
+    assert len(cut.encode()) <= warmstart.MAX_NAME
+    assert len(cut) == warmstart.MAX_NAME // 3
+    assert snapshot.live[1] == (789, "after")
+
+
+def test_bad_name_bytes_keep_the_rest():
+    nvm = bytearray(1024)
+    snapshot = warmstart.WarmStart(nvm)
+    snapshot.save("tok", 1, 2, [(1, "ab"), (2, "cd")])
+    # Break the first name's UTF-8 and fix up the checksum, as an old
+    # firmware's snapshot cut mid-character would have been
+    name_at = nvm.index(b"ab")
+    nvm[name_at] = 0xE6
+    end = name_at + 2 + 5 + 2
+    nvm[end:end + 2] = warmstart._checksum(nvm[0:end]).to_bytes(2, "little")  # pylint: disable=protected-access
+    loaded = warmstart.WarmStart(nvm)
+    assert loaded.load()
+    assert loaded.live == [(1, ""), (2, "cd")]
+
+
+def test_damaged_snapshot_is_ignored():
+    nvm = bytearray(1024)
+    warmstart.WarmStart(nvm).save("tok", 1, 2, [(1, "kruge")])
+    nvm[nvm.index(b"kruge")] ^= 0xFF
+    assert not warmstart.WarmStart(nvm).load()
+
+
+def test_unchanged_save_is_skipped():
+    nvm = bytearray(1024)
+    snapshot = warmstart.WarmStart(nvm)
+    assert snapshot.save("tok", 100, 1, [(1, "kruge")])
+    assert not snapshot.save("tok", 100, 50, [(1, "kruge")])   # only the time moved
+    assert snapshot.skipped == 1
+    assert snapshot.save("tok", 100, 60, [(1, "kruge"), (2, "mst3k")])
+
+
+def test_live_list_stops_when_nvm_is_full():
+    live = [(i, "streamer%02d" % i) for i in range(100)]
+    snapshot = saved_and_loaded("tok", 1, 2, live, size=200)
+    assert 0 < len(snapshot.live) < 100
+    assert snapshot.live == live[:len(snapshot.live)]
+
+
+def test_golive_hours_round_trip():
+    hours = [0] * 24
+    hours[20] = 28
+    hours[21] = 300    # more than a byte, kept as 255
+    nvm = bytearray(1024)
+    assert warmstart.WarmStart(nvm).save("tok", 1, 2, [(1, "kruge")], hours)
+    snapshot = warmstart.WarmStart(nvm)
+    assert snapshot.load()
+    assert snapshot.golive_hours[20] == 28
+    assert snapshot.golive_hours[21] == 255
+    assert snapshot.live == [(1, "kruge")]
+
+
+def test_golive_hours_change_is_saved():
+    nvm = bytearray(1024)
+    snapshot = warmstart.WarmStart(nvm)
+    assert snapshot.save("tok", 100, 1, [], [0] * 24)
+    assert snapshot.save("tok", 100, 2, [], [0] * 23 + [16])
+
+
+def test_old_snapshot_is_not_loaded():
+    nvm = bytearray(1024)
+    warmstart.WarmStart(nvm).save("tok", 1, 2, [(1, "kruge")])
+    nvm[0:4] = b"GTW1"
+    assert not warmstart.WarmStart(nvm).load()
+
+
+class SliceOnlyNvm:
+    """
+    Like microcontroller.nvm, indexing and slicing only, no buffer protocol
+    """
+    def __init__(self, size):
+        self._data = bytearray(size)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __getitem__(self, index):
+        return self._data[index]
+
+    def __setitem__(self, index, value):
+        self._data[index] = value
+
+
+def test_slice_only_nvm():
+    nvm = SliceOnlyNvm(1024)
+    live = [(123, "kruge"), (456, "Café")]
+    assert warmstart.WarmStart(nvm).save("tok", 1700003600, 1700000000, live, [16] * 24)
+    snapshot = warmstart.WarmStart(nvm)
+    assert snapshot.load()
+    assert snapshot.token == "tok"
+    assert snapshot.live == live
+    assert list(snapshot.golive_hours) == [16] * 24
+    assert not snapshot.save("tok", 1700003600, 1700000100, live, [16] * 24)
@@ -0,0 +1,99 @@
+"""
+Bake a subset of the streamer font with just the glyphs the display needs.
+
+Twitch logins only use a-z, 0-9 and _, so the subset has those in both
+cases plus the few other characters the display draws.  Display names
+are usually the login with different capitals, but can be localized
+(accented, CJK and so on); code.py takes any character the subset lacks
+from the full font, which costs reading it for those glyphs.  Characters
+known ahead of time can be added with --extra, and --streamers adds every
+character used in STREAMER_NAMES in streamer.py.
+
+The subset is a small BDF file that bitmap_font reads top to bottom in
+one pass, instead of seeking around the full font for every glyph:
+    python tools/bake_font.py
+writes fonts/streamer-subset.bdf, which code.py loads if it's there.
+"""
+import argparse
+import ast
+import os
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(TOOLS_DIR)
+
+# Keep in step with LOGIN_GLYPHS in code.py
+LOGIN_GLYPHS = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_- ()"
+
+
+def streamer_names(path):
+    """
+    STREAMER_NAMES from streamer.py, read without importing it
+    """
+    with open(path, encoding="utf-8") as source:
+        tree = ast.parse(source.read())
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(
+                getattr(target, "id", None) == "STREAMER_NAMES" for target in node.targets):
+            return ast.literal_eval(node.value)
+    return []
+
+
+def subset_bdf(source_path, dest_path, chars):
+    """
+    Copy the header and the wanted glyphs of a BDF font into a new file.
+    Returns how many glyphs were written.
+    """
+    wanted = {ord(c) for c in chars}
+    with open(source_path, encoding="utf-8") as source:
+        lines = source.readlines()
+    header, glyphs, footer = [], [], []
+    current = None
+    for line in lines:
+        key = line.split(" ", 1)[0].strip()
+        if current is not None:
+            current.append(line)
+            if key == "ENCODING":
+                current_code = int(line.split()[1])
+            elif key == "ENDCHAR":
+                if current_code in wanted:
+                    glyphs.append((current_code, current))
+                current = None
+        elif key == "STARTCHAR":
+            current = [line]
+            current_code = None
+        elif key == "CHARS":
+            continue
+        elif glyphs or key == "ENDFONT":
+            footer.append(line)
+        else:
+            header.append(line)
+    glyphs.sort()
+    with open(dest_path, "w", encoding="utf-8") as dest:
+        dest.writelines(header)
+        dest.write("CHARS %d\n" % len(glyphs))
+        for _, glyph in glyphs:
+            dest.writelines(glyph)
+        dest.writelines(footer)
+    return len(glyphs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--font", default=os.path.join(REPO_DIR, "fonts", "Roboto-Condensed.bdf"))
+    parser.add_argument("--output", default=os.path.join(REPO_DIR, "fonts", "streamer-subset.bdf"))
+    parser.add_argument("--extra", default="", help="more characters to include")
+    parser.add_argument("--streamers", action="store_true",
+                        help="include the characters in STREAMER_NAMES from streamer.py")
+    args = parser.parse_args()
+
+    chars = set(LOGIN_GLYPHS) | set(args.extra)
+    if args.streamers:
+        for name in streamer_names(os.path.join(REPO_DIR, "streamer.py")):
+            chars |= set(name) | set(name.upper()) | set(name.lower())
+    count = subset_bdf(args.font, args.output, chars)
+    print("Wrote %d glyphs to %s, %d bytes (full font %d bytes)" %
+          (count, args.output, os.path.getsize(args.output), os.path.getsize(args.font)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Compare reading a Helix /streams response with json.loads() on the whole
+body against scanning it a chunk at a time with helixscan.HelixScanner.
+
+For a number of live streams this measures, on the host:
+  - peak memory allocated (tracemalloc), including the buffered body for
+    json.loads since that is what the board had to hold
+  - time to get the user_name of every stream out of the response
+
+Bodies are made up by the fake Twitch API, or read from saved responses:
+    python tools/bench_json.py --streams 20,100,1000
+    python tools/bench_json.py --file response.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(TOOLS_DIR)
+sys.path.insert(0, REPO_DIR)
+
+# pylint: disable=wrong-import-position
+import helixscan
+from fake_twitch import FakeTwitch
+
+
+def make_body(count):
+    """
+    A /streams response with count live streams and a cursor
+    """
+    twitch = FakeTwitch()
+    data = [twitch.stream("streamer%05d" % i) for i in range(count)]
+    return json.dumps({"data": data, "pagination": {"cursor": "eyJiIjpudWxsLCJhIjp7fX0"}}).encode()
+
+
+def chunks(body, size):
+    for i in range(0, len(body), size):
+        yield body[i:i + size]
+
+
+def read_buffered(body, size):
+    """
+    The old way: collect the chunks then json.loads() the lot
+    """
+    buffered = bytearray()
+    for chunk in chunks(body, size):
+        buffered.extend(chunk)
+    data = json.loads(str(buffered, "utf-8"))
+    return [stream["user_name"] for stream in data["data"]]
+
+
+def read_scanned(body, size):
+    """
+    The new way: scan each chunk as it arrives
+    """
+    scanner = helixscan.HelixScanner(("user_name",))
+    names = []
+    for chunk in chunks(body, size):
+        for record in scanner.feed(chunk):
+            names.append(record["user_name"])
+    return names
+
+
+def measure(read, body, size, repeat):
+    """
+    Peak allocation of one read, and the average time over repeat reads
+    """
+    tracemalloc.start()
+    names = read(body, size)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    start = time.perf_counter_ns()
+    for _ in range(repeat):
+        read(body, size)
+    read_ms = (time.perf_counter_ns() - start) / 1e6 / repeat
+    return names, peak, read_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--streams", default="20,100,1000", help="comma separated stream counts")
+    parser.add_argument("--file", action="append", default=[], help="saved response to read instead")
+    parser.add_argument("--chunk", type=int, default=256, help="bytes per chunk")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    bodies = []
+    for path in args.file:
+        with open(path, "rb") as source:
+            bodies.append((os.path.basename(path), source.read()))
+    if not bodies:
+        bodies = [(n, make_body(int(n))) for n in args.streams.split(",")]
+    print("%-12s %9s %-8s %12s %10s" % ("body", "bytes", "method", "peak bytes", "read ms"))
+    for name, body in bodies:
+        expected = None
+        for method, read in (("json", read_buffered), ("scan", read_scanned)):
+            names, peak, read_ms = measure(read, body, args.chunk, args.repeat)
+            if expected is None:
+                expected = names
+            elif names != expected:
+                print("  %s found different names!" % method)
+            print("%-12s %9d %-8s %12d %10.2f" % (name, len(body), method, peak, read_ms))
+
+
+if __name__ == "__main__":
+    main()
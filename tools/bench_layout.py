@@ -0,0 +1,82 @@
+"""
+Frame times of code.py on displays of different sizes.
+
+For each size code.py runs headless (run_headless.py) with a long list
+of live streamers, laid out by layout.py, and this reports:
+  - the layout: marquee rows, and how many of them the live names fill
+  - the matrix bit depth picked, and how long a refresh of the matrix
+    takes at that depth and at MATRIX_BIT_DEPTH, against one 64x32 panel
+  - frames per second, and ms per frame compositing and in code.py
+  - time to redraw the marquee when the live list changes
+
+    python tools/bench_layout.py --sizes 64x32,128x32,64x64,128x64 --live 20
+"""
+import argparse
+import os
+import sys
+import time
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(TOOLS_DIR)
+sys.path.insert(0, REPO_DIR)
+
+# pylint: disable=wrong-import-position
+import layout
+import run_headless
+
+
+def refresh_ticks(width, height, bits):
+    """
+    A refresh of the matrix against one 64x32 panel at 4 bits, see layout.bit_depth()
+    """
+    return height // 2 * width * (2 ** bits - 1) / layout.REFRESH_BUDGET
+
+
+def measure(size, live, watch, frames, redraws):
+    """
+    Run code.py at a size, returns a dict of results
+    """
+    streamers = ["streamer%05d" % i for i in range(watch)]
+    results = run_headless.run(frames=frames, clock="virtual", streamers=streamers,
+                               live=streamers[:live], size=size)
+    namespace = results["namespace"]
+    names = namespace["streamer_status"]
+    start = time.perf_counter_ns()
+    for _ in range(redraws):
+        namespace["set_marquee"](names)
+    return {
+        "rows": namespace["scene"].rows,
+        "rows_used": len(namespace["marquee_widths"]),
+        "bits": namespace["matrix_bit_depth"],
+        "most_bits": namespace["MATRIX_BIT_DEPTH"],
+        "fps": results["fps"],
+        "render_ms": results["render_ms_per_frame"],
+        "code_ms": results["code_ms_per_frame"],
+        "redraw_ms": (time.perf_counter_ns() - start) / 1e6 / redraws,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--sizes", default="64x32,128x32,64x64,128x64",
+                        help="comma separated WIDTHxHEIGHT sizes")
+    parser.add_argument("--live", type=int, default=20, help="streamers live")
+    parser.add_argument("--watch", type=int, default=40, help="streamers watched")
+    parser.add_argument("--frames", type=int, default=5000)
+    parser.add_argument("--redraws", type=int, default=20)
+    args = parser.parse_args()
+
+    print("%-7s %5s %4s %14s %8s %10s %9s %10s" %
+          ("size", "rows", "bits", "refresh vs 1", "FPS", "render ms", "code ms", "redraw ms"))
+    for size in args.sizes.split(","):
+        width, height = (int(n) for n in size.split("x"))
+        results = measure((width, height), args.live, args.watch, args.frames, args.redraws)
+        print("%-7s %2d/%-2d %4d %5.2f (%4.2f@%d) %8.0f %10.3f %9.3f %10.2f" %
+              (size, results["rows_used"], results["rows"], results["bits"],
+               refresh_ticks(width, height, results["bits"]),
+               refresh_ticks(width, height, results["most_bits"]), results["most_bits"],
+               results["fps"], results["render_ms"], results["code_ms"], results["redraw_ms"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Compare the marquee strip (marquee.py) against the old label approach
+of doubling the label text for wraparound scrolling.
+
+For a number of live names this measures, in the simulator:
+  - time to build the scrolling text when the live list changes
+  - host memory allocated while building it (tracemalloc peak)
+  - bitmap pixels held, which is what costs heap on the board
+  - time per frame to scroll one step and composite the display
+
+    python tools/bench_marquee.py --names 5,20,50
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(TOOLS_DIR)
+sys.path.insert(0, os.path.join(TOOLS_DIR, "simulator"))
+sys.path.insert(0, REPO_DIR)
+
+# pylint: disable=wrong-import-position
+import displayio
+import adafruit_display_text.bitmap_label
+from adafruit_bitmap_font import bitmap_font
+import marquee
+
+WIDTH, HEIGHT = 64, 32
+
+
+def names_text(count):
+    return "".join("streamer_%02d  " % i for i in range(count))
+
+
+def build_label(font, text):
+    """
+    The old way: a label with the text twice over
+    """
+    label = adafruit_display_text.bitmap_label.Label(font=font, text=text)
+    bound = label.bounding_box[2]
+    if label.width > WIDTH:
+        label.text += label.text
+    label.y = 22
+    return label, bound, label.bounding_box[2] * label.bounding_box[3]
+
+
+def build_strip(font, text):
+    """
+    The new way: one pre-rendered strip
+    """
+    palette = displayio.Palette(2)
+    palette.make_transparent(0)
+    palette[1] = 0xFFFFFF
+    strip, width = marquee.render_strip(font, text, WIDTH)
+    grid = displayio.TileGrid(strip, pixel_shader=palette, y=22 - 8)
+    return grid, width, strip.width * strip.height
+
+
+def measure(build, font, text, frames):
+    """
+    Build the scrolling text then scroll and composite for some frames
+    """
+    tracemalloc.start()
+    start = time.perf_counter_ns()
+    layer, bound, pixels = build(font, text)
+    build_ms = (time.perf_counter_ns() - start) / 1e6
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    display = displayio.Display(WIDTH, HEIGHT, bit_depth=4)
+    group = displayio.Group()
+    group.append(layer)
+    display.show(group)
+    start = time.perf_counter_ns()
+    for _ in range(frames):
+        if bound > WIDTH:
+            layer.x = 0 if layer.x <= -bound else layer.x - 1
+        display._render()  # pylint: disable=protected-access
+    frame_us = (time.perf_counter_ns() - start) / 1e3 / frames
+    return build_ms, peak, pixels, frame_us
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--names", default="5,20,50", help="comma separated name counts")
+    parser.add_argument("--frames", type=int, default=500)
+    args = parser.parse_args()
+
+    font = bitmap_font.load_font(os.path.join(REPO_DIR, "fonts", "Roboto-Condensed.bdf"))
+    font.load_glyphs(names_text(1))
+    print("%6s %-6s %10s %12s %10s %10s" %
+          ("names", "method", "build ms", "alloc bytes", "pixels", "frame us"))
+    for count in (int(n) for n in args.names.split(",")):
+        text = names_text(count)
+        for method, build in (("label", build_label), ("strip", build_strip)):
+            build_ms, peak, pixels, frame_us = measure(build, font, text, args.frames)
+            print("%6d %-6s %10.2f %12d %10d %10.1f" %
+                  (count, method, build_ms, peak, pixels, frame_us))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Compare palette animation (palettecycle.py) against the old way of
+color cycling, assigning color tuples to a label's color.
+
+For each of code.py's color cycles this measures, in the simulator:
+  - time per color step
+  - host memory allocated by the color steps (tracemalloc)
+  - time per frame to step the color and composite the display
+  - how many of the cycle's steps change the color on the bit_depth 4
+    matrix, a step that doesn't is a stall in the animation
+
+    python tools/bench_palette.py --steps 2000
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(TOOLS_DIR)
+sys.path.insert(0, os.path.join(TOOLS_DIR, "simulator"))
+sys.path.insert(0, REPO_DIR)
+
+# pylint: disable=wrong-import-position
+import displayio
+import terminalio
+import adafruit_display_text.bitmap_label
+import marquee
+import palettecycle
+
+WIDTH, HEIGHT = 64, 32
+BIT_DEPTH = 4
+
+# code.py's cycles before palettecycle: text, colors, and the ramp keys now
+CYCLES = (
+    ("live", "LIVE",
+     [(0, 255, 0), (0, 255, 255), (0, 0, 255), (255, 255, 0)],
+     ([(0, 255, 0), (0, 255, 255), (0, 0, 255), (255, 255, 0)], 1)),
+    ("names", "streamer_01  streamer_02",
+     [(255, 255, 255), (200, 200, 200), (180, 180, 180),
+      (150, 150, 150), (180, 180, 180), (200, 200, 200)],
+     ([(255, 255, 255), (150, 150, 150)], 3)),
+)
+
+
+def build_label(text, colors, _keys):
+    """
+    The old way: a label, cycled by setting its color
+    """
+    label = adafruit_display_text.bitmap_label.Label(font=terminalio.FONT, text=text,
+                                                     color=colors[0])
+    label.y = HEIGHT // 2
+    state = {"index": 0}
+
+    def step():
+        label.color = colors[state["index"]]
+        state["index"] += 1
+        if state["index"] > len(colors) - 1:
+            state["index"] = 0
+        return True
+    return label, step, colors
+
+
+def build_cycle(text, _colors, keys):
+    """
+    The new way: a strip with its own palette, cycled by PaletteCycle
+    """
+    palette = displayio.Palette(2)
+    palette.make_transparent(0)
+    strip, _ = marquee.render_strip(terminalio.FONT, text, len(text) * WIDTH)  # no wrap copy
+    grid = displayio.TileGrid(strip, pixel_shader=palette, y=HEIGHT // 2 - strip.height // 2)
+    ramp = palettecycle.gamma_ramp(keys[0], steps=keys[1], bit_depth=BIT_DEPTH)
+    return grid, palettecycle.PaletteCycle(palette, (1,), ramp).step, ramp
+
+
+def panel_changes(colors):
+    """
+    Steps of a cycle that change what the matrix shows, it keeps the
+    top BIT_DEPTH bits of each channel
+    """
+    mask = ((0xFF << (8 - BIT_DEPTH)) & 0xFF) * 0x010101
+    shown = []
+    for color in colors:
+        if not isinstance(color, int):
+            color = (color[0] << 16) | (color[1] << 8) | color[2]
+        shown.append(color & mask)
+    return sum(1 for i in range(len(shown)) if shown[i] != shown[i - 1])
+
+
+def measure(build, text, colors, keys, steps, frames):
+    """
+    Build the element, then time its color steps alone and with compositing
+    """
+    layer, step, cycle = build(text, colors, keys)
+    step()   # anything made on first use isn't counted
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter_ns()
+    for _ in range(steps):
+        step()
+    step_us = (time.perf_counter_ns() - start) / 1e3 / steps
+    allocated = tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+
+    display = displayio.Display(WIDTH, HEIGHT, bit_depth=BIT_DEPTH)
+    group = displayio.Group()
+    group.append(layer)
+    display.show(group)
+    start = time.perf_counter_ns()
+    for _ in range(frames):
+        step()
+        display._render()  # pylint: disable=protected-access
+    frame_us = (time.perf_counter_ns() - start) / 1e3 / frames
+    return step_us, allocated, frame_us, panel_changes(cycle), len(cycle)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--steps", type=int, default=2000, help="color steps to time")
+    parser.add_argument("--frames", type=int, default=500)
+    args = parser.parse_args()
+
+    print("%-6s %-7s %10s %12s %10s %8s" %
+          ("cycle", "method", "step us", "alloc bytes", "frame us", "changes"))
+    for name, text, colors, keys in CYCLES:
+        for method, build in (("label", build_label), ("palette", build_cycle)):
+            step_us, allocated, frame_us, changes, length = measure(
+                build, text, colors, keys, args.steps, args.frames)
+            print("%-6s %-7s %10.2f %12d %10.1f %4d/%-3d" %
+                  (name, method, step_us, allocated, frame_us, changes, length))
+
+
+if __name__ == "__main__":
+    main()
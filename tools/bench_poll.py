@@ -0,0 +1,194 @@
+"""
+Measure how the status poll scales with the number of watched streamers.
+
+For each watch list size a made up Helix log is written with
+helixlog.write_record(), a poll's worth of /streams responses batched by
+user id like code.py's build_status_urls(), for each of a number of polls.
+A fifth of the streamers are live, a few go live or offline between
+polls and halfway through a tenth of them go live at once.  The log is
+played back through helixlog.Replay and helixsession.HelixSession the
+way code.py polls, and this measures on the host:
+  - polls per second, making the requests and scanning the responses
+  - time to diff each poll against the last one (livestate)
+  - time to redraw the marquee strip when the live names change
+  - peak memory allocated during a poll, diff and redraw (tracemalloc)
+  - pixels in the biggest marquee strip, which is what costs heap on the board
+  - the size of the Helix log
+
+The log can be kept to play into code.py with run_headless.py --replay:
+    python tools/bench_poll.py --watch 10,100,1000,10000
+    python tools/bench_poll.py --watch 1000 --log helix.log
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(TOOLS_DIR)
+sys.path.insert(0, os.path.join(TOOLS_DIR, "simulator"))
+sys.path.insert(0, REPO_DIR)
+
+# pylint: disable=wrong-import-position
+from adafruit_bitmap_font import bitmap_font
+import helixlog
+import helixscan
+import helixsession
+import livestate
+import marquee
+from fake_twitch import FakeTwitch, user_id
+
+# code.py's
+TWITCH_STREAM_URL = "https://api.twitch.tv/helix/streams"
+TWITCH_USERS_URL = "https://api.twitch.tv/helix/users"
+TWITCH_MAX_LOGINS = 100
+STATUS_CHUNK_SIZE = 256
+STATUS_FIELDS = ("user_id", "user_name", "title", "game_name", "viewer_count")
+WIDTH = 64
+
+
+def status_urls(logins):
+    """
+    The status URLs code.py polls for these logins, by user id
+    """
+    ids = [user_id(login) for login in logins]
+    urls = []
+    for i in range(0, len(ids), TWITCH_MAX_LOGINS):
+        query = "&user_id=".join(str(uid) for uid in ids[i:i + TWITCH_MAX_LOGINS])
+        urls.append(TWITCH_STREAM_URL + "?first=100&user_id=" + query)
+    return urls
+
+
+def make_log(path, logins, polls, poll_delay, seed):
+    """
+    Write a made up log of polls of the logins, after the user id
+    lookups code.py makes first, returns the URLs to poll
+    """
+    rng = random.Random(seed)
+    twitch = FakeTwitch()
+    streams = {login: json.dumps(twitch.stream(login)) for login in logins}
+    live = set(rng.sample(logins, len(logins) // 5))
+    urls = status_urls(logins)
+    churn = max(1, len(logins) // 100)
+    headers = {"Ratelimit-Remaining": "799", "Ratelimit-Reset": "1700000000"}
+    with open(path, "wb") as log:
+        for i in range(0, len(logins), TWITCH_MAX_LOGINS):
+            batch = logins[i:i + TWITCH_MAX_LOGINS]
+            body = json.dumps({"data": [twitch.user(login) for login in batch]}).encode()
+            helixlog.write_record(log, 0, "GET", 200,
+                                  TWITCH_USERS_URL + "?login=" + "&login=".join(batch),
+                                  headers, body)
+        for poll in range(polls):
+            if poll == polls // 2:
+                live.update(rng.sample(logins, len(logins) // 10))
+            elif poll:
+                live.symmetric_difference_update(rng.sample(logins, churn))
+            for batch, url in enumerate(urls):
+                data = ", ".join(streams[login] for login in
+                                 logins[batch * TWITCH_MAX_LOGINS:(batch + 1) * TWITCH_MAX_LOGINS]
+                                 if login in live)
+                body = ('{"data": [' + data + '], "pagination": {}}').encode()
+                helixlog.write_record(log, poll * poll_delay * 1000 + batch * 50, "GET", 200,
+                                      url, headers, body)
+    return urls
+
+
+def poll(helix, urls):
+    """
+    One status poll like code.py's twitch_status_task(), all in one go
+    """
+    headers = {"Client-ID": "bench", "Authorization": "Bearer replay"}
+    live_now = []
+    for url in urls:
+        cursor = None
+        while True:
+            query = url + "&after=" + cursor if cursor else url
+            response = helix.get(query, headers=headers)
+            scanner = helixscan.HelixScanner(STATUS_FIELDS)
+            for chunk in response.iter_content(chunk_size=STATUS_CHUNK_SIZE):
+                live_now.extend(scanner.feed(chunk))
+            response.close()
+            cursor = scanner.cursor
+            if not cursor or not scanner.records:
+                break
+    return live_now
+
+
+def redraw(font, names):
+    """
+    The marquee strip code.py's set_marquee() draws, returns its pixels
+    """
+    strip, _ = marquee.render_strip(font, "".join(name + "  " for name in names), WIDTH)
+    return strip.width * strip.height
+
+
+def play(path, urls, polls, font, trace):
+    """
+    Play the log through a poll, diff and redraw per poll, returns the
+    time each took and the peak memory if trace
+    """
+    replay = helixlog.Replay(path, speed=0)
+    helix = helixsession.HelixSession(replay)
+    state = livestate.LiveState()
+    times = {"poll": [], "diff": [], "redraw": []}
+    peak = pixels = 0
+    for _ in range(polls):
+        if trace:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter_ns()
+        streams = poll(helix, urls)
+        took = time.perf_counter_ns()
+        events = state.update(streams)
+        diffed = time.perf_counter_ns()
+        times["poll"].append(took - start)
+        times["diff"].append(diffed - took)
+        if any(kind in livestate.NAME_EVENTS for kind, _, _ in events):
+            pixels = max(pixels, redraw(font, state.names()))
+            times["redraw"].append(time.perf_counter_ns() - diffed)
+        if trace:
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - before)
+    replay.close()
+    return times, peak, pixels
+
+
+def average_ms(values):
+    return sum(values) / max(len(values), 1) / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--watch", default="10,100,1000,10000",
+                        help="comma separated numbers of streamers to watch")
+    parser.add_argument("--polls", type=int, default=10)
+    parser.add_argument("--poll-delay", type=int, default=30, help="seconds between polls in the log")
+    parser.add_argument("--log", default=None, help="keep the log, for the last --watch")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    font = bitmap_font.load_font(os.path.join(REPO_DIR, "fonts", "Roboto-Condensed.bdf"))
+    print("%6s %7s %8s %8s %8s %9s %8s %9s %10s %8s" %
+          ("watch", "batches", "polls/s", "poll ms", "diff ms", "redraw ms", "redraws",
+           "peak KB", "strip px", "log KB"))
+    with tempfile.TemporaryDirectory() as scratch:
+        for watch in (int(count) for count in args.watch.split(",")):
+            path = args.log or os.path.join(scratch, "helix.log")
+            logins = ["streamer%05d" % i for i in range(watch)]
+            urls = make_log(path, logins, args.polls, args.poll_delay, args.seed)
+            times, _, pixels = play(path, urls, args.polls, font, False)
+            tracemalloc.start()
+            _, peak, _ = play(path, urls, args.polls, font, True)
+            tracemalloc.stop()
+            poll_ms = average_ms(times["poll"])
+            print("%6d %7d %8.1f %8.2f %8.3f %9.2f %8d %9.1f %10d %8d" %
+                  (watch, len(urls), 1000 / poll_ms if poll_ms else 0, poll_ms,
+                   average_ms(times["diff"]), average_ms(times["redraw"]),
+                   len(times["redraw"]), peak / 1024, pixels, os.path.getsize(path) // 1024))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+"""
+A fake Twitch EventSub WebSocket server, part of the fake Twitch API.
+
+FakeTwitch(eventsub=True) starts one of these next to the HTTP server.
+WebSocket clients get a session_welcome with their session id,
+session_keepalive messages when nothing else has been sent for a while,
+and stream.online / stream.offline notifications for the subscriptions
+made on their session through POST /helix/eventsub/subscriptions (with
+the user token, the app token is refused like twitch does).  Going live
+or offline on the FakeTwitch (set_live() or change_every) sends the
+notifications.
+
+reconnect() sends session_reconnect to every client, subscriptions move
+to the new connection when the client opens it, and drop() cuts every
+connection without a close frame, like a network drop.
+
+The keepalive timeout told to clients and how often keepalives are
+actually sent are separate, so a simulation running faster than real
+time can still see them often enough.  Message timestamps come from
+clock, which a simulation can point at its own time so notification
+latency is measured in simulated seconds.
+"""
+import base64
+import hashlib
+import json
+import queue
+import select
+import ssl
+import threading
+import time
+import urllib.parse
+import uuid
+from socketserver import StreamRequestHandler, ThreadingTCPServer
+
+_WEBSOCKET_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+# The simulator patches time.time(), the server keeps to the real clock
+_wall_time = time.time
+clock = _wall_time   # seconds since 1970 UTC for timestamps, a simulation can replace it
+
+
+def timestamp(seconds=None):
+    """
+    An RFC3339 timestamp like twitch's
+    """
+    seconds = clock() if seconds is None else seconds
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(seconds)) + (
+        ".%06dZ" % int(seconds % 1 * 1000000))
+
+
+def message(kind, payload, **metadata):
+    """
+    An EventSub message as text
+    """
+    metadata.update({"message_id": str(uuid.uuid4()), "message_type": kind,
+                     "message_timestamp": timestamp()})
+    return json.dumps({"metadata": metadata, "payload": payload})
+
+
+class FakeEventSub:
+    """
+    The EventSub side of a FakeTwitch
+    :param twitch: the FakeTwitch
+    :param int keepalive_timeout: keepalive_timeout_seconds told to clients
+    :param keepalive_every: real seconds between keepalives, default half the timeout
+    """
+    def __init__(self, twitch, keepalive_timeout=10, keepalive_every=None):
+        self.twitch = twitch
+        self.keepalive_timeout = keepalive_timeout
+        self.keepalive_every = keepalive_every or keepalive_timeout / 2
+        self.sessions = {}        # session id: _Handler
+        self.subscriptions = {}   # subscription id: subscription dict
+        self.counts = {"connections": 0, "subscriptions": 0, "notifications": 0}
+        self.lock = threading.Lock()
+        self.port = 0
+        self._server = None
+
+    def start(self, host):
+        handler = type("Handler", (_Handler,), {
+            "eventsub": self, "tls_context": self.twitch.tls_context})
+        self._server = ThreadingTCPServer((host, 0), handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        if self._server is not None:
+            self.drop()
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def subscribe(self, authorization, body):
+        """
+        Handle a POST to /helix/eventsub/subscriptions, returns the HTTP
+        status and response body
+        """
+        token = (authorization or "").replace("Bearer ", "")
+        if token != self.twitch.user_token:
+            if token in self.twitch.tokens:
+                return 400, {"error": "Bad Request", "status": 400,
+                             "message": "invalid transport and auth combination"}
+            return 401, {"error": "Unauthorized", "status": 401, "message": "Invalid OAuth token"}
+        try:
+            kind = body["type"]
+            user = body["condition"]["broadcaster_user_id"]
+            session_id = body["transport"]["session_id"]
+        except (KeyError, TypeError):
+            return 400, {"error": "Bad Request", "status": 400, "message": "missing fields"}
+        with self.lock:
+            if session_id not in self.sessions:
+                return 400, {"error": "Bad Request", "status": 400, "message":
+                             "websocket transport session does not exist or has already disconnected"}
+            for sub in self.subscriptions.values():
+                if (sub["type"], sub["condition"]["broadcaster_user_id"],
+                        sub["transport"]["session_id"]) == (kind, user, session_id):
+                    return 409, {"error": "Conflict", "status": 409,
+                                 "message": "subscription already exists"}
+            sub = {"id": str(uuid.uuid4()), "status": "enabled", "type": kind,
+                   "version": body.get("version", "1"), "cost": 0,
+                   "condition": {"broadcaster_user_id": user},
+                   "transport": {"method": "websocket", "session_id": session_id},
+                   "created_at": timestamp()}
+            self.subscriptions[sub["id"]] = sub
+            self.counts["subscriptions"] += 1
+        return 202, {"data": [sub], "total": len(self.subscriptions),
+                     "total_cost": 0, "max_total_cost": 10}
+
+    def live_changed(self, login, live):
+        """
+        Send stream.online or stream.offline for a login to whoever subscribed
+        """
+        user = self.twitch.user(login)
+        kind = "stream.online" if live else "stream.offline"
+        event = {"broadcaster_user_id": user["id"], "broadcaster_user_login": user["login"],
+                 "broadcaster_user_name": user["display_name"]}
+        if live:
+            event.update({"id": str(40000000000 + int(user["id"])), "type": "live",
+                          "started_at": timestamp()})
+        with self.lock:
+            for sub in self.subscriptions.values():
+                if sub["type"] == kind and sub["condition"]["broadcaster_user_id"] == user["id"]:
+                    handler = self.sessions.get(sub["transport"]["session_id"])
+                    if handler is not None:
+                        self.counts["notifications"] += 1
+                        handler.outgoing.put(message(
+                            "notification", {"subscription": sub, "event": event},
+                            subscription_type=kind, subscription_version="1"))
+
+    def reconnect(self):
+        """
+        Ask every client to move to a new connection
+        """
+        with self.lock:
+            for session_id, handler in self.sessions.items():
+                url = "wss://eventsub.wss.twitch.tv/ws?reconnect=" + session_id
+                handler.outgoing.put(message("session_reconnect", {"session": {
+                    "id": session_id, "status": "reconnecting", "keepalive_timeout_seconds": None,
+                    "reconnect_url": url, "connected_at": timestamp()}}))
+
+    def drop(self):
+        """
+        Cut every connection without a goodbye
+        """
+        with self.lock:
+            for handler in self.sessions.values():
+                handler.dropped = True
+
+
+class _Handler(StreamRequestHandler):
+    """
+    One WebSocket connection
+    """
+    eventsub = None
+    tls_context = None
+    rbufsize = 0   # unbuffered, so select() sees everything that hasn't been read
+
+    def setup(self):
+        if self.tls_context is not None:
+            self.request = self.tls_context.wrap_socket(self.request, server_side=True)
+        super().setup()
+        self.outgoing = queue.Queue()
+        self.dropped = False
+        self.session_id = str(uuid.uuid4())
+
+    def _send_frame(self, opcode, payload):
+        header = bytes((0x80 | opcode,))
+        if len(payload) < 126:
+            header += bytes((len(payload),))
+        elif len(payload) < 65536:
+            header += bytes((126,)) + len(payload).to_bytes(2, "big")
+        else:
+            header += bytes((127,)) + len(payload).to_bytes(8, "big")
+        self.wfile.write(header + payload)
+        self.wfile.flush()
+
+    def _read(self, size):
+        data = b""
+        while len(data) < size:
+            more = self.rfile.read(size - len(data))
+            if not more:
+                raise OSError("connection closed")
+            data += more
+        return data
+
+    def _read_frame(self):
+        head = self._read(2)
+        length = head[1] & 0x7F
+        if length == 126:
+            length = int.from_bytes(self._read(2), "big")
+        elif length == 127:
+            length = int.from_bytes(self._read(8), "big")
+        mask = self._read(4) if head[1] & 0x80 else b"\0\0\0\0"
+        payload = bytes(b ^ mask[i & 3] for i, b in enumerate(self._read(length)))
+        return head[0] & 0x0F, payload
+
+    def _readable(self):
+        if isinstance(self.request, ssl.SSLSocket) and self.request.pending():
+            return True
+        readable, _, _ = select.select([self.request], [], [], 0.005)
+        return bool(readable)
+
+    def handle(self):
+        request = b""
+        while not request.endswith(b"\r\n\r\n"):
+            line = self.rfile.readline()
+            if not line:
+                return
+            request += line
+        lines = request.decode().split("\r\n")
+        path = lines[0].split(" ")[1]
+        headers = {k.strip().lower(): v.strip() for k, _, v in
+                   (line.partition(":") for line in lines[1:] if line)}
+        accept = base64.b64encode(hashlib.sha1(
+            headers.get("sec-websocket-key", "").encode() + _WEBSOCKET_GUID).digest())
+        self.wfile.write(b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\n"
+                         b"Connection: Upgrade\r\nSec-WebSocket-Accept: " + accept + b"\r\n\r\n")
+        eventsub = self.eventsub
+        old_session = urllib.parse.parse_qs(urllib.parse.urlsplit(path).query).get("reconnect")
+        with eventsub.lock:
+            eventsub.counts["connections"] += 1
+            eventsub.sessions[self.session_id] = self
+            if old_session:
+                # Subscriptions follow the client to its new connection
+                for sub in eventsub.subscriptions.values():
+                    if sub["transport"]["session_id"] == old_session[0]:
+                        sub["transport"]["session_id"] = self.session_id
+        self.outgoing.put(message("session_welcome", {"session": {
+            "id": self.session_id, "status": "connected", "connected_at": timestamp(),
+            "keepalive_timeout_seconds": eventsub.keepalive_timeout, "reconnect_url": None}}))
+        last_sent = _wall_time()
+        try:
+            while not self.dropped:
+                while not self.outgoing.empty():
+                    self._send_frame(0x1, self.outgoing.get().encode())
+                    last_sent = _wall_time()
+                if _wall_time() - last_sent > eventsub.keepalive_every:
+                    self._send_frame(0x1, message("session_keepalive", {}).encode())
+                    last_sent = _wall_time()
+                if self._readable():
+                    opcode, payload = self._read_frame()
+                    if opcode == 0x8:
+                        self._send_frame(0x8, payload[:2])
+                        break
+                    if opcode == 0x9:
+                        self._send_frame(0xA, payload)
+        except OSError:
+            pass
+        finally:
+            with eventsub.lock:
+                eventsub.sessions.pop(self.session_id, None)
+                for sub_id in [sub_id for sub_id, sub in eventsub.subscriptions.items()
+                               if sub["transport"]["session_id"] == self.session_id]:
+                    del eventsub.subscriptions[sub_id]
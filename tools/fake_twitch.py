@@ -0,0 +1,374 @@
+"""
+A fake Twitch API server for running code.py in the simulator.
+
+Serves the parts of Helix and the oAuth endpoint the display uses:
+  POST /oauth2/token     client credentials tokens, with an expiry
+  GET  /helix/streams    live status by user_login or user_id, paginated
+  GET  /helix/users      user lookup by login or id
+  POST /helix/eventsub/subscriptions  with eventsub set, see fake_eventsub.py
+Tokens are checked (401 if unknown or expired) and every Helix response
+has Ratelimit-Limit/Remaining/Reset headers from an 800 a minute bucket.
+Streams carry the same fields the real API sends so response sizes are
+realistic.  change_login() renames a user keeping their user id, like
+a twitch rename, so by-login queries stop finding them.  With change_every set a random watched streamer goes live or
+offline every that many status requests, to exercise the "now live" path.
+toggle_someone() does the same whenever it's called, e.g. from a timer,
+for EventSub: a change made in a status request is in that response, so
+the poll would always see it before the notification did.
+
+With tls set it serves HTTPS with a throwaway self-signed certificate
+(made with the openssl command), handshake_delay adds a wait to each new
+connection like the ESP32's slow TLS handshake, and idle_timeout closes
+kept-alive connections that sit idle, like twitch does.
+
+Run it on its own with:
+    python tools/fake_twitch.py --port 8080 --live kruge,mst3k
+"""
+import argparse
+import json
+import os
+import random
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+import urllib.parse
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from fake_eventsub import FakeEventSub
+
+# The simulator patches time.time(), the server keeps to the real clock
+_wall_time = time.time
+
+
+def user_id(login):
+    """
+    A stable made up user id for a login
+    """
+    return zlib.crc32(login.lower().encode()) & 0x7FFFFFFF
+
+
+def _tls_context():
+    """
+    A server SSL context with a new self-signed certificate
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        cert = os.path.join(directory, "cert.pem")
+        key = os.path.join(directory, "key.pem")
+        subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes",
+                        "-keyout", key, "-out", cert, "-days", "1", "-subj", "/CN=api.twitch.tv"],
+                       check=True, capture_output=True)
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert, key)
+    return context
+
+
+class FakeTwitch:
+    """
+    The fake API's state and the server that serves it
+    """
+    # pylint: disable=too-many-instance-attributes,too-many-arguments
+    def __init__(self, host="127.0.0.1", port=0, live=(), token_lifetime=5000000,
+                 ratelimit=800, change_every=0, seed=0, tls=False, handshake_delay=0,
+                 idle_timeout=None, eventsub=False, keepalive_timeout=10, keepalive_every=None):
+        self.host = host
+        self.port = port
+        self.live = {login.lower() for login in live}
+        self.display_names = {}        # login: display name, for renames
+        self.user_ids = {}             # login: user id, for logins that were renamed to
+        self.old_logins = set()        # logins renamed away from, no such user now
+        self.stream_fields = {}        # login: stream fields to change, e.g. title
+        self.token_lifetime = token_lifetime
+        self.ratelimit = ratelimit
+        self.change_every = change_every
+        self.random = random.Random(seed)
+        self.tokens = {}               # token: time it expires
+        self.tls = tls
+        self.handshake_delay = handshake_delay
+        self.idle_timeout = idle_timeout
+        self.tls_context = None
+        self.user_token = "fakeusertoken"   # the user token EventSub subscriptions need
+        self.eventsub = None
+        if eventsub:
+            self.eventsub = FakeEventSub(self, keepalive_timeout, keepalive_every)
+        self.counts = {"token": 0, "streams": 0, "users": 0, "unauthorized": 0,
+                       "connections": 0}
+        self.watched = set()           # logins that have been asked about
+        self.lock = threading.Lock()
+        self._bucket = ratelimit
+        self._bucket_reset = _wall_time() + 60
+        self._server = None
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return "%s://%s:%d" % ("https" if self.tls else "http", self.host, self.port)
+
+    def start(self):
+        """
+        Start serving in a background thread
+        """
+        if self.tls:
+            self.tls_context = _tls_context()
+        handler = type("Handler", (_Handler,), {
+            "twitch": self, "timeout": self.idle_timeout, "tls_context": self.tls_context})
+        self._server = ThreadingHTTPServer((self.host, self.port), handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        if self.eventsub is not None:
+            self.eventsub.start(self.host)
+        return self
+
+    def stop(self):
+        if self.eventsub is not None:
+            self.eventsub.stop()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def set_live(self, logins):
+        with self.lock:
+            self._set_live({login.lower() for login in logins})
+
+    def toggle_someone(self):
+        """
+        Take a random watched streamer live, or offline if they were
+        """
+        with self.lock:
+            self._toggle_someone()
+
+    def _toggle_someone(self):
+        if self.watched:
+            login = self.random.choice(sorted(self.watched))
+            self._set_live(self.live ^ {login})
+
+    def _set_live(self, live):
+        """
+        Change who is live, with the lock held, telling EventSub about it
+        """
+        changed = live ^ self.live
+        self.live = live
+        if self.eventsub is not None:
+            for login in sorted(changed):
+                self.eventsub.live_changed(login, login in live)
+
+    def rename(self, login, display_name):
+        with self.lock:
+            self.display_names[login.lower()] = display_name
+
+    def change_login(self, login, new_login):
+        """
+        Rename a user's login (and display name), their user id stays the same
+        """
+        login, new_login = login.lower(), new_login.lower()
+        with self.lock:
+            self.user_ids[new_login] = int(self.user(login)["id"])
+            self.display_names[new_login] = new_login
+            self.old_logins.add(login)
+            for logins in (self.live, self.watched):
+                if login in logins:
+                    logins.discard(login)
+                    logins.add(new_login)
+
+    def set_stream(self, login, **fields):
+        """
+        Change fields of someone's stream, e.g. title= or viewer_count=
+        """
+        with self.lock:
+            self.stream_fields.setdefault(login.lower(), {}).update(fields)
+
+    def issue_token(self):
+        with self.lock:
+            self.counts["token"] += 1
+            token = "faketoken%d" % self.counts["token"]
+            self.tokens[token] = _wall_time() + self.token_lifetime
+            return token
+
+    def check_token(self, authorization):
+        token = (authorization or "").replace("Bearer ", "")
+        with self.lock:
+            ok = self.tokens.get(token, 0) > _wall_time()
+            if not ok:
+                self.counts["unauthorized"] += 1
+            return ok
+
+    def take_ratelimit(self):
+        """
+        Use a point from the rate limit bucket, returns the headers to send
+        """
+        with self.lock:
+            now = _wall_time()
+            if now >= self._bucket_reset:
+                self._bucket = self.ratelimit
+                self._bucket_reset = now + 60
+            self._bucket = max(self._bucket - 1, 0)
+            return {"Ratelimit-Limit": str(self.ratelimit),
+                    "Ratelimit-Remaining": str(self._bucket),
+                    "Ratelimit-Reset": str(int(self._bucket_reset))}
+
+    def user(self, login):
+        login = login.lower()
+        return {"id": str(self.user_ids.get(login) or user_id(login)), "login": login,
+                "display_name": self.display_names.get(login, login),
+                "type": "", "broadcaster_type": "partner",
+                "description": "Streams things on twitch",
+                "profile_image_url": "https://static-cdn.jtvnw.net/user-default-pictures-uv/"
+                                     + login + "-profile_image-300x300.png",
+                "offline_image_url": "", "view_count": 0,
+                "created_at": "2016-01-01T00:00:00Z"}
+
+    def stream(self, login):
+        user = self.user(login)
+        uid = user["id"]
+        stream = {"id": str(40000000000 + int(uid)), "user_id": uid,
+                "user_login": user["login"], "user_name": user["display_name"],
+                "game_id": "509658", "game_name": "Just Chatting", "type": "live",
+                "title": "A stream by " + user["display_name"] + " with a reasonably long title",
+                "viewer_count": 100 + int(uid) % 5000,
+                "started_at": "2023-02-01T18:00:00Z", "language": "en",
+                "thumbnail_url": "https://static-cdn.jtvnw.net/previews-ttv/live_user_"
+                                 + login + "-{width}x{height}.jpg",
+                "tag_ids": [], "tags": ["English", "Chill"], "is_mature": False}
+        stream.update(self.stream_fields.get(user["login"], {}))
+        return stream
+
+    def streams(self, logins, ids):
+        """
+        Streams for the asked for logins and ids that are live, maybe
+        changing someone's live state first
+        """
+        with self.lock:
+            self.counts["streams"] += 1
+            self.watched.update(logins)
+            if ids:
+                by_id = {self.user(login)["id"]: login for login in self.watched}
+                logins = logins + [by_id[i] for i in ids if i in by_id]
+            if self.change_every and self.counts["streams"] % self.change_every == 0:
+                self._toggle_someone()
+            return [self.stream(login) for login in logins if login in self.live]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """
+    Handles requests for a FakeTwitch, which is set as the class attribute twitch
+    """
+    protocol_version = "HTTP/1.1"
+    twitch = None
+    tls_context = None
+
+    def setup(self):
+        with self.twitch.lock:
+            self.twitch.counts["connections"] += 1
+        if self.twitch.handshake_delay:
+            time.sleep(self.twitch.handshake_delay)
+        if self.tls_context is not None:
+            self.request = self.tls_context.wrap_socket(self.request, server_side=True)
+        super().setup()
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+    def _send(self, status, body, headers=None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        path = urllib.parse.urlsplit(self.path).path
+        if path == "/helix/eventsub/subscriptions" and self.twitch.eventsub is not None:
+            try:
+                request = json.loads(body)
+            except ValueError:
+                request = None
+            status, response = self.twitch.eventsub.subscribe(
+                self.headers.get("Authorization"), request)
+            self._send(status, response, self.twitch.take_ratelimit())
+            return
+        if path != "/oauth2/token":
+            self._send(404, {"status": 404, "message": "Not Found"})
+            return
+        self._send(200, {"access_token": self.twitch.issue_token(),
+                         "expires_in": self.twitch.token_lifetime,
+                         "token_type": "bearer"})
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        parts = urllib.parse.urlsplit(self.path)
+        query = urllib.parse.parse_qs(parts.query)
+        if parts.path not in ("/helix/streams", "/helix/users"):
+            self._send(404, {"status": 404, "message": "Not Found"})
+            return
+        headers = self.twitch.take_ratelimit()
+        if not self.twitch.check_token(self.headers.get("Authorization")):
+            self._send(401, {"error": "Unauthorized", "status": 401,
+                             "message": "Invalid OAuth token"}, headers)
+            return
+        if parts.path == "/helix/users":
+            logins = [login.lower() for login in query.get("login", [])]
+            with self.twitch.lock:
+                self.twitch.counts["users"] += 1
+                self.twitch.watched.update(logins)   # their ids will be asked about
+            self._send(200, {"data": [self.twitch.user(login) for login in logins
+                                      if login not in self.twitch.old_logins]}, headers)
+            return
+        logins = [login.lower() for login in query.get("user_login", [])]
+        ids = query.get("user_id", [])
+        if len(logins) + len(ids) > 100:
+            self._send(400, {"error": "Bad Request", "status": 400,
+                             "message": "The number of user_id and user_login must not exceed 100"},
+                       headers)
+            return
+        first = min(int(query.get("first", ["20"])[0]), 100)
+        start = int(query.get("after", ["0"])[0])
+        data = self.twitch.streams(logins, ids)
+        page = data[start:start + first]
+        pagination = {}
+        if start + first < len(data):
+            pagination["cursor"] = str(start + first)
+        self._send(200, {"data": page, "pagination": pagination}, headers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--live", default="", help="comma separated logins that are live")
+    parser.add_argument("--change-every", type=int, default=0,
+                        help="toggle someone's live state every this many status requests")
+    parser.add_argument("--token-lifetime", type=int, default=5000000)
+    parser.add_argument("--tls", action="store_true", help="serve HTTPS with a self-signed certificate")
+    parser.add_argument("--handshake-delay", type=float, default=0,
+                        help="seconds added to each new connection")
+    parser.add_argument("--idle-timeout", type=float, default=None,
+                        help="close kept-alive connections idle this many seconds")
+    parser.add_argument("--eventsub", action="store_true", help="serve EventSub over WebSocket too")
+    args = parser.parse_args()
+    twitch = FakeTwitch(args.host, args.port, [n for n in args.live.split(",") if n],
+                        token_lifetime=args.token_lifetime, change_every=args.change_every,
+                        tls=args.tls, handshake_delay=args.handshake_delay,
+                        idle_timeout=args.idle_timeout, eventsub=args.eventsub)
+    twitch.start()
+    print("Fake twitch API at", twitch.base_url)
+    if twitch.eventsub is not None:
+        print("Fake EventSub on port", twitch.eventsub.port, "user token", twitch.user_token)
+    try:
+        while True:
+            time.sleep(60)
+            print(twitch.counts)
+    except KeyboardInterrupt:
+        twitch.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,560 @@
+"""
+A hub that polls twitch once for a whole fleet of displays.
+
+Each board running code.py on its own gets a token and polls Helix for
+its STREAMER_NAMES, so API calls and token grants go up with the number
+of boards even when they watch the same streamers.  With HUB_ADDRESS
+set in streamer.py a board asks this hub instead.  The hub holds one
+app token, looks up each login's user id once, and polls the union of
+every board's watch list by user id, 100 to a request with several
+requests at a time.  Each board gets only the changes for the
+streamers it watches, over plain TCP in the line format described in
+hubclient.py.
+
+A board that connects gets the full list of who it watches is live
+straight away if the hub has polled them all already, otherwise after
+a poll of just the streamers nobody was watching before.  Batches that
+fail keep their streamers as they were until the next poll, so an
+error at twitch doesn't look like everyone going offline.
+
+Run it with the twitch_client_id and twitch_client_secret from secrets.py:
+    python tools/hub.py --client-id ... --client-secret ... --port 7457
+or against the fake Twitch API:
+    python tools/hub.py --api http://127.0.0.1:8080 --auth http://127.0.0.1:8080
+"""
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import ssl
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+TWITCH_API = "https://api.twitch.tv"
+TWITCH_AUTH = "https://id.twitch.tv"
+MAX_IDS = 100                 # user ids or logins twitch takes in one request
+TOKEN_REFRESH_MARGIN = 3600   # get a new token this many seconds before it expires,
+                              # or a tenth of its lifetime if that's shorter
+RATELIMIT_LOW = 10            # ratelimit points left before waiting for the bucket to refill
+KEEPALIVE = 15                # seconds of quiet before a board is sent K
+MAX_BACKLOG = 256 * 1024      # bytes waiting to go to a board before it's dropped as stuck
+
+
+def _clean(value):
+    """
+    A field for a line, tabs and newlines would break it up
+    """
+    return str(value).replace("\t", " ").replace("\r", " ").replace("\n", " ")
+
+
+def live_line(stream):
+    """
+    The L line for a stream
+    """
+    return "L\t%s\t%s\t%s\t%d\t%s\t%s\n" % (
+        stream["user_id"], _clean(stream.get("user_login", "")), _clean(stream.get("user_name", "")),
+        int(stream.get("viewer_count", 0)), _clean(stream.get("game_name", "")),
+        _clean(stream.get("title", "")))
+
+
+class Helix:
+    """
+    Helix requests from any number of threads, each thread keeps its own
+    connections open between requests.  The app token is shared.
+    :param str client_id: twitch_client_id
+    :param str client_secret: twitch_client_secret
+    :param str api: base URL of the Helix API
+    :param str auth: base URL of the oAuth server
+    :param bool insecure: don't check HTTPS certificates, for test servers
+    """
+    # pylint: disable=too-many-instance-attributes,too-many-arguments
+    def __init__(self, client_id, client_secret, api=TWITCH_API, auth=TWITCH_AUTH, insecure=False):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.api = api
+        self.auth = auth
+        self._context = None
+        if insecure:
+            self._context = ssl.create_default_context()
+            self._context.check_hostname = False
+            self._context.verify_mode = ssl.CERT_NONE
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.token = None
+        self.token_expires = 0        # time.monotonic() the token expires
+        self.token_lifetime = 0       # seconds it was good for when it was got
+        self.ratelimit_remaining = None
+        self.ratelimit_reset = 0      # unix time twitch's bucket refills
+        self.counts = {"requests": 0, "tokens": 0, "unauthorized": 0}
+
+    def _connection(self, base):
+        connections = self._local.__dict__.setdefault("connections", {})
+        connection = connections.get(base)
+        if connection is None:
+            parts = urllib.parse.urlsplit(base)
+            if parts.scheme == "https":
+                connection = http.client.HTTPSConnection(parts.netloc, timeout=30,
+                                                         context=self._context)
+            else:
+                connection = http.client.HTTPConnection(parts.netloc, timeout=30)
+            connections[base] = connection
+        return connection
+
+    def _request(self, method, base, path, body=None, headers=None):
+        """
+        Make a request on this thread's connection to base, returns the
+        status, headers and body.  A kept-alive connection the server
+        has closed is opened again once.
+        """
+        for attempt in range(2):
+            connection = self._connection(base)
+            try:
+                connection.request(method, path, body=body, headers=headers or {})
+                response = connection.getresponse()
+                return response.status, response.headers, response.read()
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                del self._local.connections[base]
+                if attempt:
+                    raise
+        return None
+
+    def token_expiring(self):
+        margin = min(TOKEN_REFRESH_MARGIN, self.token_lifetime // 10)
+        return self.token is None or time.monotonic() > self.token_expires - margin
+
+    def refresh_token(self, rejected=None):
+        """
+        Get a new app token.  With rejected, only if the token is still
+        the one twitch rejected, another thread may have got a new one.
+        Returns True if there's a token to use.
+        """
+        with self._lock:
+            if rejected is not None and self.token != rejected:
+                return True
+            body = urllib.parse.urlencode({"client_id": self.client_id,
+                                           "client_secret": self.client_secret,
+                                           "grant_type": "client_credentials"})
+            try:
+                status, _, data = self._request(
+                    "POST", self.auth, "/oauth2/token", body,
+                    {"Content-Type": "application/x-www-form-urlencoded"})
+                keys = json.loads(data)
+            except (OSError, http.client.HTTPException, ValueError) as error:
+                print("Hub: exception getting twitch token:", error)
+                return False
+            if status != 200 or "access_token" not in keys:
+                print("Hub: twitch didn't give a token, HTTP status", status)
+                return False
+            self.token = keys["access_token"]
+            self.token_lifetime = keys.get("expires_in", 3600)
+            self.token_expires = time.monotonic() + self.token_lifetime
+            self.counts["tokens"] += 1
+            print("Hub: twitch token good for", self.token_lifetime, "s")
+            return True
+
+    def get(self, path):
+        """
+        GET a Helix path with the app token, getting a new token and
+        trying again once if twitch rejects it.  Returns the decoded
+        JSON, raises RuntimeError if twitch says no.
+        """
+        token = self.token
+        for attempt in range(2):
+            status, headers, data = self._request("GET", self.api, path, headers={
+                "Client-ID": self.client_id, "Authorization": "Bearer " + (token or "")})
+            with self._lock:
+                self.counts["requests"] += 1
+                remaining = headers.get("Ratelimit-Remaining")
+                if remaining is not None:
+                    # the bucket is shared, the lowest count seen is the latest
+                    reset = int(headers.get("Ratelimit-Reset") or 0)
+                    if (self.ratelimit_remaining is None or reset != self.ratelimit_reset
+                            or int(remaining) < self.ratelimit_remaining):
+                        self.ratelimit_remaining = int(remaining)
+                    self.ratelimit_reset = reset
+            if status == 401 and not attempt:
+                with self._lock:
+                    self.counts["unauthorized"] += 1
+                if not self.refresh_token(token):
+                    break
+                token = self.token
+                continue
+            if status != 200:
+                raise RuntimeError("HTTP status %d for %s" % (status, path))
+            return json.loads(data)
+        raise RuntimeError("twitch rejected the token")
+
+    def streams(self, user_ids):
+        """
+        The live streams of up to MAX_IDS user ids, every page of them
+        """
+        path = "/helix/streams?first=100&" + urllib.parse.urlencode(
+            [("user_id", user_id) for user_id in user_ids])
+        streams = []
+        cursor = None
+        while True:
+            page = self.get(path + ("&after=" + urllib.parse.quote(cursor) if cursor else ""))
+            streams.extend(page.get("data", []))
+            cursor = page.get("pagination", {}).get("cursor")
+            if not cursor or not page.get("data"):
+                return streams
+
+    def users(self, logins):
+        """
+        User ids for up to MAX_IDS logins, as a dict of login: user id
+        """
+        page = self.get("/helix/users?" + urllib.parse.urlencode(
+            [("login", login) for login in logins]))
+        return {user["login"]: int(user["id"]) for user in page.get("data", [])}
+
+
+class Board:
+    """
+    One board connected to the hub
+    """
+    # pylint: disable=too-few-public-methods
+    def __init__(self, writer):
+        self.writer = writer
+        self.address = writer.get_extra_info("peername")
+        self.logins = []
+        self.ids = set()          # user ids of logins, as they're looked up
+        self.synced = False       # has been sent the full list since it said W
+        self.last_sent = time.monotonic()
+
+
+class Hub:
+    """
+    Polls twitch for every board and sends each one its changes
+    :param helix: a Helix
+    :param float poll_delay: seconds between polls
+    :param int concurrency: Helix requests at a time
+    :param int keepalive: most seconds between messages, told to boards
+    :param keepalive_every: seconds of quiet before a board is sent a
+        keepalive, default the keepalive.  A simulation running faster
+        than real time needs them more often than it's told.
+    :param bool quiet: don't print a line per poll
+    """
+    # pylint: disable=too-many-instance-attributes,too-many-arguments
+    def __init__(self, helix, poll_delay=30, concurrency=8, keepalive=KEEPALIVE,
+                 keepalive_every=None, quiet=False):
+        self.helix = helix
+        self.poll_delay = poll_delay
+        self.keepalive = keepalive
+        self.keepalive_every = keepalive_every or keepalive
+        self.quiet = quiet
+        self.boards = set()
+        self.watchers = {}         # user id: set of boards watching it
+        self.user_ids = {}         # login: user id, 0 if twitch has no such user
+        self.streams = {}          # user id: live stream dict
+        self.polled = set()        # user ids that have been polled at least once
+        self.port = 0
+        self.stats = {"polls": 0, "failed_batches": 0, "lines": 0, "bytes": 0,
+                      "boards_connected": 0, "boards_dropped": 0}
+        self._pool = ThreadPoolExecutor(max_workers=concurrency)
+        self._wake = None
+        self._loop = None
+        self._server = None
+        self._thread = None
+
+    # --- Boards ---
+
+    async def _serve_board(self, reader, writer):
+        board = Board(writer)
+        self.boards.add(board)
+        self.stats["boards_connected"] += 1
+        self._send(board, "H\t%d\n" % self.keepalive)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                fields = line.decode("utf-8", "replace").split()
+                if fields and fields[0] == "W":
+                    self._watch(board, fields[1:])
+        except (OSError, ValueError):
+            pass
+        finally:
+            self._drop(board)
+
+    def _watch(self, board, logins):
+        """
+        A board said what it watches, wake the poll loop to look up and
+        poll anything new
+        """
+        self._unwatch(board)
+        board.logins = [login.lower() for login in logins]
+        board.synced = False
+        self._attach(board)
+        self._wake.set()
+
+    def _attach(self, board):
+        """
+        Add a board as a watcher of the user ids its logins have
+        """
+        for login in board.logins:
+            user_id = self.user_ids.get(login)
+            if user_id and user_id not in board.ids:
+                board.ids.add(user_id)
+                self.watchers.setdefault(user_id, set()).add(board)
+
+    def _unwatch(self, board):
+        for user_id in board.ids:
+            watchers = self.watchers.get(user_id)
+            if watchers is not None:
+                watchers.discard(board)
+                if not watchers:
+                    del self.watchers[user_id]
+                    self.streams.pop(user_id, None)
+                    self.polled.discard(user_id)
+        board.ids = set()
+
+    def _drop(self, board):
+        if board in self.boards:
+            self.boards.discard(board)
+            self._unwatch(board)
+            board.writer.close()
+
+    def _send(self, board, text):
+        if board not in self.boards:
+            return
+        writer = board.writer
+        if writer.is_closing() or writer.transport.get_write_buffer_size() > MAX_BACKLOG:
+            self.stats["boards_dropped"] += 1
+            self._drop(board)
+            return
+        data = text.encode()
+        writer.write(data)
+        board.last_sent = time.monotonic()
+        self.stats["lines"] += text.count("\n")
+        self.stats["bytes"] += len(data)
+
+    def _send_full_lists(self):
+        """
+        Send boards that are waiting for it the full list of who they
+        watch is live, once everything they watch is looked up and polled
+        """
+        for board in list(self.boards):
+            if board.synced or not board.logins:
+                continue
+            if any(login not in self.user_ids for login in board.logins):
+                continue
+            if any(user_id not in self.polled for user_id in board.ids):
+                continue
+            lines = [live_line(self.streams[user_id]) for user_id in board.ids
+                     if user_id in self.streams]
+            lines += ["U\t%s\n" % login for login in board.logins if not self.user_ids[login]]
+            self._send(board, "".join(lines) + "S\n")
+            board.synced = True
+
+    async def _keepalive_loop(self):
+        while True:
+            await asyncio.sleep(min(1, self.keepalive_every))
+            quiet_since = time.monotonic() - self.keepalive_every
+            for board in list(self.boards):
+                if board.last_sent < quiet_since:
+                    self._send(board, "K\n")
+
+    # --- Twitch ---
+
+    async def _run_batches(self, call, items):
+        """
+        Run a Helix call on batches of MAX_IDS items, several at a time.
+        Returns a list of (batch, result), result is None if it failed.
+        """
+        loop = asyncio.get_running_loop()
+        batches = [items[i:i + MAX_IDS] for i in range(0, len(items), MAX_IDS)]
+
+        def run(batch):
+            try:
+                return batch, call(batch)
+            except (OSError, RuntimeError, ValueError, http.client.HTTPException) as error:
+                print("Hub: request failed:", error)
+                return batch, None
+        return await asyncio.gather(*(loop.run_in_executor(self._pool, run, batch)
+                                      for batch in batches))
+
+    async def _look_up_users(self):
+        wanted = set()
+        for board in self.boards:
+            wanted.update(login for login in board.logins if login not in self.user_ids)
+        if not wanted:
+            return
+        for batch, found in await self._run_batches(self.helix.users, sorted(wanted)):
+            if found is None:
+                continue
+            for login in batch:
+                self.user_ids[login] = found.get(login, 0)
+        for board in self.boards:
+            self._attach(board)
+
+    async def _poll(self, user_ids):
+        """
+        Poll the status of some user ids and send the changes to whoever
+        watches them
+        """
+        changed = {}    # board: lines
+        failed = 0
+        for batch, streams in await self._run_batches(self.helix.streams, sorted(user_ids)):
+            if streams is None:
+                failed += 1
+                continue
+            live = {int(stream["user_id"]): stream for stream in streams}
+            for user_id in batch:
+                if user_id not in self.watchers:
+                    continue   # every board watching it left during the poll
+                line = self._change(user_id, live.get(user_id))
+                self.polled.add(user_id)
+                if line is None:
+                    continue
+                for board in self.watchers.get(user_id, ()):
+                    if board.synced:
+                        changed.setdefault(board, []).append(line)
+        for board, lines in changed.items():
+            self._send(board, "".join(lines) + "S\n")
+        self.stats["failed_batches"] += failed
+        return failed
+
+    def _change(self, user_id, stream):
+        """
+        Record a user id's new status, returns the line about what
+        changed or None
+        """
+        old = self.streams.get(user_id)
+        if stream is None:
+            if old is None:
+                return None
+            del self.streams[user_id]
+            return "O\t%d\n" % user_id
+        self.streams[user_id] = stream
+        if old is None or any(old.get(field) != stream.get(field) for field in
+                              ("user_login", "user_name", "game_name", "title")):
+            return live_line(stream)
+        if old.get("viewer_count") != stream.get("viewer_count"):
+            return "V\t%d\t%d\n" % (user_id, int(stream.get("viewer_count", 0)))
+        return None
+
+    def _next_delay(self, requests):
+        """
+        Seconds to the next poll, waiting for the rate limit bucket to
+        refill if the next poll would nearly empty it
+        """
+        delay = self.poll_delay
+        remaining = self.helix.ratelimit_remaining
+        if remaining is not None and remaining < RATELIMIT_LOW + requests:
+            delay = max(delay, self.helix.ratelimit_reset - time.time() + 1)
+        return delay
+
+    async def _poll_loop(self):
+        loop = asyncio.get_running_loop()
+        next_poll = 0
+        while True:
+            self._wake.clear()
+            if self.helix.token_expiring():
+                await loop.run_in_executor(self._pool, self.helix.refresh_token)
+            await self._look_up_users()
+            start = time.monotonic()
+            requests = self.helix.counts["requests"]
+            if start >= next_poll:
+                failed = await self._poll(list(self.watchers))
+                self.stats["polls"] += 1
+                next_poll = start + self._next_delay(len(self.watchers) // MAX_IDS + 1)
+                if not self.quiet:
+                    print("Hub: %d boards, %d streamers, %d live, %d requests in %.2f s, "
+                          "%d failed batches, %d lines sent" % (
+                              len(self.boards), len(self.watchers), len(self.streams),
+                              self.helix.counts["requests"] - requests,
+                              time.monotonic() - start, failed, self.stats["lines"]))
+            else:
+                # Only streamers a new board added, the rest are up to date
+                new = [user_id for user_id in self.watchers if user_id not in self.polled]
+                if new:
+                    await self._poll(new)
+            self._send_full_lists()
+            try:
+                await asyncio.wait_for(self._wake.wait(), max(0, next_poll - time.monotonic()))
+            except asyncio.TimeoutError:
+                pass
+
+    # --- Running ---
+
+    async def run(self, host="0.0.0.0", port=7457, ready=None):
+        """
+        Serve boards and poll twitch until cancelled
+        :param ready: a threading.Event set once the port is open
+        """
+        self._wake = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        # a whole fleet can connect at once after a power cut
+        self._server = await asyncio.start_server(self._serve_board, host, port,
+                                                  limit=1 << 20, backlog=1024)
+        self.port = self._server.sockets[0].getsockname()[1]
+        if not self.quiet:
+            print("Hub listening on port", self.port, flush=True)
+        if ready is not None:
+            ready.set()
+        try:
+            await asyncio.gather(self._poll_loop(), self._keepalive_loop())
+        finally:
+            self._server.close()
+            for board in list(self.boards):
+                self._drop(board)
+
+    def start(self, host="127.0.0.1", port=0):
+        """
+        Run in a background thread, returns once boards can connect
+        """
+        ready = threading.Event()
+        self._thread = threading.Thread(
+            target=lambda: asyncio.run(self._run_until_stopped(host, port, ready)), daemon=True)
+        self._thread.start()
+        ready.wait(10)
+        return self
+
+    async def _run_until_stopped(self, host, port, ready):
+        self._task = asyncio.current_task()   # pylint: disable=attribute-defined-outside-init
+        try:
+            await self.run(host, port, ready)
+        except asyncio.CancelledError:
+            pass
+
+    def stop(self):
+        if self._thread is not None:
+            self._loop.call_soon_threadsafe(self._task.cancel)
+            self._thread.join(10)
+            self._thread = None
+        self._pool.shutdown(wait=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=7457)
+    parser.add_argument("--client-id", default=os.environ.get("TWITCH_CLIENT_ID"))
+    parser.add_argument("--client-secret", default=os.environ.get("TWITCH_CLIENT_SECRET"))
+    parser.add_argument("--api", default=TWITCH_API, help="Helix base URL")
+    parser.add_argument("--auth", default=TWITCH_AUTH, help="oAuth base URL")
+    parser.add_argument("--insecure", action="store_true", help="don't check HTTPS certificates")
+    parser.add_argument("--poll-delay", type=float, default=30, help="seconds between polls")
+    parser.add_argument("--concurrency", type=int, default=8, help="Helix requests at a time")
+    parser.add_argument("--keepalive", type=int, default=KEEPALIVE,
+                        help="most seconds between messages to a board")
+    parser.add_argument("--keepalive-every", type=float, default=None,
+                        help="seconds of quiet before a keepalive, default --keepalive")
+    args = parser.parse_args()
+    if not args.client_id or not args.client_secret:
+        parser.error("needs --client-id and --client-secret (or TWITCH_CLIENT_ID and TWITCH_CLIENT_SECRET)")
+
+    helix = Helix(args.client_id, args.client_secret, args.api, args.auth, args.insecure)
+    hub = Hub(helix, args.poll_delay, args.concurrency, args.keepalive, args.keepalive_every)
+    try:
+        asyncio.run(hub.run(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""
+Load test the hub (tools/hub.py) with hundreds of boards.
+
+A fake Twitch API with a pool of streamers, a fifth of them live, and
+a hub polling it are started in this process, then the boards connect.
+Each board is a hubclient.HubClient, the code code.py runs, watching
+streamers picked from the pool with the popular ones picked most, so
+watch lists overlap like they would across a real fleet.  While it
+runs streamers go live and offline on the fake API, and at the end
+each board's list of who is live is checked against it.
+
+Reported:
+  - Helix requests and token grants made by the hub, against what the
+    same boards would make polling twitch on their own
+  - time from a board connecting to it having the full list
+  - time from a streamer going live or offline to each watching board
+    hearing about it, which is mostly waiting for the next poll
+  - bytes sent to the boards
+  - boards whose list didn't match the fake API at the end
+
+    python tools/load_hub.py --boards 300 --pool 2000 --watch 20 --seconds 60
+"""
+import argparse
+import math
+import os
+import random
+import socket as _socket
+import sys
+import time
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(TOOLS_DIR)
+sys.path.insert(0, REPO_DIR)
+
+# pylint: disable=wrong-import-position
+import hubclient
+import hub
+from fake_twitch import FakeTwitch, user_id
+
+
+class _BoardSocket:
+    """
+    The parts of adafruit_esp32spi_socket HubClient uses, on a host
+    socket.  available() peeks rather than select()s, so there can be
+    more boards than select() takes file descriptors.
+    """
+    def __init__(self, family, kind):
+        self._socket = _socket.socket(family, kind)
+
+    def settimeout(self, value):
+        self._socket.settimeout(value)
+
+    def connect(self, address, conntype=None):  # pylint: disable=unused-argument
+        self._socket.connect(address)
+        # blocking from here, with a timeout a peek would wait for data
+        self._socket.settimeout(None)
+
+    def send(self, data):
+        self._socket.sendall(data)
+
+    def available(self):
+        try:
+            self._socket.recv(1, _socket.MSG_PEEK | _socket.MSG_DONTWAIT)
+        except BlockingIOError:
+            return 0
+        return 1   # data, or closed and recv() will say so
+
+    def recv(self, bufsize=0):
+        return self._socket.recv(bufsize or 4096)
+
+    def close(self):
+        self._socket.close()
+
+
+class _BoardSocketModule:
+    """
+    Stands in for the socket module HubClient is given
+    """
+    # pylint: disable=too-few-public-methods
+    AF_INET = _socket.AF_INET
+    SOCK_STREAM = _socket.SOCK_STREAM
+    socket = _BoardSocket
+
+
+def watch_lists(boards, pool, watch, rng):
+    """
+    Logins in the pool and a watch list for each board.  Streamers are
+    picked with weight 1/rank, so a few are watched by most boards.
+    """
+    logins = ["streamer%05d" % i for i in range(pool)]
+    weights = [1 / (rank + 1) for rank in range(pool)]
+    lists = []
+    for _ in range(boards):
+        chosen = set()
+        while len(chosen) < min(watch, pool):
+            chosen.update(rng.choices(logins, weights, k=watch - len(chosen)))
+        lists.append(sorted(chosen))
+    return logins, lists
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+# pylint: disable=too-many-locals,too-many-statements
+def run(boards=300, pool=2000, watch=20, seconds=60, poll_delay=5, concurrency=8,
+        change_every=0.5, seed=0):
+    """
+    Run the load test, returns a dict of results
+    :param int boards: boards to connect
+    :param int pool: streamers to pick watch lists from
+    :param int watch: streamers each board watches
+    :param float seconds: how long to run for after the boards connect
+    :param float poll_delay: the hub's seconds between polls
+    :param int concurrency: the hub's Helix requests at a time
+    :param float change_every: seconds between someone going live or offline
+    :param int seed: for repeatable watch lists and changes
+    """
+    rng = random.Random(seed)
+    logins, lists = watch_lists(boards, pool, watch, rng)
+    watched = sorted(set().union(*lists))
+    twitch = FakeTwitch(live=rng.sample(logins, pool // 5), seed=seed).start()
+    helix = hub.Helix("fakeid", "fakesecret", twitch.base_url, twitch.base_url)
+    the_hub = hub.Hub(helix, poll_delay=poll_delay, concurrency=concurrency, quiet=True).start()
+    address = "127.0.0.1:%d" % the_hub.port
+    cpu_start = time.process_time()
+
+    clients = [hubclient.HubClient(_BoardSocketModule, address, watch_list)
+               for watch_list in lists]
+    connected_at = []
+    for client in clients:
+        connected_at.append(time.monotonic())
+        client.connect()
+    first_list = [None] * boards    # seconds from connecting to the full list
+    views = [set() for _ in range(boards)]
+    changed_at = {}                 # user id: when it last went live or offline
+    latencies = []
+    errors = 0
+
+    def poll_boards():
+        nonlocal errors
+        now = time.monotonic()
+        for i, client in enumerate(clients):
+            if not client.alive:
+                errors += 1
+                client.connect()
+                first_list[i] = None
+                continue
+            if not client.poll():
+                continue
+            view = set(client.streams)
+            if first_list[i] is None:
+                first_list[i] = now - connected_at[i]
+            else:
+                for changed in view ^ views[i]:
+                    if changed in changed_at:
+                        latencies.append(now - changed_at[changed])
+            views[i] = view
+
+    start = time.monotonic()
+    next_change = start
+    while time.monotonic() - start < seconds:
+        if change_every and time.monotonic() >= next_change:
+            next_change += change_every
+            login = rng.choice(watched)
+            twitch.set_live(twitch.live ^ {login})
+            changed_at[user_id(login)] = time.monotonic()
+        poll_boards()
+        time.sleep(0.002)
+    # No more changes, give the hub a poll or two to catch up then compare
+    settle = time.monotonic() + poll_delay * 2 + 1
+    while time.monotonic() < settle:
+        poll_boards()
+        time.sleep(0.002)
+    live = {user_id(login) for login in twitch.live}
+    mismatched = sum(1 for i in range(boards)
+                     if views[i] != {user_id(login) for login in lists[i]} & live)
+    cpu = time.process_time() - cpu_start
+
+    for client in clients:
+        client.close()
+    the_hub.stop()
+    twitch.stop()
+    polls = the_hub.stats["polls"]
+    batches = math.ceil(watch / hub.MAX_IDS)
+    return {
+        "boards": boards, "watched": len(watched), "polls": polls,
+        "helix_requests": helix.counts["requests"], "tokens": helix.counts["tokens"],
+        "fake_counts": dict(twitch.counts),
+        # each board on its own: a token, a user lookup and a request per batch per poll
+        "alone_requests": boards * (batches + polls * batches), "alone_tokens": boards,
+        "first_list": [t for t in first_list if t is not None],
+        "latencies": latencies, "bytes": the_hub.stats["bytes"],
+        "lines": the_hub.stats["lines"], "dropped": the_hub.stats["boards_dropped"],
+        "mismatched": mismatched, "reconnects": errors, "cpu_s": cpu, "seconds": seconds,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--boards", type=int, default=300)
+    parser.add_argument("--pool", type=int, default=2000, help="streamers to pick watch lists from")
+    parser.add_argument("--watch", type=int, default=20, help="streamers each board watches")
+    parser.add_argument("--seconds", type=float, default=60)
+    parser.add_argument("--poll-delay", type=float, default=5, help="hub's seconds between polls")
+    parser.add_argument("--concurrency", type=int, default=8, help="hub's Helix requests at a time")
+    parser.add_argument("--change-every", type=float, default=0.5,
+                        help="seconds between someone going live or offline")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    results = run(args.boards, args.pool, args.watch, args.seconds, args.poll_delay,
+                  args.concurrency, args.change_every, args.seed)
+    print("Boards: %d watching %d streamers between them, %d hub polls" %
+          (results["boards"], results["watched"], results["polls"]))
+    print("Helix requests: %d with the hub, %d with each board on its own" %
+          (results["helix_requests"], results["alone_requests"]))
+    print("Token grants: %d with the hub, %d with each board on its own" %
+          (results["tokens"], results["alone_tokens"]))
+    print("Fake API saw:", results["fake_counts"])
+    first = results["first_list"]
+    print("First full list: %d boards, avg %.3f s, max %.3f s" %
+          (len(first), sum(first) / max(len(first), 1), max(first or [0])))
+    latencies = results["latencies"]
+    print("Change to board: %d notices, avg %.3f s, p95 %.3f s, max %.3f s" %
+          (len(latencies), sum(latencies) / max(len(latencies), 1),
+           percentile(latencies, 0.95), max(latencies or [0])))
+    print("Sent to boards: %d lines, %d bytes, %.0f bytes per board per minute" %
+          (results["lines"], results["bytes"],
+           results["bytes"] / results["boards"] * 60 / results["seconds"]))
+    print("CPU: %.2f s for the hub, fake API and boards together" % results["cpu_s"])
+    print("Boards dropped: %d, reconnected: %d, wrong at the end: %d" %
+          (results["dropped"], results["reconnects"], results["mismatched"]))
+    if results["mismatched"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+Turn the profiler dumps from the serial console into charts.
+
+Set USE_PROFILER = True in streamer.py, save the serial console to a
+file (or use run_headless.py --profile --verbose) and then:
+    python tools/plot_profile.py serial.log --out profile
+which writes SVG charts to the profile directory:
+    heap.svg    free heap and the largest free block over time, a gap
+                growing between them is the heap fragmenting
+    phases.svg  how long each phase took over time
+    totals.svg  average and worst time and bytes allocated per phase
+and prints the totals.  Only needs the standard library.
+"""
+import argparse
+import os
+import sys
+
+COLORS = ["#1f77b4", "#ff7f0e", "#2ca02c", "#d62728", "#9467bd", "#8c564b",
+          "#e377c2", "#7f7f7f", "#bcbd22", "#17becf", "#393b79", "#637939"]
+WIDTH, HEIGHT, MARGIN = 900, 360, 60
+
+
+def parse(lines):
+    """
+    Read the prof lines of a serial log.  Returns the heap points
+    (seconds, mem_free, largest block), the samples by phase as
+    (seconds, us, mem_free, allocated) and the last totals by phase as
+    (count, total us, max us, total allocated).
+    """
+    heap, samples, totals = [], {}, {}
+    last_dump_ms = 0   # uptime of the dump before this one, 0 is boot
+    base_ms = 0        # what the samples after this dump's H line are timed from
+    for line in lines:
+        fields = line.split()
+        if len(fields) < 2 or fields[0] != "prof":
+            continue
+        kind, values = fields[1], fields[2:]
+        try:
+            if kind == "H":
+                uptime, free, largest, _lost = (int(v) for v in values)
+                heap.append((uptime / 1000, free, largest))
+                # A dump's samples are timed from the dump before it
+                base_ms = last_dump_ms
+                last_dump_ms = uptime
+            elif kind == "S":
+                name, when, took, sample_free, alloc = values[0], *(int(v) for v in values[1:])
+                samples.setdefault(name, []).append(
+                    ((base_ms + when) / 1000, took, sample_free, alloc))
+            elif kind == "T":
+                totals[values[0]] = tuple(int(v) for v in values[1:])
+        except ValueError:
+            continue   # a line mangled on the serial port
+    return heap, samples, totals
+
+
+def _scale(low, high, size, flip=False):
+    span = (high - low) or 1
+    if flip:
+        return lambda v: MARGIN + size - (v - low) / span * size
+    return lambda v: MARGIN + (v - low) / span * size
+
+
+def line_chart(title, series, y_label):
+    """
+    SVG of lines (or dots, for series with dots=True) against time
+    :param series: list of (name, [(x, y)...], dots)
+    """
+    points = [p for _, data, _ in series for p in data]
+    plot_w, plot_h = WIDTH - 2 * MARGIN, HEIGHT - 2 * MARGIN
+    if not points:
+        points = [(0, 0), (1, 1)]
+    sx = _scale(min(p[0] for p in points), max(p[0] for p in points), plot_w)
+    y_max = max(p[1] for p in points)
+    sy = _scale(0, y_max, plot_h, flip=True)
+    svg = [_header(title),
+           _axes(plot_w, plot_h, "seconds", y_label, y_max)]
+    for i, (name, data, dots) in enumerate(series):
+        color = COLORS[i % len(COLORS)]
+        if dots:
+            svg += ['<circle cx="%.1f" cy="%.1f" r="1.5" fill="%s"/>' % (sx(x), sy(y), color)
+                    for x, y in data]
+        elif data:
+            path = " ".join("%.1f,%.1f" % (sx(x), sy(y)) for x, y in data)
+            svg.append('<polyline fill="none" stroke="%s" points="%s"/>' % (color, path))
+        svg.append('<text x="%d" y="%d" fill="%s">%s</text>'
+                   % (WIDTH - MARGIN + 5, MARGIN + 14 * i, color, name))
+    svg.append("</svg>")
+    return "\n".join(svg)
+
+
+def bar_chart(title, names, values, y_label):
+    """
+    SVG of groups of bars, one group per name
+    :param values: list of (label, [value per name])
+    """
+    plot_w, plot_h = WIDTH - 2 * MARGIN, HEIGHT - 2 * MARGIN
+    y_max = max([v for _, vals in values for v in vals] + [1])
+    sy = _scale(0, y_max, plot_h, flip=True)
+    group_w = plot_w / max(len(names), 1)
+    bar_w = group_w * 0.8 / len(values)
+    svg = [_header(title), _axes(plot_w, plot_h, "", y_label, y_max)]
+    for j, name in enumerate(names):
+        for i, (_, vals) in enumerate(values):
+            x = MARGIN + j * group_w + i * bar_w
+            y = sy(max(vals[j], 0))
+            svg.append('<rect x="%.1f" y="%.1f" width="%.1f" height="%.1f" fill="%s"/>'
+                       % (x, y, bar_w, MARGIN + plot_h - y, COLORS[i % len(COLORS)]))
+        svg.append('<text x="%.1f" y="%d" font-size="9" transform="rotate(30 %.1f %d)">%s</text>'
+                   % (MARGIN + j * group_w, HEIGHT - MARGIN + 12,
+                      MARGIN + j * group_w, HEIGHT - MARGIN + 12, name))
+    for i, (label, _) in enumerate(values):
+        svg.append('<text x="%d" y="%d" fill="%s">%s</text>'
+                   % (WIDTH - MARGIN + 5, MARGIN + 14 * i, COLORS[i % len(COLORS)], label))
+    svg.append("</svg>")
+    return "\n".join(svg)
+
+
+def _header(title):
+    return ('<svg xmlns="http://www.w3.org/2000/svg" width="%d" height="%d" '
+            'font-family="sans-serif" font-size="11">\n'
+            '<rect width="100%%" height="100%%" fill="white"/>\n'
+            '<text x="%d" y="%d" font-size="14">%s</text>'
+            % (WIDTH + 120, HEIGHT, MARGIN, MARGIN - 20, title))
+
+
+def _axes(plot_w, plot_h, x_label, y_label, y_max):
+    return ('<path d="M%d %d V%d H%d" fill="none" stroke="black"/>\n'
+            '<text x="%d" y="%d">%s</text>\n'
+            '<text x="5" y="%d">%s</text>\n'
+            '<text x="5" y="%d">%d</text>\n'
+            '<text x="5" y="%d">0</text>'
+            % (MARGIN, MARGIN, MARGIN + plot_h, MARGIN + plot_w,
+               MARGIN + plot_w // 2, HEIGHT - 10, x_label,
+               MARGIN - 5, y_label, MARGIN + 4, y_max, MARGIN + plot_h))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("log", nargs="?", help="serial log, default stdin")
+    parser.add_argument("--out", default="profile", help="directory for the charts")
+    args = parser.parse_args()
+
+    if args.log:
+        with open(args.log, encoding="utf-8", errors="replace") as log:
+            heap, samples, totals = parse(log)
+    else:
+        heap, samples, totals = parse(sys.stdin)
+    if not heap:
+        sys.exit("No profiler dumps found, is USE_PROFILER True in streamer.py?")
+    os.makedirs(args.out, exist_ok=True)
+
+    charts = {
+        "heap.svg": line_chart("Free heap", [
+            ("mem_free", [(t, free) for t, free, _ in heap], False),
+            ("largest block", [(t, largest) for t, _, largest in heap], False),
+            ("mem_free in phases", [(t, free) for data in samples.values()
+                                    for t, _, free, _ in data], True)], "bytes"),
+        "phases.svg": line_chart("Phase times", [
+            (name, [(t, took) for t, took, _, _ in data], True)
+            for name, data in sorted(samples.items())], "us"),
+    }
+    names = sorted(totals)
+    if names:
+        charts["totals.svg"] = bar_chart("Per phase", names, [
+            ("avg us", [totals[n][1] / max(totals[n][0], 1) for n in names]),
+            ("max us", [totals[n][2] for n in names]),
+            ("avg bytes", [totals[n][3] / max(totals[n][0], 1) for n in names])], "")
+    for filename, svg in charts.items():
+        with open(os.path.join(args.out, filename), "w", encoding="utf-8") as chart:
+            chart.write(svg)
+
+    first, last = heap[0], heap[-1]
+    print("%d dumps over %.0f s, mem_free %d -> %d, largest block %d -> %d" %
+          (len(heap), last[0] - first[0], first[1], last[1], first[2], last[2]))
+    print("%-28s %8s %10s %8s %10s" % ("phase", "count", "avg us", "max us", "avg bytes"))
+    for name in names:
+        count, total_us, max_us, total_alloc = totals[name]
+        count = max(count, 1)
+        print("%-28s %8d %10.1f %8d %10.1f" %
+              (name, count, total_us / count, max_us, total_alloc / count))
+    print("Charts in", args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,374 @@
+"""
+Run code.py headless on the host against a fake Twitch API.
+
+The modules code.py imports from CircuitPython and the Adafruit
+libraries are replaced by the stand-ins in tools/simulator, which
+composite the scene (64x32 unless --size says otherwise) into NumPy RGB
+frames.  The real code.py runs unchanged until the frame limit, then
+frames per second and time spent compositing versus running code.py
+are reported.
+
+Frames can be saved as golden frames from a known good version and
+later runs compared against them (use --clock virtual so runs are
+repeatable):
+    python tools/run_headless.py --clock virtual --golden golden --update-golden
+    python tools/run_headless.py --clock virtual --golden golden
+
+Needs NumPy.  Run from anywhere, code.py runs in the repo directory.
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import types
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(TOOLS_DIR)
+SIM_DIR = os.path.join(TOOLS_DIR, "simulator")
+sys.path.insert(0, SIM_DIR)
+
+# pylint: disable=wrong-import-position
+import numpy as np
+
+import adafruit_requests
+from adafruit_esp32spi import adafruit_esp32spi_socket
+import microcontroller
+import simclock
+import simheap
+import fake_eventsub
+from fake_twitch import FakeTwitch
+
+
+def _streamer_module(streamers, profile, flash_dir, hub_address=None, settings=None):
+    """
+    A streamer.py module with STREAMER_NAMES swapped for the given list
+    (None keeps streamer.py's), the profiler turned on or off, files
+    code.py writes to CIRCUITPY put in flash_dir, HUB_ADDRESS set and
+    any other settings (a dict) given
+    """
+    module = types.ModuleType("streamer")
+    exec(compile(open(os.path.join(REPO_DIR, "streamer.py"), encoding="utf-8").read(),  # pylint: disable=exec-used
+                 "streamer.py", "exec"), module.__dict__)
+    if streamers is not None:
+        module.STREAMER_NAMES = list(streamers)
+    module.USE_WATCHDOG = False
+    module.USE_PROFILER = profile
+    module.USER_CACHE_FILE = os.path.join(flash_dir, "usercache.txt")
+    module.HUB_ADDRESS = hub_address
+    for name, value in (settings or {}).items():
+        setattr(module, name, value)
+    return module
+
+
+def start_hub(twitch, clock):
+    """
+    Start tools/hub.py polling a FakeTwitch, returns the process and the
+    address boards connect to
+    """
+    keepalive_every = None if clock == "real" else 0.01
+    command = [sys.executable, "-u", os.path.join(TOOLS_DIR, "hub.py"),
+               "--host", "127.0.0.1", "--port", "0", "--client-id", "fakeid",
+               "--client-secret", "fakesecret", "--api", twitch.base_url,
+               "--auth", twitch.base_url, "--insecure", "--poll-delay", "5"]
+    if keepalive_every:
+        # simulated time runs ahead of the hub's, as with EventSub
+        command += ["--keepalive-every", str(keepalive_every)]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    for line in process.stdout:
+        if line.startswith("Hub listening on port"):
+            # keep reading its output so it never blocks on a full pipe
+            threading.Thread(target=process.stdout.read, daemon=True).start()
+            return process, "127.0.0.1:" + line.split()[-1]
+    raise RuntimeError("hub didn't start")
+
+
+def _secrets_module(user_token):
+    """
+    A secrets.py module with a twitch_user_token added, for EventSub
+    """
+    module = types.ModuleType("secrets")
+    exec(compile(open(os.path.join(REPO_DIR, "secrets.py"), encoding="utf-8").read(),  # pylint: disable=exec-used
+                 "secrets.py", "exec"), module.__dict__)
+    module.secrets["twitch_user_token"] = user_token
+    return module
+
+
+def _golden_checker(golden_dir, every, update, results):
+    """
+    A frame callback that saves or compares every Nth frame
+    """
+    def check(number, frame):
+        if number % every:
+            return
+        path = os.path.join(golden_dir, "frame%06d.npy" % number)
+        if update:
+            np.save(path, frame)
+            results["golden_saved"] += 1
+        elif os.path.exists(path):
+            diff = np.abs(np.load(path).astype(int) - frame.astype(int))
+            results["golden_checked"] += 1
+            if diff.any():
+                results["golden_mismatches"] += 1
+                results["golden_max_diff"] = max(results["golden_max_diff"], int(diff.max()))
+    return check
+
+
+# pylint: disable=too-many-arguments,too-many-locals
+def run(frames=1000, clock="fast", live=(), streamers=None, change_every=0, seed=0,
+        golden_dir=None, golden_every=50, update_golden=False, quiet=True, twitch=None,
+        on_frame=None, profile=False, fake_options=None, flash_dir=None,
+        reset_reason=microcontroller.ResetReason.POWER_ON, hub_address=None,
+        record_file=None, replay_file=None, replay_speed=1, size=None):
+    """
+    Run code.py until it has rendered a number of frames.
+    :param int frames: frames to render before stopping
+    :param str clock: "real", "fast" or "virtual", see simclock
+    :param live: logins that are live on the fake API
+    :param streamers: STREAMER_NAMES to use instead of the ones in streamer.py
+    :param int change_every: toggle someone live/offline every N status requests
+    :param golden_dir: directory of golden frames to compare against (or save to)
+    :param bool quiet: hide code.py's serial output
+    :param twitch: a running FakeTwitch to use instead of starting one
+    :param on_frame: also called with (frame number, frame) for each frame
+    :param bool profile: turn on code.py's profiler, with heap use from tracemalloc
+    :param fake_options: more FakeTwitch arguments, e.g. tls=True, eventsub=True
+    :param flash_dir: directory standing in for CIRCUITPY's writable files
+        (the user id cache), kept between runs.  A new empty one by default.
+    :param reset_reason: microcontroller.cpu.reset_reason for this run,
+        WATCHDOG makes code.py warm start from what the last run left in nvm
+    :param hub_address: "host:port" of a hub from start_hub() for code.py
+        to get the live status from instead of the fake API
+    :param record_file: log the Helix responses code.py gets to this file
+    :param replay_file: answer code.py's Helix requests from this log
+        instead of the fake API
+    :param float replay_speed: how many times faster than it was recorded
+        to replay, 0 for each response in turn
+    :param size: (width, height) of the display, streamer.py's by default
+    Returns a dict of results
+    """
+    random.seed(seed)
+    own_twitch = twitch is None
+    if own_twitch:
+        twitch = FakeTwitch(live=live, change_every=change_every, seed=seed,
+                            **(fake_options or {})).start()
+    # EventSub timestamps in simulated time so latency is too
+    fake_eventsub.clock = simclock.network_time
+    if twitch.eventsub is not None:
+        adafruit_esp32spi_socket.HOST_MAP[("eventsub.wss.twitch.tv", 443)] = (
+            twitch.host, twitch.eventsub.port, twitch.tls)
+    # The two hosts get different names for the same server so they have
+    # their own connections, like they do on the board
+    adafruit_requests.URL_MAP.update({
+        "https://api.twitch.tv": twitch.base_url,
+        "https://id.twitch.tv": twitch.base_url.replace(twitch.host, "localhost")})
+    results = {"frames": 0, "stopped_by": "frame limit", "golden_saved": 0,
+               "golden_checked": 0, "golden_mismatches": 0, "golden_max_diff": 0}
+    callbacks = []
+    if golden_dir:
+        os.makedirs(golden_dir, exist_ok=True)
+        callbacks.append(_golden_checker(golden_dir, golden_every, update_golden, results))
+    if on_frame is not None:
+        callbacks.append(on_frame)
+
+    def frame_callback(number, frame):
+        for callback in callbacks:
+            callback(number, frame)
+
+    simclock.frames = 0
+    simclock.render_ns = 0
+    simclock.sleep_ns = 0
+    simclock.max_frames = frames
+    simclock.on_frame = frame_callback
+    simclock.install(clock)
+    microcontroller.cpu.reset_reason = reset_reason
+    # code.py imports secrets.py and streamer.py from the repo, not the stdlib secrets
+    saved_modules = {name: sys.modules.pop(name, None) for name in ("secrets", "streamer")}
+    flash = None
+    if flash_dir is None:
+        flash = tempfile.TemporaryDirectory()
+        flash_dir = flash.name
+    settings = {}
+    if record_file:
+        settings["HELIX_RECORD_FILE"] = os.path.abspath(record_file)
+    if replay_file:
+        settings.update(HELIX_REPLAY_FILE=os.path.abspath(replay_file),
+                        HELIX_REPLAY_SPEED=replay_speed)
+    if size:
+        settings.update(MATRIX_WIDTH=size[0], MATRIX_HEIGHT=size[1])
+    sys.modules["streamer"] = _streamer_module(streamers, profile, flash_dir, hub_address,
+                                               settings)
+    if twitch.eventsub is not None:
+        sys.modules["secrets"] = _secrets_module(twitch.user_token)
+    if profile:
+        simheap.install()
+    sys.path.insert(0, REPO_DIR)
+    cwd = os.getcwd()
+    os.chdir(REPO_DIR)
+    output = io.StringIO() if quiet else sys.stdout
+    start = time.perf_counter_ns()
+    # code.py's globals are kept so callers can look at its counters afterwards
+    namespace = {"__name__": "__main__", "__file__": "code.py"}
+    with open("code.py", encoding="utf-8") as source:
+        program = compile(source.read(), "code.py", "exec")
+    try:
+        with contextlib.redirect_stdout(output):
+            exec(program, namespace)  # pylint: disable=exec-used
+    except simclock.SimulationDone:
+        pass
+    except simclock.SimulatedReset as reset:
+        results["stopped_by"] = "reset: " + str(reset)
+    finally:
+        wall_ns = time.perf_counter_ns() - start
+        os.chdir(cwd)
+        sys.path.remove(REPO_DIR)
+        simclock.uninstall()
+        if profile:
+            simheap.uninstall()
+        for name, module in saved_modules.items():
+            sys.modules.pop(name, None)
+            if module is not None:
+                sys.modules[name] = module
+        if own_twitch:
+            twitch.stop()
+        if flash is not None:
+            flash.cleanup()
+
+    # Sleeps are skipped outside real mode, so take them off the wall time there
+    busy_ns = wall_ns - (simclock.sleep_ns if clock == "real" else 0)
+    results.update({
+        "frames": simclock.frames,
+        "wall_s": wall_ns / 1e9,
+        "fps": simclock.frames / (busy_ns / 1e9) if busy_ns else 0,
+        "render_ms_per_frame": simclock.render_ns / 1e6 / max(simclock.frames, 1),
+        "code_ms_per_frame": (busy_ns - simclock.render_ns) / 1e6 / max(simclock.frames, 1),
+        "twitch_requests": dict(twitch.counts),
+        "eventsub": dict(twitch.eventsub.counts) if twitch.eventsub is not None else {},
+        "boot_s": namespace.get("boot_seconds"),
+        "http": dict(adafruit_requests.stats),
+        "helix_log": (namespace["helix_log"].report()
+                      if namespace.get("helix_log") is not None else None),
+        "namespace": namespace,
+        "output": output.getvalue() if quiet else "",
+    })
+    return results
+
+
+def live_changer(twitch, every):
+    """
+    An on_frame callback that has twitch toggle someone's live state
+    every that many seconds of code.py's time, independent of its polls
+    """
+    due = []
+
+    def on_frame(number, frame):  # pylint: disable=unused-argument
+        now = time.monotonic()
+        if not due:
+            due.append(now + every)
+        elif now >= due[0]:
+            due[0] = now + every
+            twitch.toggle_someone()
+    return on_frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--frames", type=int, default=1000)
+    parser.add_argument("--clock", choices=("real", "fast", "virtual"), default="fast")
+    parser.add_argument("--live", default="kruge,mst3k", help="comma separated live logins")
+    parser.add_argument("--streamers", default=None,
+                        help="comma separated STREAMER_NAMES instead of streamer.py's")
+    parser.add_argument("--watch", type=int, default=0,
+                        help="watch this many made up streamers instead of streamer.py's")
+    parser.add_argument("--change-every", type=int, default=0,
+                        help="toggle someone's live state every N status requests, "
+                        "or with --eventsub every N seconds so it's pushed before a poll sees it")
+    parser.add_argument("--golden", default=None, help="golden frame directory")
+    parser.add_argument("--golden-every", type=int, default=50)
+    parser.add_argument("--update-golden", action="store_true")
+    parser.add_argument("--verbose", action="store_true", help="show code.py's output")
+    parser.add_argument("--tls", action="store_true", help="fake API serves HTTPS")
+    parser.add_argument("--handshake-delay", type=float, default=0,
+                        help="seconds the fake API adds to each new connection")
+    parser.add_argument("--eventsub", action="store_true",
+                        help="fake API serves EventSub and code.py gets a user token for it")
+    parser.add_argument("--profile", action="store_true",
+                        help="turn on the profiler, its dumps go to code.py's output")
+    parser.add_argument("--flash", default=None,
+                        help="directory for files code.py saves, kept between runs")
+    parser.add_argument("--hub", action="store_true",
+                        help="run tools/hub.py against the fake API and get the status from it")
+    parser.add_argument("--warm-restart", action="store_true",
+                        help="run again as if the watchdog had reset the board, to compare boot times")
+    parser.add_argument("--record", default=None, help="log the Helix responses to this file")
+    parser.add_argument("--replay", default=None,
+                        help="answer Helix requests from a log instead of the fake API")
+    parser.add_argument("--replay-speed", type=float, default=1,
+                        help="times faster than recorded to replay, 0 for one response per request")
+    parser.add_argument("--size", default=None,
+                        help="display size as WIDTHxHEIGHT, e.g. 128x32 for two chained panels")
+    args = parser.parse_args()
+
+    streamers = None
+    if args.streamers:
+        streamers = args.streamers.split(",")
+    if args.watch:
+        streamers = ["streamer%05d" % i for i in range(args.watch)]
+    # The same fake API for both runs of a warm restart, so the saved token is still good
+    twitch = FakeTwitch(live=args.live.split(","),
+                        change_every=0 if args.eventsub else args.change_every,
+                        tls=args.tls, handshake_delay=args.handshake_delay, eventsub=args.eventsub,
+                        # simulated time runs ahead of the server's, so keepalives
+                        # have to come more often than the timeout says
+                        keepalive_every=None if args.clock == "real" else 0.01).start()
+    options = {"frames": args.frames, "clock": args.clock, "streamers": streamers,
+               "golden_dir": args.golden, "golden_every": args.golden_every,
+               "update_golden": args.update_golden, "quiet": not args.verbose,
+               "profile": args.profile, "twitch": twitch, "record_file": args.record,
+               "replay_file": args.replay, "replay_speed": args.replay_speed,
+               "size": tuple(int(n) for n in args.size.split("x")) if args.size else None}
+    if args.eventsub and args.change_every:
+        options["on_frame"] = live_changer(twitch, args.change_every)
+    hub = None
+    try:
+        if args.hub:
+            hub, options["hub_address"] = start_hub(twitch, args.clock)
+        with tempfile.TemporaryDirectory() as flash_dir:
+            options["flash_dir"] = args.flash or flash_dir
+            results = run(**options)
+            if args.warm_restart:
+                cold_boot = results["boot_s"]
+                results = run(reset_reason=microcontroller.ResetReason.WATCHDOG, **options)
+                print("Boot: %.2f s cold, %.2f s warm" % (cold_boot, results["boot_s"]))
+    finally:
+        if hub is not None:
+            hub.terminate()
+            hub.wait()
+        twitch.stop()
+    print("Stopped by:", results["stopped_by"])
+    print("Frames: %d in %.2f s, %.1f FPS" % (results["frames"], results["wall_s"], results["fps"]))
+    print("Per frame: %.3f ms compositing, %.3f ms code.py" %
+          (results["render_ms_per_frame"], results["code_ms_per_frame"]))
+    print("Twitch requests:", results["twitch_requests"], "HTTP:", results["http"])
+    if results["eventsub"]:
+        print("EventSub:", results["eventsub"])
+    if results["helix_log"]:
+        print("Helix log:", results["helix_log"])
+    if args.golden:
+        if args.update_golden:
+            print("Saved", results["golden_saved"], "golden frames")
+        else:
+            print("Golden frames: %d checked, %d different (max diff %d)" %
+                  (results["golden_checked"], results["golden_mismatches"],
+                   results["golden_max_diff"]))
+            if results["golden_mismatches"]:
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
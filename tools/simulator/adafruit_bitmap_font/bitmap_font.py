@@ -0,0 +1,123 @@
+"""
+Host-side stand-in for adafruit_bitmap_font.bitmap_font.
+Fonts are read from BDF files, a request for a .pcf file uses the .bdf
+file next to it.  Glyphs are decoded the first time they are asked for,
+like the real library, and glyphs loaded outside load_glyphs() are
+counted in lazy_loads so render-time font loading shows up.
+"""
+import os
+
+import displayio
+import simclock
+
+_sources = {}  # BDF file path: {codepoint: raw glyph}, parsed once per run
+
+
+class Glyph:
+    """
+    One character, the same fields as adafruit_bitmap_font's Glyph
+    """
+    # pylint: disable=too-many-arguments,too-few-public-methods
+    def __init__(self, bitmap, tile_index, width, height, dx, dy, shift_x, shift_y):
+        self.bitmap = bitmap
+        self.tile_index = tile_index
+        self.width = width
+        self.height = height
+        self.dx = dx
+        self.dy = dy
+        self.shift_x = shift_x
+        self.shift_y = shift_y
+
+
+def _parse_bdf(path):
+    """
+    Read every glyph and the font properties out of a BDF file
+    """
+    properties = {}
+    glyphs = {}
+    with open(path, "r", encoding="utf-8") as bdf:
+        glyph = None
+        rows = None
+        for line in bdf:
+            fields = line.split()
+            if not fields:
+                continue
+            key = fields[0]
+            if rows is not None:
+                if key == "ENDCHAR":
+                    glyph["rows"] = rows
+                    glyphs[glyph["encoding"]] = glyph
+                    glyph = rows = None
+                else:
+                    rows.append(int(key, 16))
+            elif key == "STARTCHAR":
+                glyph = {}
+            elif glyph is not None:
+                if key == "ENCODING":
+                    glyph["encoding"] = int(fields[1])
+                elif key == "DWIDTH":
+                    glyph["dwidth"] = (int(fields[1]), int(fields[2]))
+                elif key == "BBX":
+                    glyph["bbx"] = tuple(int(f) for f in fields[1:5])
+                elif key == "BITMAP":
+                    rows = []
+            elif key in ("FONTBOUNDINGBOX", "FONT_ASCENT", "FONT_DESCENT"):
+                properties[key] = tuple(int(f) for f in fields[1:])
+    return properties, glyphs
+
+
+class BDF:
+    """
+    A BDF font, glyphs are decoded into displayio Bitmaps when needed
+    """
+    def __init__(self, path):
+        if path not in _sources:
+            _sources[path] = _parse_bdf(path)
+        self._properties, self._raw = _sources[path]
+        self._glyphs = {}
+        self.lazy_loads = 0  # glyphs loaded by get_glyph() rather than load_glyphs()
+        self.ascent = self._properties["FONT_ASCENT"][0]
+        self.descent = self._properties["FONT_DESCENT"][0]
+
+    def get_bounding_box(self):
+        return self._properties["FONTBOUNDINGBOX"]
+
+    def _decode(self, code):
+        raw = self._raw.get(code)
+        if raw is None:
+            self._glyphs[code] = None
+            return
+        width, height, dx, dy = raw["bbx"]
+        bitmap = displayio.Bitmap(max(width, 1), max(height, 1), 2)
+        row_bits = (width + 7) // 8 * 8
+        for y, row in enumerate(raw["rows"][:height]):
+            for x in range(width):
+                if row & (1 << (row_bits - 1 - x)):
+                    bitmap[x, y] = 1
+        self._glyphs[code] = Glyph(bitmap, 0, width, height, dx, dy, *raw["dwidth"])
+
+    def load_glyphs(self, code_points):
+        if isinstance(code_points, int):
+            code_points = (code_points,)
+        elif isinstance(code_points, (str, bytes)):
+            code_points = [c if isinstance(c, int) else ord(c) for c in code_points]
+        for code in code_points:
+            if code not in self._glyphs:
+                self._decode(code)
+
+    def get_glyph(self, code):
+        if code not in self._glyphs:
+            self.lazy_loads += 1
+            self._decode(code)
+        return self._glyphs[code]
+
+
+def load_font(filename, bitmap=None):
+    """
+    Load a font, the .bdf version of a .pcf file is used
+    """
+    # pylint: disable=unused-argument
+    root, ext = os.path.splitext(filename)
+    if ext == ".pcf":
+        filename = root + ".bdf"
+    return BDF(simclock.board_path(filename))
@@ -0,0 +1,4 @@
+"""
+Host-side stand-in for adafruit_display_text, just the bitmap labels
+code.py uses.
+"""
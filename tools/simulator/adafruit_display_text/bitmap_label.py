@@ -0,0 +1,143 @@
+"""
+Host-side stand-in for adafruit_display_text.bitmap_label.
+The text is rendered into one bitmap every time it changes, like the
+real bitmap_label, and the label's y is the vertical middle of the text.
+"""
+import displayio
+
+
+class Label(displayio.Group):
+    """
+    A text label drawn into a single bitmap
+    """
+    # pylint: disable=too-many-arguments,too-many-instance-attributes
+    def __init__(self, font, *, text="", color=0xFFFFFF, background_color=None,
+                 anchor_point=None, anchored_position=None, scale=1, x=0, y=0, **kwargs):
+        # pylint: disable=unused-argument
+        super().__init__(scale=scale, x=x, y=y)
+        self.font = font
+        self._palette = displayio.Palette(2)
+        self._color = None
+        self._background_color = None
+        self.color = color
+        self.background_color = background_color
+        self._anchor_point = anchor_point
+        self._anchored_position = anchored_position
+        self._text = None
+        self._bounding_box = (0, 0, 0, 0)
+        self._tilegrid = None
+        self.renders = 0  # times the text was laid out
+        self.text = text
+
+    def _render_text(self, text):
+        """
+        Lay out the glyphs of the text into a bitmap
+        """
+        glyphs = [self.font.get_glyph(ord(c)) for c in text]
+        glyphs = [g for g in glyphs if g is not None]
+        width = sum(g.shift_x for g in glyphs)
+        ascent, descent = self.font.ascent, self.font.descent
+        height = ascent + descent
+        y_offset = ascent // 2 - ascent
+        self._bounding_box = (0, y_offset, width, height)
+        while len(self) > 0:
+            self.pop()
+        self._tilegrid = None
+        self.renders += 1
+        if width == 0:
+            return
+        bitmap = displayio.Bitmap(width, height, 2)
+        x = 0
+        for glyph in glyphs:
+            top = ascent - (glyph.height + glyph.dy)
+            left = x + glyph.dx
+            # Glyph pixels that land outside the line box are clipped
+            src = glyph.bitmap.data[:glyph.height, :glyph.width]
+            y0, x0 = max(top, 0), max(left, 0)
+            y1, x1 = min(top + glyph.height, height), min(left + glyph.width, width)
+            if y0 < y1 and x0 < x1:
+                region = src[y0 - top:y1 - top, x0 - left:x1 - left]
+                bitmap.data[y0:y1, x0:x1] |= region
+            x += glyph.shift_x
+        self._tilegrid = displayio.TileGrid(bitmap, pixel_shader=self._palette, y=y_offset)
+        self.append(self._tilegrid)
+
+    def _update_position(self):
+        """
+        Move the label so its anchor point is at the anchored position
+        """
+        if self._anchor_point is None or self._anchored_position is None:
+            return
+        box_x, box_y, box_w, box_h = self._bounding_box
+        self.x = round(self._anchored_position[0] - box_x * self.scale
+                       - round(self._anchor_point[0] * box_w * self.scale))
+        self.y = round(self._anchored_position[1] - box_y * self.scale
+                       - round(self._anchor_point[1] * box_h * self.scale))
+
+    @property
+    def text(self):
+        return self._text
+
+    @text.setter
+    def text(self, new_text):
+        if new_text == self._text:
+            return
+        self._text = new_text
+        self._render_text(new_text)
+        self._update_position()
+
+    @property
+    def color(self):
+        return self._color
+
+    @color.setter
+    def color(self, new_color):
+        self._color = new_color
+        if new_color is None:
+            self._palette.make_transparent(1)
+        else:
+            self._palette[1] = new_color
+            self._palette.make_opaque(1)
+
+    @property
+    def background_color(self):
+        return self._background_color
+
+    @background_color.setter
+    def background_color(self, new_color):
+        self._background_color = new_color
+        if new_color is None:
+            self._palette.make_transparent(0)
+        else:
+            self._palette[0] = new_color
+            self._palette.make_opaque(0)
+
+    @property
+    def anchor_point(self):
+        return self._anchor_point
+
+    @anchor_point.setter
+    def anchor_point(self, new_anchor_point):
+        self._anchor_point = new_anchor_point
+        self._update_position()
+
+    @property
+    def anchored_position(self):
+        return self._anchored_position
+
+    @anchored_position.setter
+    def anchored_position(self, new_position):
+        self._anchored_position = new_position
+        self._update_position()
+
+    @property
+    def bounding_box(self):
+        return self._bounding_box
+
+    @property
+    def width(self):
+        return self._bounding_box[2] * self.scale
+
+    @property
+    def height(self):
+        return self._bounding_box[3] * self.scale
@@ -0,0 +1,20 @@
+"""
+Host-side stand-in for adafruit_display_text.scrolling_label
+"""
+from adafruit_display_text.bitmap_label import Label
+
+
+class ScrollingLabel(Label):
+    """
+    A label that shows max_characters of its text at a time
+    """
+    def __init__(self, font, max_characters=10, animate_time=0.3, current_index=0, **kwargs):
+        self.max_characters = max_characters
+        self.animate_time = animate_time
+        self.current_index = current_index
+        super().__init__(font, **kwargs)
+
+    def update(self, force=False):
+        """
+        Nothing is animated in the simulator
+        """
@@ -0,0 +1,66 @@
+"""
+Host-side stand-in for adafruit_esp32spi.  The ESP32 is always connected
+and its network time comes from the simulated clock.
+"""
+import time
+
+import simclock
+
+WL_NO_SHIELD = 0xFF
+WL_NO_MODULE = 0xFF
+WL_IDLE_STATUS = 0
+WL_CONNECTED = 3
+
+TCP_MODE = 0
+UDP_MODE = 1
+TLS_MODE = 2
+
+
+class ESP_SPIcontrol:  # pylint: disable=invalid-name
+    """
+    A simulated ESP32 co-processor
+    """
+    TCP_MODE = TCP_MODE
+    UDP_MODE = UDP_MODE
+    TLS_MODE = TLS_MODE
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, spi, cs_dio, ready_dio, reset_dio, gpio0_dio=None, *, debug=False):
+        # pylint: disable=unused-argument
+        self.status = WL_IDLE_STATUS
+        self.firmware_version = bytearray(b"1.7.4\x00")
+        self.MAC_address = bytearray(b"\x02\x00\x00\x00\x00\x01")  # pylint: disable=invalid-name
+        self.ssid = bytearray(b"simulator")
+        self.rssi = -40
+        self.ip_address = bytearray(b"\x7f\x00\x00\x01")
+        self.ntp_delay = 2.0   # seconds after connecting before the ESP32 has the time
+        self._connected_at = None
+        self._connected = False
+
+    @property
+    def is_connected(self):
+        return self._connected
+
+    def connect(self, secrets):
+        # pylint: disable=unused-argument
+        self._connected = True
+        self._connected_at = time.monotonic()
+        self.status = WL_CONNECTED
+
+    def connect_AP(self, ssid, password, timeout_s=10):  # pylint: disable=invalid-name
+        # pylint: disable=unused-argument
+        self.connect(None)
+
+    def disconnect(self):
+        self._connected = False
+
+    def pretty_ip(self, ip):
+        return ".".join(str(b) for b in ip)
+
+    def get_time(self):
+        if self._connected_at is None or time.monotonic() < self._connected_at + self.ntp_delay:
+            raise OSError("Failed to get time")
+        return (simclock.network_time(), 0)
+
+    def reset(self):
+        pass
@@ -0,0 +1,82 @@
+"""
+Host-side stand-in for adafruit_esp32spi_socket, sockets are host
+sockets.  HOST_MAP redirects (host, port) to a local server, and
+TLS_MODE connections are wrapped with ssl without checking certificates
+so local test servers work.
+"""
+import select
+import socket as _socket
+import ssl
+
+AF_INET = _socket.AF_INET
+SOCK_STREAM = _socket.SOCK_STREAM
+SOCK_DGRAM = _socket.SOCK_DGRAM
+TCP_MODE = 0
+TLS_MODE = 2
+
+HOST_MAP = {}    # (host, port): (host, port, use_tls)
+_the_interface = None
+
+
+def set_interface(iface):
+    global _the_interface  # pylint: disable=global-statement
+    _the_interface = iface
+
+
+def getaddrinfo(host, port, family=0, socktype=0, proto=0, flags=0):
+    # pylint: disable=unused-argument
+    return [(AF_INET, socktype, proto, "", (host, port))]
+
+
+class socket:  # pylint: disable=invalid-name
+    """
+    A host socket with the esp32spi socket interface
+    """
+    def __init__(self, family=AF_INET, type=SOCK_STREAM, proto=0, fileno=None):  # pylint: disable=redefined-builtin
+        # pylint: disable=unused-argument
+        self._socket = None
+        self._timeout = None
+
+    def connect(self, address, conntype=None):
+        host, port = address
+        use_tls = conntype == TLS_MODE
+        if (host, port) in HOST_MAP:
+            host, port, use_tls = HOST_MAP[(host, port)]
+        sock = _socket.create_connection((host, port), timeout=self._timeout)
+        if use_tls:
+            context = ssl.create_default_context()
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+            sock = context.wrap_socket(sock, server_hostname=address[0])
+        self._socket = sock
+
+    def send(self, data):
+        self._socket.sendall(data)
+
+    def write(self, data):
+        self.send(data)
+
+    def recv(self, bufsize=0):
+        return self._socket.recv(bufsize or 4096)
+
+    def recv_into(self, buffer, nbytes=0):
+        return self._socket.recv_into(buffer, nbytes)
+
+    def available(self):
+        if isinstance(self._socket, ssl.SSLSocket) and self._socket.pending():
+            return self._socket.pending()
+        readable, _, _ = select.select([self._socket], [], [], 0)
+        return 1 if readable else 0
+
+    def connected(self):
+        return self._socket is not None
+
+    def settimeout(self, value):
+        self._timeout = value
+        if self._socket is not None:
+            self._socket.settimeout(value)
+
+    def close(self):
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
@@ -0,0 +1,49 @@
+"""
+Host-side stand-in for adafruit_esp32spi_wifimanager, requests go
+through the simulated adafruit_requests
+"""
+import adafruit_requests as requests
+
+
+class ESPSPI_WiFiManager:  # pylint: disable=invalid-name
+    """
+    Connects the simulated ESP32 and makes requests
+    """
+    # pylint: disable=too-many-arguments
+    def __init__(self, esp, secrets, status_pixel=None, attempts=2, connection_type=1, debug=False):
+        # pylint: disable=unused-argument
+        self.esp = esp
+        self.secrets = secrets
+        self.debug = debug
+        self.pixel_status = status_pixel
+
+    def connect(self):
+        self.esp.connect(self.secrets)
+
+    def reset(self):
+        pass
+
+    def get(self, url, **kw):
+        return requests.get(url, **kw)
+
+    def post(self, url, **kw):
+        return requests.post(url, **kw)
+
+    def put(self, url, **kw):
+        return requests.put(url, **kw)
+
+    def patch(self, url, **kw):
+        return requests.patch(url, **kw)
+
+    def delete(self, url, **kw):
+        return requests.delete(url, **kw)
+
+    def ping(self, host, ttl=250):
+        # pylint: disable=unused-argument
+        return 1
+
+    def ip_address(self):
+        return self.esp.pretty_ip(self.esp.ip_address)
+
+    def signal_strength(self):
+        return self.esp.rssi
@@ -0,0 +1,48 @@
+"""
+Host-side stand-in for adafruit_imageload, loads the uncompressed
+8 bit (or less) palette BMP files the display uses.
+"""
+import struct
+
+import numpy as np
+
+import simclock
+
+
+def load(filename, *, bitmap=None, palette=None):
+    """
+    Load a palette BMP into a Bitmap and Palette
+    :param str filename: BMP file, paths starting with / are on CIRCUITPY
+    :param bitmap: the Bitmap class to make
+    :param palette: the Palette class to make
+    """
+    with open(simclock.board_path(filename), "rb") as bmp:
+        data = bmp.read()
+    if data[:2] != b"BM":
+        raise ValueError("Not a BMP file: " + filename)
+    pixel_offset = struct.unpack_from("<I", data, 10)[0]
+    header_size = struct.unpack_from("<I", data, 14)[0]
+    width, height = struct.unpack_from("<ii", data, 18)
+    bits = struct.unpack_from("<H", data, 28)[0]
+    compression = struct.unpack_from("<I", data, 30)[0]
+    colors = struct.unpack_from("<I", data, 46)[0] or (1 << bits)
+    if compression != 0 or bits > 8:
+        raise NotImplementedError("Only uncompressed palette BMPs are supported")
+    bottom_up = height > 0
+    height = abs(height)
+
+    pal = palette(colors)
+    table = np.frombuffer(data, dtype=np.uint8, count=colors * 4, offset=14 + header_size)
+    pal.colors[:] = table.reshape(colors, 4)[:, 2::-1]  # stored as BGRx
+
+    bmp_out = bitmap(width, height, colors)
+    stride = (width * bits + 31) // 32 * 4
+    rows = np.frombuffer(data, dtype=np.uint8, count=stride * height, offset=pixel_offset)
+    rows = np.unpackbits(rows.reshape(height, stride), axis=1)
+    # Turn each group of bits back into a palette index
+    weights = 1 << np.arange(bits - 1, -1, -1)
+    pixels = (rows.reshape(height, -1, bits) * weights).sum(axis=2)[:, :width]
+    if bottom_up:
+        pixels = pixels[::-1]
+    bmp_out.data[:] = pixels
+    return bmp_out, pal
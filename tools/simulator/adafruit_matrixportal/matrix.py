@@ -0,0 +1,17 @@
+"""
+Host-side stand-in for adafruit_matrixportal.matrix
+"""
+import displayio
+
+
+class Matrix:
+    """
+    An RGB matrix of width x height, the display only shows bit_depth
+    bits of each color like the real one
+    """
+    # pylint: disable=too-few-public-methods,too-many-arguments
+    def __init__(self, *, width=64, height=32, bit_depth=2, alt_addr_pins=None,
+                 color_order="RGB", serpentine=True, tile_rows=1, rotation=0):
+        # pylint: disable=unused-argument
+        self.display = displayio.Display(width, height, bit_depth=bit_depth)
+        self.display.rotation = rotation
@@ -0,0 +1,12 @@
+"""
+Host-side stand-in for adafruit_matrixportal.matrixportal, code.py only imports it
+"""
+
+
+class MatrixPortal:
+    """
+    Not used by code.py
+    """
+    # pylint: disable=too-few-public-methods
+    def __init__(self, *args, **kwargs):
+        raise NotImplementedError("MatrixPortal isn't simulated")
@@ -0,0 +1,171 @@
+"""
+Host-side stand-in for adafruit_requests built on http.client.
+URLs are redirected with URL_MAP so code.py talks to a local fake
+Twitch server instead of the real one.  Connections are kept open and
+reused per host like adafruit_requests does, and connects and requests
+are counted so connection reuse can be measured.
+"""
+import http.client
+import json as json_module
+import ssl
+import urllib.parse
+
+URL_MAP = {}     # url prefix: replacement, e.g. "https://api.twitch.tv": "http://127.0.0.1:8080"
+stats = {"connects": 0, "requests": 0}
+
+
+def _map_url(url):
+    for prefix, replacement in URL_MAP.items():
+        if url.startswith(prefix):
+            return replacement + url[len(prefix):]
+    return url
+
+
+class Response:
+    """
+    The response to a request, the body is read when it's asked for
+    """
+    def __init__(self, session, key, response):
+        self._session = session
+        self._key = key
+        self._response = response
+        self.status_code = response.status
+        self.reason = response.reason
+        self.headers = {k.lower(): v for k, v in response.getheaders()}
+        self._content = None
+
+    def iter_content(self, chunk_size=1, decode_unicode=False):
+        # pylint: disable=unused-argument
+        while True:
+            chunk = self._response.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+        self.close()
+
+    @property
+    def content(self):
+        if self._content is None:
+            self._content = self._response.read()
+            self.close()
+        return self._content
+
+    @property
+    def text(self):
+        return str(self.content, "utf-8")
+
+    def json(self):
+        return json_module.loads(self.content)
+
+    def close(self):
+        if self._response is not None:
+            self._response.read()  # drain so the connection can be reused
+            self._session._release(self._key, self._response.will_close)  # pylint: disable=protected-access
+            self._response = None
+
+
+class Session:
+    """
+    A requests session that keeps one connection open per host
+    """
+    def __init__(self, socket_pool=None, ssl_context=None):
+        # pylint: disable=unused-argument
+        self._open_sockets = {}   # named like adafruit_requests', connections here
+
+    def _connect(self, scheme, host, port):
+        stats["connects"] += 1
+        if scheme == "https":
+            context = ssl.create_default_context()
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+            return http.client.HTTPSConnection(host, port, context=context, timeout=30)
+        return http.client.HTTPConnection(host, port, timeout=30)
+
+    def _release(self, key, will_close):
+        # The server said it's closing the connection, so the next request makes a new one
+        if will_close and key in self._open_sockets:
+            self._open_sockets.pop(key).close()
+
+    # pylint: disable=too-many-arguments
+    def request(self, method, url, data=None, json=None, headers=None, stream=False, timeout=60):
+        # pylint: disable=unused-argument
+        parts = urllib.parse.urlsplit(_map_url(url))
+        key = (parts.scheme, parts.hostname, parts.port)
+        body = None
+        headers = dict(headers or {})
+        if json is not None:
+            body = json_module.dumps(json)
+            headers["Content-Type"] = "application/json"
+        elif isinstance(data, dict):
+            body = urllib.parse.urlencode(data)
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        elif data is not None:
+            body = data
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        stats["requests"] += 1
+        for attempt in range(2):
+            connection = self._open_sockets.get(key)
+            if connection is None:
+                connection = self._connect(*key)
+                self._open_sockets[key] = connection
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                return Response(self, key, connection.getresponse())
+            except (http.client.HTTPException, OSError):
+                # The server dropped the kept-alive connection, try a new one
+                connection.close()
+                del self._open_sockets[key]
+                if attempt:
+                    raise
+        return None
+
+    def get(self, url, **kw):
+        return self.request("GET", url, **kw)
+
+    def post(self, url, **kw):
+        return self.request("POST", url, **kw)
+
+    def put(self, url, **kw):
+        return self.request("PUT", url, **kw)
+
+    def patch(self, url, **kw):
+        return self.request("PATCH", url, **kw)
+
+    def delete(self, url, **kw):
+        return self.request("DELETE", url, **kw)
+
+
+_default_session = Session()
+
+
+def set_socket(sock, iface=None):
+    """
+    The simulator doesn't need the socket module
+    """
+    # pylint: disable=unused-argument
+
+
+def request(method, url, **kw):
+    return _default_session.request(method, url, **kw)
+
+
+def get(url, **kw):
+    return _default_session.get(url, **kw)
+
+
+def post(url, **kw):
+    return _default_session.post(url, **kw)
+
+
+def put(url, **kw):
+    return _default_session.put(url, **kw)
+
+
+def patch(url, **kw):
+    return _default_session.patch(url, **kw)
+
+
+def delete(url, **kw):
+    return _default_session.delete(url, **kw)
@@ -0,0 +1,28 @@
+"""
+Host-side stand-in for bitmaptools, only what the display uses
+"""
+
+
+# pylint: disable=too-many-arguments
+def blit(dest_bitmap, source_bitmap, x, y, *, x1=0, y1=0, x2=None, y2=None, skip_index=None):
+    """
+    Copy the x1,y1 to x2,y2 region of source into dest at x,y
+    """
+    if x2 is None:
+        x2 = source_bitmap.width
+    if y2 is None:
+        y2 = source_bitmap.height
+    region = source_bitmap.data[y1:y2, x1:x2]
+    target = dest_bitmap.data[y:y + (y2 - y1), x:x + (x2 - x1)]
+    if skip_index is None:
+        target[:] = region
+    else:
+        keep = region != skip_index
+        target[keep] = region[keep]
+
+
+def fill_region(dest_bitmap, x1, y1, x2, y2, value):
+    """
+    Fill a rectangle of the bitmap with one value
+    """
+    dest_bitmap.data[y1:y2, x1:x2] = value
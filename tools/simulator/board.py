@@ -0,0 +1,19 @@
+"""
+Host-side stand-in for board, pins are just their names
+"""
+
+
+class Pin:
+    """
+    A named pin
+    """
+    # pylint: disable=too-few-public-methods
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return "board." + self.name
+
+
+def __getattr__(name):
+    return Pin(name)
@@ -0,0 +1,12 @@
+"""
+Host-side stand-in for busio
+"""
+
+
+class SPI:
+    """
+    An SPI bus that nothing talks to, the ESP32 is simulated at a higher level
+    """
+    # pylint: disable=too-few-public-methods
+    def __init__(self, clock, MOSI=None, MISO=None):  # pylint: disable=invalid-name
+        self.clock = clock
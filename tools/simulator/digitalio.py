@@ -0,0 +1,43 @@
+"""
+Host-side stand-in for digitalio
+"""
+
+
+class DigitalInOut:
+    """
+    A pin that remembers its value
+    """
+    # pylint: disable=too-few-public-methods
+    def __init__(self, pin):
+        self.pin = pin
+        self.value = False
+        self.direction = None
+        self.pull = None
+
+    def switch_to_output(self, value=False, **kwargs):
+        # pylint: disable=unused-argument
+        self.value = value
+
+    def switch_to_input(self, pull=None):
+        self.pull = pull
+
+    def deinit(self):
+        pass
+
+
+class Direction:
+    """
+    Pin directions
+    """
+    # pylint: disable=too-few-public-methods
+    INPUT = "input"
+    OUTPUT = "output"
+
+
+class Pull:
+    """
+    Pin pulls
+    """
+    # pylint: disable=too-few-public-methods
+    UP = "up"
+    DOWN = "down"
@@ -0,0 +1,253 @@
+"""
+Host-side stand-in for the CircuitPython displayio module.
+Bitmaps and palettes are NumPy arrays and the scene is composited into
+an RGB frame buffer with vectorized palette lookups and blits, so
+code.py can be run headless for benchmarks and golden frame checks.
+Only the parts of displayio that code.py uses are here.
+"""
+import time
+
+import numpy as np
+
+import bitmaptools
+import simclock
+
+
+def _rgb(color):
+    """
+    Convert a 0xRRGGBB int or (r, g, b) tuple to an (r, g, b) tuple
+    """
+    if isinstance(color, int):
+        return ((color >> 16) & 0xFF, (color >> 8) & 0xFF, color & 0xFF)
+    return tuple(color)
+
+
+class Bitmap:
+    """
+    A 2D array of palette indexes, indexed bitmap[x, y] or bitmap[i]
+    """
+    def __init__(self, width, height, value_count):
+        self.width = width
+        self.height = height
+        self.value_count = value_count
+        self.data = np.zeros((height, width), dtype=np.uint16)
+
+    def __getitem__(self, index):
+        if isinstance(index, tuple):
+            return int(self.data[index[1], index[0]])
+        return int(self.data.flat[index])
+
+    def __setitem__(self, index, value):
+        if isinstance(index, tuple):
+            self.data[index[1], index[0]] = value
+        else:
+            self.data.flat[index] = value
+
+    def fill(self, value):
+        self.data[:] = value
+
+    # pylint: disable=too-many-arguments
+    def blit(self, x, y, source_bitmap, *, x1=0, y1=0, x2=None, y2=None, skip_index=None):
+        """
+        Copy a region of source into this bitmap at x,y, CircuitPython 7's
+        version of bitmaptools.blit()
+        """
+        bitmaptools.blit(self, source_bitmap, x, y, x1=x1, y1=y1, x2=x2, y2=y2,
+                         skip_index=skip_index)
+
+
+class Palette:
+    """
+    A list of colors, any of which can be transparent
+    """
+    def __init__(self, color_count):
+        self.colors = np.zeros((color_count, 3), dtype=np.uint8)
+        self.transparent = np.zeros(color_count, dtype=bool)
+
+    def __len__(self):
+        return len(self.colors)
+
+    def __setitem__(self, index, color):
+        self.colors[index] = _rgb(color)
+
+    def __getitem__(self, index):
+        r, g, b = self.colors[index]
+        return (int(r) << 16) | (int(g) << 8) | int(b)
+
+    def make_transparent(self, index):
+        self.transparent[index] = True
+
+    def make_opaque(self, index):
+        self.transparent[index] = False
+
+    def is_transparent(self, index):
+        return bool(self.transparent[index])
+
+
+class TileGrid:
+    """
+    A grid of tiles, each tile is a tile_width x tile_height piece of the bitmap
+    """
+    # pylint: disable=too-many-arguments
+    def __init__(self, bitmap, *, pixel_shader, width=1, height=1,
+                 tile_width=None, tile_height=None, default_tile=0, x=0, y=0):
+        self.bitmap = bitmap
+        self.pixel_shader = pixel_shader
+        self.width = width
+        self.height = height
+        self.tile_width = tile_width or bitmap.width
+        self.tile_height = tile_height or bitmap.height
+        self.tiles = np.full((height, width), default_tile, dtype=np.uint16)
+        self.x = x
+        self.y = y
+        self.hidden = False
+
+    def __getitem__(self, index):
+        if isinstance(index, tuple):
+            return int(self.tiles[index[1], index[0]])
+        return int(self.tiles.flat[index])
+
+    def __setitem__(self, index, value):
+        if isinstance(index, tuple):
+            self.tiles[index[1], index[0]] = value
+        else:
+            self.tiles.flat[index] = value
+
+    def _render(self, frame, x, y, scale):
+        """
+        Blit this tilegrid into the frame buffer at (x, y)
+        """
+        th, tw = self.tile_height, self.tile_width
+        rows = self.bitmap.height // th
+        cols = self.bitmap.width // tw
+        # Cut the bitmap into tiles, pick the ones in the grid and stitch them together
+        tiles = self.bitmap.data[:rows * th, :cols * tw].reshape(rows, th, cols, tw)
+        tiles = tiles.transpose(0, 2, 1, 3).reshape(rows * cols, th, tw)
+        image = tiles[self.tiles].transpose(0, 2, 1, 3).reshape(self.height * th, self.width * tw)
+        if scale != 1:
+            image = image.repeat(scale, axis=0).repeat(scale, axis=1)
+        _blit(frame, image, self.pixel_shader, x, y)
+
+
+def _blit(frame, image, palette, x, y):
+    """
+    Palette lookup an image of indexes and copy the opaque pixels into the frame
+    """
+    fh, fw = frame.shape[:2]
+    ih, iw = image.shape
+    x0, y0 = max(x, 0), max(y, 0)
+    x1, y1 = min(x + iw, fw), min(y + ih, fh)
+    if x0 >= x1 or y0 >= y1:
+        return
+    window = image[y0 - y:y1 - y, x0 - x:x1 - x]
+    opaque = ~palette.transparent[window]
+    frame[y0:y1, x0:x1][opaque] = palette.colors[window][opaque]
+
+
+class Group:
+    """
+    A list of tilegrids and groups drawn in order, offset by x, y
+    """
+    def __init__(self, *, scale=1, x=0, y=0):
+        self.scale = scale
+        self.x = x
+        self.y = y
+        self.hidden = False
+        self._layers = []
+
+    def append(self, layer):
+        self._layers.append(layer)
+
+    def insert(self, index, layer):
+        self._layers.insert(index, layer)
+
+    def pop(self, index=-1):
+        return self._layers.pop(index)
+
+    def remove(self, layer):
+        self._layers.remove(layer)
+
+    def index(self, layer):
+        return self._layers.index(layer)
+
+    def __len__(self):
+        return len(self._layers)
+
+    def __getitem__(self, index):
+        return self._layers[index]
+
+    def __setitem__(self, index, layer):
+        self._layers[index] = layer
+
+    def __iter__(self):
+        return iter(self._layers)
+
+    def _render(self, frame, x, y, scale):
+        scale *= self.scale
+        for layer in self._layers:
+            if not layer.hidden:
+                layer._render(frame, x + layer.x * scale, y + layer.y * scale, scale)  # pylint: disable=protected-access
+
+
+class Display:
+    """
+    A display that renders the shown group into a NumPy RGB frame buffer.
+    With auto_refresh on a frame is rendered every time the code sleeps,
+    otherwise only when refresh() is called.  refresh() with a target
+    frame rate waits for the next frame time, or skips the frame and
+    returns False if the last call was more than a frame ago, like
+    CircuitPython.
+    """
+    def __init__(self, width, height, bit_depth=6):
+        self.width = width
+        self.height = height
+        self.bit_depth = bit_depth
+        self.auto_refresh = True
+        self.refreshed = False         # refresh() rendered since the last sleep
+        self._last_refresh_call = None  # time.monotonic_ns() of the last refresh()
+        self._last_refresh = 0          # and of the last one that rendered
+        self.root_group = None
+        self.frame = np.zeros((height, width, 3), dtype=np.uint8)
+        simclock.display = self
+
+    def show(self, group):
+        self.root_group = group
+
+    def refresh(self, *, target_frames_per_second=None, minimum_frames_per_second=0):
+        # pylint: disable=unused-argument
+        now = time.monotonic_ns()
+        if target_frames_per_second and self._last_refresh_call is not None:
+            period = 1000000000 // target_frames_per_second
+            since_call = now - self._last_refresh_call
+            self._last_refresh_call = now
+            if since_call > period:
+                return False
+            # Wait to line up with the frame rate from the last real refresh
+            simclock.wait((period - (now - self._last_refresh) % period) / 1000000000)
+        self._last_refresh_call = time.monotonic_ns()
+        self._last_refresh = self._last_refresh_call
+        self.refreshed = True
+        self._render()
+        return True
+
+    def _render(self):
+        """
+        Composite the shown group and hand the frame to the simulator
+        """
+        start = time.perf_counter_ns()
+        frame = np.zeros((self.height, self.width, 3), dtype=np.uint8)
+        if self.root_group is not None and not self.root_group.hidden:
+            self.root_group._render(frame, self.root_group.x, self.root_group.y, 1)  # pylint: disable=protected-access
+        # The matrix only shows bit_depth bits of each color
+        shift = 8 - self.bit_depth
+        if shift > 0:
+            frame = (frame >> shift) << shift
+        self.frame = frame
+        simclock.render_ns += time.perf_counter_ns() - start
+        simclock.frame_done(frame)
+
+
+def release_displays():
+    """
+    Nothing to release on the host
+    """
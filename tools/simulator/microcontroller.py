@@ -0,0 +1,75 @@
+"""
+Host-side stand-in for microcontroller.  The watchdog checks the time
+between feeds against the simulated clock and resets the simulation if
+it would have gone off on the board.
+"""
+import time
+
+import simclock
+import watchdog as _watchdog
+
+
+class _WatchDogTimer:
+    """
+    The watchdog timer
+    """
+    def __init__(self):
+        self.timeout = 0
+        self._mode = None
+        self._fed = 0
+
+    @property
+    def mode(self):
+        return self._mode
+
+    @mode.setter
+    def mode(self, value):
+        self._mode = value
+        self._fed = time.monotonic()
+
+    def feed(self):
+        if self._mode is None:
+            raise ValueError("WatchDogTimer is not currently running")
+        late = time.monotonic() - self._fed
+        if late > self.timeout:
+            if self._mode == _watchdog.WatchDogMode.RAISE:
+                raise _watchdog.WatchDogTimeout()
+            raise simclock.SimulatedReset("watchdog: %.1f s between feeds" % late)
+        self._fed = time.monotonic()
+
+    def deinit(self):
+        self._mode = None
+
+
+class _ResetReason:
+    """
+    Why the board last reset
+    """
+    # pylint: disable=too-few-public-methods
+    POWER_ON = "POWER_ON"
+    SOFTWARE = "SOFTWARE"
+    WATCHDOG = "WATCHDOG"
+    UNKNOWN = "UNKNOWN"
+
+
+class _Processor:
+    """
+    The processor
+    """
+    # pylint: disable=too-few-public-methods
+    frequency = 120000000
+    temperature = 25.0
+    reset_reason = _ResetReason.POWER_ON
+
+
+ResetReason = _ResetReason
+watchdog = _WatchDogTimer()
+cpu = _Processor()
+nvm = bytearray(8192)
+
+
+def reset():
+    """
+    Reset the board, which ends the simulation
+    """
+    raise simclock.SimulatedReset("microcontroller.reset()")
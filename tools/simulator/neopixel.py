@@ -0,0 +1,21 @@
+"""
+Host-side stand-in for neopixel
+"""
+
+
+class NeoPixel(list):
+    """
+    A list of pixel colors
+    """
+    def __init__(self, pin, n, *, brightness=1.0, auto_write=True, **kwargs):
+        # pylint: disable=unused-argument
+        super().__init__([(0, 0, 0)] * n)
+        self.brightness = brightness
+        self.auto_write = auto_write
+
+    def fill(self, color):
+        for i in range(len(self)):
+            self[i] = color
+
+    def show(self):
+        pass
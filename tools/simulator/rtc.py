@@ -0,0 +1,18 @@
+"""
+Host-side stand-in for rtc, setting the time moves the simulated clock
+"""
+import simclock
+
+
+class RTC:
+    """
+    The real time clock
+    """
+    # pylint: disable=too-few-public-methods
+    @property
+    def datetime(self):
+        return simclock.localtime()
+
+    @datetime.setter
+    def datetime(self, value):
+        simclock.set_rtc(value)
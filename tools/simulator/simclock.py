@@ -0,0 +1,174 @@
+"""
+Clock, frame counting and stop conditions for the headless simulator.
+
+install() patches the time module so code.py sees a CircuitPython-like
+clock: time.time() and time.localtime() follow whatever rtc.RTC() was set
+to, and time.sleep() renders a frame when the display auto-refreshes.
+With auto refresh off frames are rendered by display.refresh(), and a
+sleep without a refresh since the last one counts as an idle frame, one
+where nothing changed, so runs still end after max_frames.
+
+In "virtual" mode sleeping doesn't really sleep and the clock only moves
+when the code sleeps, so a run is deterministic and can be compared
+against golden frames.  In "fast" mode sleeps are skipped but the clock
+still counts the real time spent working, which is what benchmarks want.
+In "real" mode everything runs in real time.
+"""
+import os
+import time
+
+
+class SimulationDone(BaseException):
+    """
+    Raised to stop code.py, a BaseException so broad excepts don't catch it
+    """
+
+
+class SimulatedReset(BaseException):
+    """
+    Raised when code.py resets the board or the watchdog would have
+    """
+
+
+_real_monotonic_ns = time.monotonic_ns
+_real_sleep = time.sleep
+_real_time = time.time
+_saved = {}
+
+mode = "real"
+display = None          # the Display, set when one is made
+frames = 0              # frames rendered, plus idle ones
+idle_frames = 0         # sleeps with auto refresh off and nothing refreshed
+max_frames = None       # stop after this many frames
+on_frame = None         # called with (frame number, RGB array) for each frame
+render_ns = 0           # real time spent compositing frames
+sleep_ns = 0            # time code.py asked to sleep
+_offset_ns = 0          # virtual time added by skipped sleeps
+_virtual_ns = 0         # the clock in virtual mode
+_rtc_offset = 0         # rtc time minus the clock, seconds
+
+
+def monotonic_ns():
+    if mode == "virtual":
+        return _virtual_ns
+    return _real_monotonic_ns() + _offset_ns
+
+
+def monotonic():
+    return monotonic_ns() / 1000000000
+
+
+def wait(seconds):
+    """
+    Let time pass without rendering, for sleeps and display.refresh()
+    waiting for its frame rate
+    """
+    global _offset_ns, _virtual_ns, sleep_ns  # pylint: disable=global-statement
+    ns = int(seconds * 1000000000)
+    sleep_ns += ns
+    if mode == "virtual":
+        _virtual_ns += ns
+    elif mode == "fast":
+        _offset_ns += ns
+    else:
+        _real_sleep(seconds)
+
+
+def sleep(seconds):
+    global idle_frames  # pylint: disable=global-statement
+    wait(seconds)
+    if display is None:
+        return
+    if display.auto_refresh:
+        display._render()  # pylint: disable=protected-access
+    elif not display.refreshed:
+        idle_frames += 1
+        frame_done(None)
+    display.refreshed = False
+
+
+def now():
+    """
+    Seconds since the epoch according to the simulated rtc
+    """
+    return monotonic() + _rtc_offset
+
+
+def set_rtc(struct_time):
+    """
+    Set the simulated rtc, like rtc.RTC().datetime = ...
+    """
+    global _rtc_offset  # pylint: disable=global-statement
+    _rtc_offset = _saved["mktime"](struct_time) - _saved["timezone_fix"] - monotonic()
+
+
+def localtime(secs=None):
+    # CircuitPython has no time zones, localtime is the rtc time
+    if secs is None:
+        secs = now()
+    return _saved["gmtime"](int(secs))
+
+
+def frame_done(frame):
+    """
+    Count a rendered frame, pass it on and stop when there have been
+    enough.  frame is None for an idle frame.
+    """
+    global frames  # pylint: disable=global-statement
+    frames += 1
+    if on_frame is not None and frame is not None:
+        on_frame(frames, frame)
+    if max_frames is not None and frames >= max_frames:
+        raise SimulationDone()
+
+
+def install(clock_mode="real", start_time=None):
+    """
+    Patch the time module for the simulation
+    :param str clock_mode: "real", "fast" or "virtual"
+    :param start_time: unix time the network clock reports, default now
+    """
+    global mode, _virtual_ns, _rtc_offset  # pylint: disable=global-statement
+    mode = clock_mode
+    _virtual_ns = _real_monotonic_ns()
+    for name in ("monotonic", "monotonic_ns", "sleep", "time", "localtime"):
+        _saved[name] = getattr(time, name)
+    _saved["mktime"] = time.mktime
+    _saved["gmtime"] = time.gmtime
+    # time.mktime() works in local time, undo that so the rtc is plain seconds
+    _saved["timezone_fix"] = time.mktime(time.gmtime(0))
+    _saved["start_time"] = _real_time() if start_time is None else start_time
+    _saved["start_ns"] = monotonic_ns()
+    # the rtc starts at 2000-01-01 like a board that hasn't synced
+    _rtc_offset = 946684800 - monotonic()
+    time.monotonic = monotonic
+    time.monotonic_ns = monotonic_ns
+    time.sleep = sleep
+    time.time = lambda: int(now())
+    time.localtime = localtime
+
+
+def network_time():
+    """
+    Unix time as the network (NTP) would report it
+    """
+    return int(_saved["start_time"] + (monotonic_ns() - _saved["start_ns"]) / 1000000000)
+
+
+def board_path(path):
+    """
+    Map a path on CIRCUITPY (like "/wow.bmp") to the repo, which is the
+    current directory when code.py runs.  Host paths that exist are kept.
+    """
+    if os.path.exists(path):
+        return path
+    return path.lstrip("/")
+
+
+def uninstall():
+    """
+    Put the time module back
+    """
+    for name, value in _saved.items():
+        if name in ("monotonic", "monotonic_ns", "sleep", "time", "localtime"):
+            setattr(time, name, value)
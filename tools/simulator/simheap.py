@@ -0,0 +1,44 @@
+"""
+Stand-ins for CircuitPython's gc.mem_free() and gc.mem_alloc().
+
+CPython's gc module doesn't have them, so install() adds them with the
+heap use measured by tracemalloc from the moment it's installed, out of
+a made up heap.  CPython objects are several times bigger than
+CircuitPython's (the made up heap is sized to match) and the fake
+Twitch server's thread is counted too, so the numbers are only good for
+comparing phases and spotting growth, not for the board's free memory.
+"""
+import gc
+import tracemalloc
+
+HEAP_SIZE = 16 * 1024 * 1024   # the Matrix Portal M4 has 192K, CPython needs far more
+
+_base = 0
+
+
+def mem_alloc():
+    return max(0, tracemalloc.get_traced_memory()[0] - _base)
+
+
+def mem_free():
+    return max(0, HEAP_SIZE - mem_alloc())
+
+
+def install(heap_size=None):
+    """
+    Start tracing allocations and add the functions to gc
+    """
+    global _base, HEAP_SIZE  # pylint: disable=global-statement
+    if heap_size is not None:
+        HEAP_SIZE = heap_size
+    tracemalloc.start()
+    _base = tracemalloc.get_traced_memory()[0]
+    gc.mem_alloc = mem_alloc
+    gc.mem_free = mem_free
+
+
+def uninstall():
+    for name in ("mem_alloc", "mem_free"):
+        if hasattr(gc, name):
+            delattr(gc, name)
+    tracemalloc.stop()
@@ -0,0 +1,11 @@
+"""
+Host-side stand-in for terminalio.  CircuitPython's built in terminal
+font isn't available on the host so the repo's BDF font stands in for
+it, text positions will differ a little from the board.
+"""
+import os
+
+from adafruit_bitmap_font import bitmap_font
+
+FONT = bitmap_font.load_font(os.path.join(os.path.dirname(__file__), "..", "..",
+                                          "fonts", "Roboto-Condensed.bdf"))
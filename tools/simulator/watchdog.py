@@ -0,0 +1,18 @@
+"""
+Host-side stand-in for watchdog
+"""
+
+
+class WatchDogMode:
+    """
+    What the watchdog does when it times out
+    """
+    # pylint: disable=too-few-public-methods
+    RAISE = "RAISE"
+    RESET = "RESET"
+
+
+class WatchDogTimeout(Exception):
+    """
+    Raised in RAISE mode when the watchdog times out
+    """
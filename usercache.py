@@ -0,0 +1,127 @@
+"""
+Twitch user ids for logins, cached on flash.
+
+Helix identifies users by user_id, which stays the same when a streamer
+renames, while logins don't.  Logins are looked up once through
+/helix/users and the ids kept in a small text file, one line per login:
+    <login> <user id> <utc time looked up>
+A user id of 0 means twitch has no user by that login.  Entries older
+than the TTL are looked up again.
+
+CIRCUITPY is read-only to code.py unless boot.py remounts it, and then
+it's read-only over USB instead.  If the file can't be written the ids
+are kept in memory only and looked up again after the next reset.
+"""
+
+
+class UserCache:
+    """
+    Login to user id map, saved to a file
+    :param str path: the cache file
+    :param int ttl: seconds an entry is good for
+    """
+    def __init__(self, path, ttl):
+        self.path = path
+        self.ttl = ttl
+        self.entries = {}      # login: (user id, utc time looked up)
+        self.writable = True   # False once a save has failed
+        self.dirty = False     # changed since loaded or saved
+
+    @staticmethod
+    def _login(login):
+        # Twitch logins are lower case, STREAMER_NAMES might not be
+        return login.strip().lower()
+
+    def load(self):
+        """
+        Read the cache file, returns how many entries were read.  A
+        missing or unreadable file is the same as an empty one.
+        """
+        self.entries = {}
+        try:
+            with open(self.path, "r") as cache:
+                for line in cache:
+                    fields = line.split()
+                    if len(fields) == 3:
+                        try:
+                            self.entries[fields[0]] = (int(fields[1]), int(fields[2]))
+                        except ValueError:
+                            pass
+        except OSError:
+            pass
+        self.dirty = False
+        return len(self.entries)
+
+    def save(self):
+        """
+        Write the cache file if anything changed, returns True if it's
+        on flash.  Falls back to memory only if the filesystem is read-only.
+        """
+        if not self.dirty:
+            return self.writable
+        if not self.writable:
+            return False
+        try:
+            with open(self.path, "w") as cache:
+                for login, (user_id, looked_up) in self.entries.items():
+                    cache.write("%s %d %d\n" % (login, user_id, looked_up))
+            self.dirty = False
+        except OSError as error:
+            print("Can't save user ids to", self.path, error, "- keeping them in memory")
+            self.writable = False
+        return self.writable
+
+    def missing(self, logins, now):
+        """
+        Logins that have to be looked up, not in the cache or expired
+        :param logins: list of twitch logins
+        :param int now: utc seconds since 1970
+        """
+        stale = []
+        for login in logins:
+            login = self._login(login)
+            entry = self.entries.get(login)
+            if entry is None or now - entry[1] > self.ttl or now < entry[1]:
+                stale.append(login)
+        return stale
+
+    def update(self, logins, found, now):
+        """
+        Record a lookup.  Logins twitch didn't return are kept with the
+        id they had before, if any (the streamer may have renamed, their
+        id still works), or else marked as no such user.
+        :param logins: the logins looked up
+        :param found: dict of login: user id from /helix/users
+        :param int now: utc seconds since 1970
+        """
+        for login in logins:
+            login = self._login(login)
+            user_id = found.get(login)
+            if user_id is None:
+                old = self.entries.get(login)
+                user_id = old[0] if old else 0
+                if user_id:
+                    print("Twitch has no user", login, "any more, keeping user id", user_id)
+                else:
+                    print("Twitch has no user", login)
+            self.entries[login] = (int(user_id), now)
+        self.dirty = True
+
+    def ids(self, logins):
+        """
+        User ids for the logins that have one, in order
+        :param logins: list of twitch logins
+        """
+        ids = []
+        for login in logins:
+            entry = self.entries.get(self._login(login))
+            if entry and entry[0]:
+                ids.append(entry[0])
+        return ids
+
+    def unresolved(self, logins):
+        """
+        Logins with no lookup at all yet, to query by login meanwhile
+        :param logins: list of twitch logins
+        """
+        return [login for login in logins if self._login(login) not in self.entries]
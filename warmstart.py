@@ -0,0 +1,165 @@
+"""
+A snapshot of what the display knows, kept in microcontroller.nvm so a
+watchdog reset doesn't have to start over.
+
+The snapshot holds the twitch token and when it expires, the time it
+was saved, how often streamers have gone live in each hour of the day
+(code.py polls faster around those) and who was live, by user id with
+their display name so the marquee can be drawn before the first poll.
+After a reset the display comes back with the same streamers showing
+and no "now live" splashes for them, and the token and NTP steps are
+skipped while the snapshot is still good.
+
+nvm is flash, so the snapshot is only written when the token or the
+live set changes, and only if the bytes are different from what's there.
+The saved time is when it was last written, which can be long before a
+reset, so it's no guide to the time now.
+
+Layout, little endian:
+    "GTW2"  token length (B)  token  token expires (I)  saved (I)
+    go-live counts (24 B, one per hour)
+    live count (H)  { user id (I)  name length (B)  name } ...
+    checksum (H) of everything before it
+Times are seconds since 1970 UTC.  A "GTW1" snapshot from before the
+go-live counts were kept isn't loaded, the display starts cold.
+"""
+import struct
+
+MAGIC = b"GTW2"
+HOURS = 24
+MAX_TOKEN = 64     # twitch tokens are 30 characters
+MAX_NAME = 32      # twitch display names are at most 25
+
+
+def _truncate(text, most):
+    """
+    UTF-8 bytes of text, cut to at most bytes without splitting a character
+    """
+    data = text.encode()
+    if len(data) <= most:
+        return data
+    end = most
+    while end and data[end] & 0xC0 == 0x80:
+        end -= 1    # a continuation byte, back up to where the character starts
+    return data[:end]
+
+
+def _checksum(data):
+    """
+    16 bit Fletcher-style checksum, enough to spot a half written snapshot
+    """
+    low = high = 0
+    for byte in data:
+        low = (low + byte) % 255
+        high = (high + low) % 255
+    return (high << 8) | low
+
+
+class WarmStart:
+    """
+    The snapshot in nvm
+    :param nvm: microcontroller.nvm, or any bytearray
+    :param int size: most bytes of nvm to use, from the start
+    """
+    # pylint: disable=too-many-instance-attributes
+    def __init__(self, nvm, size=1024):
+        self._nvm = nvm
+        self.size = min(size, len(nvm)) if nvm is not None else 0
+        self.token = None
+        self.token_expires = 0   # utc
+        self.saved = 0           # utc when the snapshot was written
+        self.golive_hours = bytes(HOURS)   # go-live count for each hour of the day
+        self.live = []           # (user id, display name)
+        self.writes = 0          # times nvm was written
+        self.skipped = 0         # saves that didn't change anything
+
+    def load(self):
+        """
+        Read the snapshot, returns True if there was a good one
+        """
+        if not self.size:
+            return False
+        # microcontroller.nvm can only be indexed and sliced, so parse a copy
+        nvm = bytes(self._nvm[0:self.size])
+        try:
+            if nvm[0:4] != MAGIC:
+                return False
+            pos = 4
+            length = nvm[pos]
+            token = nvm[pos + 1:pos + 1 + length]
+            pos += 1 + length
+            token_expires, saved = struct.unpack_from("<II", nvm, pos)
+            pos += 8
+            golive_hours = nvm[pos:pos + HOURS]
+            pos += HOURS
+            count = struct.unpack_from("<H", nvm, pos)[0]
+            pos += 2
+            live = []
+            for _ in range(count):
+                user_id, length = struct.unpack_from("<IB", nvm, pos)
+                pos += 5
+                try:
+                    name = str(nvm[pos:pos + length], "utf-8")
+                except UnicodeError:
+                    name = ""   # the first poll has it again, don't lose the rest for it
+                live.append((user_id, name))
+                pos += length
+            if struct.unpack_from("<H", nvm, pos)[0] != _checksum(nvm[0:pos]):
+                print("Warm start snapshot is damaged, ignoring it")
+                return False
+            token = str(token, "utf-8") if token else None
+        except (IndexError, ValueError, struct.error):
+            return False
+        self.token = token
+        self.token_expires = token_expires
+        self.saved = saved
+        self.golive_hours = golive_hours
+        self.live = live
+        return True
+
+    def _pack(self, token, token_expires, saved, live, golive_hours):
+        token = _truncate(token or "", MAX_TOKEN)
+        data = bytearray(MAGIC)
+        data += struct.pack("<B", len(token)) + token
+        data += struct.pack("<II", int(token_expires), int(saved))
+        data += golive_hours
+        data += struct.pack("<H", 0)
+        count_at = len(data) - 2
+        count = 0
+        for user_id, name in live:
+            name = _truncate(name, MAX_NAME)
+            if len(data) + 5 + len(name) + 2 > self.size:
+                break   # no room for more, they'll be a splash after a reset
+            data += struct.pack("<IB", int(user_id), len(name)) + name
+            count += 1
+        struct.pack_into("<H", data, count_at, count)
+        data += struct.pack("<H", _checksum(data))
+        return data
+
+    def save(self, token, token_expires, saved, live, golive_hours=None):
+        """
+        Write a snapshot if it's different from the one in nvm, returns
+        True if nvm was written
+        :param str token: the twitch token
+        :param int token_expires: utc the token expires
+        :param int saved: utc now
+        :param live: list of (user id, display name) of who is live
+        :param golive_hours: 24 go-live counts (0-255), one per hour of the day
+        """
+        if not self.size:
+            return False
+        golive_hours = bytes(min(count, 255) for count in golive_hours or bytes(HOURS))
+        data = self._pack(token, token_expires, saved, live, golive_hours)
+        # The time is always different, only it changing isn't worth a write
+        time_at = 4 + 1 + data[4] + 4
+        old = self._nvm[0:len(data)]
+        if (old[0:time_at] == data[0:time_at]
+                and old[time_at + 4:-2] == data[time_at + 4:-2]):
+            self.skipped += 1
+            return False
+        self._nvm[0:len(data)] = data
+        self.token, self.token_expires, self.saved = token, token_expires, saved
+        self.golive_hours = golive_hours
+        self.live = list(live)
+        self.writes += 1
+        return True